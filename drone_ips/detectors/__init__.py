@@ -0,0 +1,14 @@
+"""Code shared by the machine learning detectors, kept free of dronekit."""
+
+from . import protocol
+from .base import Detector
+from .companion_computer import CompanionComputerDetector
+from .gps import GPSDetector
+from .lidar import LiDARDetector
+from .protocol import FeatureSchema, ProtocolError
+from .server import DetectorServer
+
+# The detectors by the name they announce in the handshake
+DETECTORS: dict[str, type[Detector]] = {
+    detector.NAME: detector for detector in (GPSDetector, LiDARDetector, CompanionComputerDetector)
+}
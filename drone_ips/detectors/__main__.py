@@ -0,0 +1,45 @@
+"""Serve machine learning detectors from this program until interrupted.
+
+One detector is served on its own REP socket, exactly like the `ml_monitor_*.py`
+programs; several are hosted together by a `DetectorServer`. This is the program the
+monitor launches for each detector:
+
+    python -m drone_ips.detectors gps [lidar ...] [--mmap]
+"""
+
+import argparse
+import logging
+
+from drone_ips.detectors import DETECTORS, DetectorServer
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments.
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Serve ML detectors until interrupted.")
+    parser.add_argument("detectors", nargs="+", choices=list(DETECTORS), help="the detectors to serve.")
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="memory-map the models' arrays (replace model files by renaming over them, not in place).",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Reloads and fallbacks are reported on stderr, apart from the ready line on stdout
+    logging.basicConfig(level=logging.INFO)
+    # Load every model once, then answer requests until interrupted
+    detectors = [DETECTORS[name](mmap=args.mmap) for name in args.detectors]
+    if len(detectors) == 1:
+        detectors[0].serve()
+    else:
+        server = DetectorServer(detectors)
+        server.serve()
+        print("Batching:", server.stats())
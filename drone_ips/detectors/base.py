@@ -0,0 +1,573 @@
+"""Base class for the machine learning detectors."""
+
+import hashlib
+import logging
+import os
+import pathlib
+import threading
+import zipfile
+from typing import Any, Optional, Union
+
+import joblib
+import numpy as np
+import zmq
+
+from drone_ips.detectors import protocol
+from drone_ips.detectors.compiled_svm import CompiledOneClassSVM
+from drone_ips.detectors.fast_path import CompiledTransform
+
+logger = logging.getLogger(__name__)
+
+# Static types
+Stamp = tuple[Optional[tuple[int, int]], ...]  # (modification time, size) of each model file, None if missing
+Models = tuple[Any, Any, Optional[CompiledTransform], bool, Stamp]  # (model, scaler, transform, precompiled, stamp)
+
+
+def _read_npz(path: pathlib.Path, mmap: bool = False) -> dict[str, np.ndarray]:
+    """Read every array in an .npz file, optionally memory-mapping them.
+
+    `np.load` can't memory-map the members of an .npz, but `np.savez` stores them
+    uncompressed, so each one is a plain .npy file at some offset in the archive and can
+    be mapped in place. Compressed members and scalars are read as usual.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The .npz file.
+    mmap : bool, optional
+        Whether to memory-map the arrays (read-only) instead of reading them.
+
+    Returns
+    -------
+    dict
+        The arrays, by name.
+    """
+    if not mmap:
+        with np.load(path) as arrays:
+            return {name: arrays[name] for name in arrays.files}
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(archive.open(info))
+                continue
+            # The local file header is 30 bytes, then the file name and the extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if len(shape) == 0 or dtype.hasobject:
+                f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+                arrays[name] = np.lib.format.read_array(f)
+                continue
+            arrays[name] = np.memmap(
+                str(path), dtype=dtype, mode="r", offset=f.tell(), shape=shape, order="F" if fortran_order else "C"
+            )
+    return arrays
+
+
+class Detector:
+    """A machine learning detector: a model, its preprocessing, and the features it needs.
+
+    A detector can run on its own behind a zmq REP socket (see `serve`), or be loaded
+    straight into the monitor's process and called through `predict`.
+
+    Preprocessing has two interchangeable paths. The original one builds a one-row
+    DataFrame and calls the fitted scaler (`preprocess_pandas`). The fast path fills a
+    NumPy row in `inputs()` order (`extract`) and applies the scaler's parameters
+    directly through a `CompiledTransform`. It is used whenever the scaler can be compiled.
+
+    On the fast path the model is scored by a `CompiledOneClassSVM` as well. Both can be
+    exported to an .npz file next to the model (see `export`), which is then loaded instead
+    of the pickles so scikit-learn isn't even imported; the pickles are still loaded on
+    demand for the pandas path.
+
+    The model files can be reloaded while the detector is running (see `reload`, and
+    `ModelReloader` to do it in the background when they change): the new models are
+    loaded and warmed up on the side and swapped in between two predictions.
+
+    Parameters
+    ----------
+    model_path : str or pathlib.Path, optional
+        The path to the saved model (`MODEL_FILE` in the models directory if None).
+    scaler_path : str or pathlib.Path, optional
+        The path to the saved scaler (`SCALER_FILE` in the models directory if None).
+    fast_path : bool, optional
+        Whether to preprocess with NumPy instead of pandas (`FAST_PATH` if None).
+    mmap : bool, optional
+        Whether to memory-map the model's arrays instead of reading them (`MMAP` if None).
+        Memory-mapped model files must then be replaced by renaming a new file over them
+        (as `export` does), never overwritten in place.
+    """
+
+    NAME: str = ""
+    PORT: int = 0
+    MODELS_DIR: pathlib.Path = pathlib.Path(__file__).parent.parent / "models"
+    MODEL_FILE: str = ""
+    SCALER_FILE: str = ""
+    # The telemetry fields the model needs, announced to the monitor in the handshake
+    FEATURES: list[str] = []
+    # Extra fields announced only to keep per-vehicle state (see `observe`)
+    STATE_FEATURES: list[str] = []
+    # Features the monitor derives once per tick and ships with the telemetry (see `FeatureGraph`)
+    DERIVED_FEATURES: list[str] = []
+    HISTORY: int = 0
+    RECV_TIMEOUT: int = 1000
+    FAST_PATH: bool = True
+    MMAP: bool = False
+
+    def __init__(
+        self,
+        model_path: Optional[Union[str, pathlib.Path]] = None,
+        scaler_path: Optional[Union[str, pathlib.Path]] = None,
+        fast_path: Optional[bool] = None,
+        mmap: Optional[bool] = None,
+    ):
+        self.model_path = pathlib.Path(model_path) if model_path is not None else self.MODELS_DIR / self.MODEL_FILE
+        self.scaler_path = pathlib.Path(scaler_path) if scaler_path is not None else self.MODELS_DIR / self.SCALER_FILE
+        self.FAST_PATH = fast_path if fast_path is not None else self.FAST_PATH
+        self.MMAP = mmap if mmap is not None else self.MMAP
+        # Predictions and model swaps never overlap
+        self._lock = threading.Lock()
+        self.model: Any = None
+        self._scaler: Any = None
+        self._compiled: Optional[CompiledTransform] = None
+        # Whether the model and scaler came from an exported .npz instead of the pickles
+        self.precompiled = False
+        # The file stamp of the models in use, and the features announced to the monitors; the first swap sets both
+        self.stamp: Stamp = ()
+        self.schema = protocol.FeatureSchema(self.NAME, [], history=self.HISTORY)
+        self.swap(self.load())
+
+    @property
+    def scaler(self) -> Any:
+        """The fitted scikit-learn preprocessor, loaded from its pickle the first time it is needed.
+
+        Returns
+        -------
+        Any
+            The fitted preprocessor.
+        """
+        if self._scaler is None:
+            self._scaler = self._load_pickle(self.scaler_path)
+        return self._scaler
+
+    @property
+    def compiled_path(self) -> pathlib.Path:
+        """The path of the exported, NumPy-only copy of the model and scaler.
+
+        Returns
+        -------
+        pathlib.Path
+            The model's path with an .npz suffix.
+        """
+        return self.model_path.with_suffix(".npz")
+
+    def fingerprint(self) -> str:
+        """Get a hash of the pickled model and scaler, to tell if an export is out of date.
+
+        Returns
+        -------
+        str
+            The SHA-256 of the model file followed by the scaler file.
+        """
+        digest = hashlib.sha256()
+        for path in (self.model_path, self.scaler_path):
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def file_stamp(self) -> Stamp:
+        """Get the modification time and size of the model files, to tell when they change.
+
+        Returns
+        -------
+        tuple
+            The modification time (ns) and size of the model, scaler and export (None if missing).
+        """
+        stamps: list[Optional[tuple[int, int]]] = []
+        for path in (self.model_path, self.scaler_path, self.compiled_path):
+            try:
+                stat = path.stat()
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def export(
+        self, path: Optional[Union[str, pathlib.Path]] = None, model: Optional[CompiledOneClassSVM] = None
+    ) -> pathlib.Path:
+        """Compile the pickled model and scaler and save them as a NumPy-only .npz file.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path, optional
+            The file to write (`compiled_path` if None).
+        model : CompiledOneClassSVM, optional
+            The model to save in place of the pickled one (e.g. a compressed approximation of it).
+
+        Returns
+        -------
+        pathlib.Path
+            The file that was written.
+
+        Raises
+        ------
+        NotImplementedError
+            If the model or the scaler can't be compiled.
+        """
+        path = pathlib.Path(path) if path is not None else self.compiled_path
+        transform = CompiledTransform(self.scaler, self.inputs())
+        if model is None:
+            model = CompiledOneClassSVM.from_estimator(joblib.load(self.model_path))
+        # Write next to the export and rename it over, so running detectors (which may have the
+        # old file memory-mapped) never see a half-written file
+        partial = path.with_name(f".{path.name}.partial")
+        with open(partial, "wb") as f:
+            np.savez(f, source=np.array(self.fingerprint()), **transform.to_arrays(), **model.to_arrays())
+        os.replace(partial, path)
+        return path
+
+    def load(self) -> Models:
+        """Load the model and scaler from disk and check that they work, without touching the ones in use.
+
+        On the fast path the up-to-date export is loaded if there is one; otherwise the
+        pickles are loaded and compiled in memory, keeping scikit-learn's model or scaler
+        where they can't be compiled. The new model then makes one prediction, so the first
+        real request after a swap doesn't pay for any lazy initialization.
+
+        Returns
+        -------
+        tuple
+            The model, the scaler (None until it is needed), the compiled transform (None
+            for the pandas path), whether they came from the export, and the file stamp.
+
+        Raises
+        ------
+        Exception
+            Whatever loading or the warm-up prediction raised, if the files are unusable.
+        """
+        stamp = self.file_stamp()
+        model, scaler, compiled, precompiled = None, None, None, False
+        if self.FAST_PATH:
+            loaded = self._load_compiled()
+            if loaded is not None:
+                model, compiled = loaded
+                precompiled = True
+            else:
+                model, scaler = self._load_pickle(self.model_path), self._load_pickle(self.scaler_path)
+                try:
+                    model = CompiledOneClassSVM.from_estimator(model)
+                except NotImplementedError as e:
+                    logger.info(f"Scoring {self.NAME} with scikit-learn: {e}")
+                try:
+                    compiled = CompiledTransform(scaler, self.inputs())
+                except NotImplementedError as e:
+                    logger.info(f"Preprocessing {self.NAME} with pandas: {e}")
+        else:
+            model = self._load_pickle(self.model_path)
+        # Warm up on a dummy row, which also checks that the model fits the preprocessing
+        row = compiled.transform(np.zeros(len(compiled.columns))) if compiled is not None else None
+        model.predict(row if row is not None else np.zeros((1, model.n_features_in_)))
+        return model, scaler, compiled, precompiled, stamp
+
+    def swap(self, models: Models):
+        """Put freshly loaded models in use, between two predictions.
+
+        Parameters
+        ----------
+        models : tuple
+            The models, as returned by `load`.
+        """
+        with self._lock:
+            self.model, self._scaler, self._compiled, self.precompiled, self.stamp = models
+            announced = list(self.FEATURES)
+            announced += [name for name in self.STATE_FEATURES + self.DERIVED_FEATURES if name not in announced]
+            schema = protocol.FeatureSchema(self.NAME, announced, self.categories(), self.HISTORY)
+            # Keep the schema the monitors negotiated unless the new model changes it
+            if schema.announcement() != self.schema.announcement():
+                self.schema = schema
+
+    def reload(self) -> bool:
+        """Load the model files again and swap them in if they work.
+
+        Returns
+        -------
+        bool
+            True if the new models are in use, False if they couldn't be loaded (the old ones stay).
+        """
+        try:
+            models = self.load()
+        except Exception as e:
+            logger.warning(f"Keeping the current {self.NAME} model: {e}")
+            return False
+        self.swap(models)
+        return True
+
+    def _load_pickle(self, path: pathlib.Path) -> Any:
+        """Load a pickled model or scaler, memory-mapping its arrays if `MMAP` is set.
+
+        Parameters
+        ----------
+        path : pathlib.Path
+            The pickle.
+
+        Returns
+        -------
+        Any
+            The unpickled object.
+        """
+        return joblib.load(path, mmap_mode="r" if self.MMAP else None)
+
+    def _load_compiled(self) -> Optional[tuple[CompiledOneClassSVM, CompiledTransform]]:
+        """Load the model and scaler from the exported .npz file, if it is up to date.
+
+        Returns
+        -------
+        tuple of (CompiledOneClassSVM, CompiledTransform) or None
+            The model and scaler, or None if there is no up-to-date export.
+        """
+        path = self.compiled_path
+        if not path.exists():
+            return None
+        arrays = _read_npz(path, self.MMAP)
+        transform = CompiledTransform.from_arrays(arrays)
+        # A retrained model or changed features make the export useless
+        if str(arrays["source"]) != self.fingerprint() or transform.columns != self.inputs():
+            logger.warning(f"{path.name} is out of date; run `python -m drone_ips.detectors.export` to update it")
+            return None
+        return CompiledOneClassSVM.from_arrays(arrays), transform
+
+    @property
+    def fast_path(self) -> bool:
+        """Check if the detector preprocesses with NumPy instead of pandas.
+
+        Returns
+        -------
+        bool
+            True if the scaler was compiled for the fast path, False otherwise.
+        """
+        return self._compiled is not None
+
+    def categories(self) -> dict[str, list[Any]]:
+        """Get the possible values of each categorical feature.
+
+        Returns
+        -------
+        dict
+            The possible values of each categorical feature, by feature name.
+        """
+        return {}
+
+    def observe(self, current_data: dict, vehicle: Optional[str] = None) -> dict:
+        """Update any per-vehicle state with a new sample and add the features derived from it.
+
+        This is called exactly once for every sample, before it is preprocessed.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        vehicle : str, optional
+            The ID of the vehicle the data came from.
+
+        Returns
+        -------
+        dict
+            The data to preprocess (the current data, unchanged, unless a subclass adds to it).
+        """
+        return current_data
+
+    def inputs(self) -> list[str]:
+        """Get the names of the columns the scaler takes, in the order `extract` fills them.
+
+        Returns
+        -------
+        list of str
+            The names of the scaler's input columns.
+        """
+        return list(self.FEATURES)
+
+    def extract(self, current_data: dict) -> np.ndarray:
+        """Extract the scaler's input columns from the vehicle data into a NumPy row.
+
+        Categorical columns hold the index of the value in `categories()` (NaN if missing).
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The scaler's input columns, in `inputs()` order.
+        """
+        raise NotImplementedError
+
+    def preprocess(self, current_data: dict) -> np.ndarray:
+        """Preprocess the vehicle data for prediction, on the fast path if it is available.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The preprocessed data ready for prediction.
+        """
+        if self._compiled is None:
+            return self.preprocess_pandas(current_data)
+        return self._compiled.transform(self.extract(current_data))
+
+    def preprocess_pandas(self, current_data: dict) -> np.ndarray:
+        """Preprocess the vehicle data for prediction with pandas and the fitted scaler.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The preprocessed data ready for prediction.
+        """
+        raise NotImplementedError
+
+    def predict(self, current_data: dict, last_data: Optional[dict] = None, vehicle: Optional[str] = None) -> int:
+        """Make a prediction using the model.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        last_data : dict, optional
+            The previous data from the vehicle.
+        vehicle : str, optional
+            The ID of the vehicle the data came from.
+
+        Returns
+        -------
+        int
+            The verdict (0 = normal, 1 = malicious).
+        """
+        with self._lock:
+            prediction = self.model.predict(self.preprocess(self.observe(current_data, vehicle)))
+        return self._to_verdict(prediction[0])
+
+    def predict_batch(self, samples: list[tuple[dict, Optional[dict], Optional[str]]]) -> list[Optional[int]]:
+        """Make predictions for several samples with a single call to the model.
+
+        Each sample is preprocessed on its own, exactly as `predict` would, and the rows
+        are then stacked so the scaler (on the fast path) and the model are only invoked once.
+
+        Parameters
+        ----------
+        samples : list of tuple
+            The current and previous data from the vehicle, and the vehicle's ID, for each sample.
+
+        Returns
+        -------
+        list of int or None
+            The verdict for each sample, or None if it couldn't be preprocessed.
+        """
+        verdicts: list[Optional[int]] = [None] * len(samples)
+        with self._lock:
+            rows, indices = [], []
+            for i, (current_data, _, vehicle) in enumerate(samples):
+                sample = self.observe(current_data, vehicle)
+                try:
+                    row = self.extract(sample) if self._compiled is not None else self.preprocess(sample)
+                except (KeyError, ValueError):
+                    continue
+                # Samples that preprocessing threw away (e.g. missing values) get no verdict
+                if row.ndim == 1 or row.shape[0] == 1:
+                    rows.append(row)
+                    indices.append(i)
+            if len(rows) > 0:
+                matrix = np.vstack(rows)
+                # On the fast path the whole batch is scaled at once
+                if self._compiled is not None:
+                    matrix = self._compiled.transform(matrix)
+                for i, prediction in zip(indices, self.model.predict(matrix)):
+                    verdicts[i] = self._to_verdict(prediction)
+        return verdicts
+
+    def serve(self, port: Optional[int] = None):
+        """Answer requests from the monitor on a zmq REP socket until interrupted.
+
+        The model is reloaded when its files change or a "reload" command arrives.
+
+        Parameters
+        ----------
+        port : int, optional
+            The port to listen on (`PORT` if None).
+        """
+        # Imported here since the reloader builds on this module
+        from drone_ips.detectors.reloader import ModelReloader
+
+        context = zmq.Context()
+        socket = context.socket(zmq.REP)
+        socket.bind(f"tcp://*:{port if port is not None else self.PORT}")
+        socket.RCVTIMEO = self.RECV_TIMEOUT
+        reloader = ModelReloader([self])
+        # The model was loaded and warmed up with the detector, so it can take requests now
+        print(protocol.encode_ready([self.NAME]), flush=True)
+
+        while True:
+            try:
+                # Swap in a new model between requests if its files changed
+                reloader.poll()
+                _, vehicle, command, current_data, last_data = protocol.decode_request(
+                    socket.recv(), {self.NAME: self.schema}
+                )
+                # Answer health probes from the monitor
+                if command == protocol.PING:
+                    socket.send(b"pong")
+                    continue
+                # Announce the features this model needs
+                if command == protocol.HELLO:
+                    socket.send(protocol.encode_announcement(self.schema))
+                    continue
+                # Load the model again in the background
+                if command == protocol.RELOAD:
+                    reloader.request()
+                    socket.send(b"reloading")
+                    continue
+                # Send back a verdict
+                verdict = self.predict(current_data, last_data, vehicle)
+                print("Prediction:", verdict)
+                socket.send(bytes(str(verdict), "utf-8"))
+            except KeyboardInterrupt:
+                break
+            except zmq.error.Again:
+                continue
+            except protocol.ProtocolError as e:
+                logger.warning(f"Bad request: {e}")
+                socket.send(b"error")
+        reloader.close()
+        socket.close()
+        context.term()
+
+    @staticmethod
+    def _to_verdict(prediction: Any) -> int:
+        """Turn a prediction from the model into a verdict.
+
+        Parameters
+        ----------
+        prediction : Any
+            A single prediction from the model.
+
+        Returns
+        -------
+        int
+            The verdict (0 = normal, 1 = malicious).
+        """
+        return 1 if int(prediction) == 1 else 0
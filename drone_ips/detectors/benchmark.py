@@ -0,0 +1,141 @@
+"""Check that the NumPy fast path matches the pandas path, and measure how much faster it is.
+
+Run it from the repository root:
+
+    python -m drone_ips.detectors.benchmark [test_data/labeled_attack_data.csv]
+
+`tests/test_fast_path.py` runs the same comparison under pytest, without the timing.
+"""
+
+import argparse
+import math
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+import drone_ips.utils as ips_utils
+from drone_ips.detectors import DETECTORS, Detector
+
+
+def load_samples(filename: str, limit: Optional[int] = None) -> list[dict]:
+    """Load recorded telemetry as the dictionaries the detectors receive.
+
+    Parameters
+    ----------
+    filename : str
+        The CSV file of recorded telemetry.
+    limit : int, optional
+        The most samples to load (all of them if None).
+
+    Returns
+    -------
+    list of dict
+        The samples, with missing values as None.
+    """
+    df = pd.read_csv(filename, nrows=limit)
+    return [
+        {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in row.items()}
+        for row in df.to_dict("records")
+    ]
+
+
+def time_path(preprocess: Callable[[dict], np.ndarray], detector: Detector, samples: list[dict]) -> tuple[list, dict]:
+    """Run one preprocessing path (plus the model) over every sample and time each request.
+
+    Parameters
+    ----------
+    preprocess : callable
+        The preprocessing path to run.
+    detector : Detector
+        The detector whose model makes the predictions.
+    samples : list of dict
+        The samples.
+
+    Returns
+    -------
+    tuple of (list, dict)
+        The preprocessed rows and verdicts (None where preprocessing failed), and the latency summary.
+    """
+    histogram = ips_utils.LatencyHistogram()
+    results = []
+    for sample in samples:
+        start = time.perf_counter()
+        try:
+            row = preprocess(sample)
+            verdict = detector._to_verdict(detector.model.predict(row)[0])
+        except (KeyError, ValueError):
+            row, verdict = None, None
+        histogram.record(time.perf_counter() - start)
+        results.append((row, verdict))
+    return results, histogram.summary()
+
+
+def compare(detector: Detector, samples: list[dict]) -> dict:
+    """Compare the pandas and NumPy paths of a detector.
+
+    Parameters
+    ----------
+    detector : Detector
+        The detector, with the fast path compiled.
+    samples : list of dict
+        The samples.
+
+    Returns
+    -------
+    dict
+        The number of mismatched rows and verdicts, the largest difference between
+        the preprocessed rows, and the latency summary of each path.
+    """
+    # Update any per-vehicle state once, so both paths see the same derived features
+    samples = [detector.observe(sample, "benchmark") for sample in samples]
+    slow, slow_latency = time_path(detector.preprocess_pandas, detector, samples)
+    fast, fast_latency = time_path(detector.preprocess, detector, samples)
+    row_mismatches = verdict_mismatches = 0
+    max_difference = 0.0
+    for (slow_row, slow_verdict), (fast_row, fast_verdict) in zip(slow, fast):
+        verdict_mismatches += slow_verdict != fast_verdict
+        if slow_row is None or fast_row is None:
+            row_mismatches += (slow_row is None) != (fast_row is None)
+            continue
+        difference = float(np.max(np.abs(np.asarray(slow_row, dtype=float) - fast_row)))
+        max_difference = max(max_difference, difference)
+        row_mismatches += not np.allclose(slow_row, fast_row, rtol=1e-9, atol=1e-12)
+    return {
+        "row_mismatches": row_mismatches,
+        "verdict_mismatches": verdict_mismatches,
+        "max_difference": max_difference,
+        "pandas": slow_latency,
+        "numpy": fast_latency,
+    }
+
+
+def main():
+    """Benchmark every detector on a recorded flight and print the results."""
+    parser = argparse.ArgumentParser(description="Compare the pandas and NumPy preprocessing paths.")
+    parser.add_argument("filename", nargs="?", default="test_data/labeled_attack_data.csv")
+    parser.add_argument("-n", "--limit", type=int, default=None, help="the most samples to use.")
+    args = parser.parse_args()
+
+    samples = load_samples(args.filename, args.limit)
+    print(f"{len(samples)} samples from {args.filename}")
+    ok = True
+    for name, detector_class in DETECTORS.items():
+        detector = detector_class(fast_path=True)
+        if not detector.fast_path:
+            print(f"{name}: no fast path")
+            continue
+        result = compare(detector, samples)
+        ok = ok and result["row_mismatches"] == 0 and result["verdict_mismatches"] == 0
+        pandas_p50, numpy_p50 = result["pandas"]["p50_ms"], result["numpy"]["p50_ms"]
+        print(
+            f"{name}: rows differ {result['row_mismatches']}, verdicts differ {result['verdict_mismatches']}, "
+            f"max |diff| {result['max_difference']:.3g}; "
+            f"p50 {pandas_p50}ms -> {numpy_p50}ms, p99 {result['pandas']['p99_ms']}ms -> {result['numpy']['p99_ms']}ms"
+        )
+    print("PASS" if ok else "FAIL")
+
+
+if __name__ == "__main__":
+    main()
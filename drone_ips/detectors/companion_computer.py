@@ -0,0 +1,68 @@
+"""Detector for attacks on the companion computer."""
+
+import numpy as np
+import pandas as pd
+
+from drone_ips.detectors.base import Detector
+
+
+class CompanionComputerDetector(Detector):
+    """A one-class SVM that flags battery and CPU/RAM usage that don't fit normal flight.
+
+    Accuracy: 95% (training), 94% (testing)
+    """
+
+    NAME: str = "companion_computer"
+    PORT: int = 55552
+    MODEL_FILE: str = "one_class_cpu.pkl"
+    SCALER_FILE: str = "preprocessor_cpu.pkl"
+    FEATURES: list[str] = [
+        "timestamp",
+        "battery.current",
+        "battery.level",
+        "battery.voltage",
+        "companion_computer.cpu_usage",
+        "companion_computer.ram_usage",
+    ]
+
+    def extract(self, current_data: dict) -> np.ndarray:
+        """Extract the scaler's input columns from the vehicle data into a NumPy row.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The scaler's input columns, in `inputs()` order.
+        """
+        row = self.schema.pack(current_data)
+        # The pandas path drops samples with missing values, leaving nothing to scale
+        if np.isnan(row).any():
+            raise ValueError("The sample has missing values")
+        return row
+
+    def preprocess_pandas(self, current_data: dict) -> np.ndarray:
+        """Preprocess the vehicle data for prediction with pandas and the fitted scaler.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The preprocessed data ready for prediction.
+        """
+        # Convert the current_data dictionary to a DataFrame
+        df = pd.DataFrame([current_data])
+
+        # Select all columns except those in columns_to_exclude
+        df = df[self.FEATURES].copy()
+        df = df.dropna()
+
+        # Standardize the data using the loaded scaler
+        return self.scaler.transform(df)
@@ -0,0 +1,193 @@
+"""NumPy-only scoring for the detectors' fitted one-class SVMs."""
+
+from typing import Any, Optional
+
+import numpy as np
+
+
+class CompiledOneClassSVM:
+    """A fitted one-class SVM reduced to its support vectors and kernel parameters.
+
+    Calling `predict` on a scikit-learn OneClassSVM validates the input and goes through
+    libsvm for every call, and loading one means importing scikit-learn, which is slow on
+    the companion computer. The decision function of a one-class SVM is just a weighted sum
+    of kernel evaluations against the support vectors plus an intercept, so it is computed
+    here directly from the fitted arrays, which can be saved with `np.savez`.
+
+    Parameters
+    ----------
+    support_vectors : np.ndarray
+        The support vectors, one per row.
+    dual_coef : np.ndarray
+        The weight of each support vector.
+    intercept : float
+        The intercept of the decision function (minus libsvm's rho).
+    kernel : str
+        The kernel: "rbf", "linear", "poly" or "sigmoid".
+    gamma : float
+        The kernel coefficient for "rbf", "poly" and "sigmoid".
+    degree : int
+        The degree of the "poly" kernel.
+    coef0 : float
+        The independent term of the "poly" and "sigmoid" kernels.
+    """
+
+    KERNELS: tuple[str, ...] = ("rbf", "linear", "poly", "sigmoid")
+
+    def __init__(
+        self,
+        support_vectors: np.ndarray,
+        dual_coef: np.ndarray,
+        intercept: float,
+        kernel: str,
+        gamma: float,
+        degree: int,
+        coef0: float,
+    ):
+        if kernel not in self.KERNELS:
+            raise NotImplementedError(f"The {kernel} kernel can't be compiled")
+        self.support_vectors = np.ascontiguousarray(support_vectors, dtype=float)
+        self.dual_coef = np.ascontiguousarray(dual_coef, dtype=float).ravel()
+        self.intercept = float(intercept)
+        self.kernel = kernel
+        self.gamma = float(gamma)
+        self.degree = int(degree)
+        self.coef0 = float(coef0)
+        # The squared norm of each support vector, for the RBF kernel
+        self._sv_norms = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+        self.n_features_in_ = self.support_vectors.shape[1]
+
+    @classmethod
+    def from_estimator(cls, model: Any) -> "CompiledOneClassSVM":
+        """Compile a fitted scikit-learn OneClassSVM.
+
+        Parameters
+        ----------
+        model : sklearn.svm.OneClassSVM
+            The fitted model.
+
+        Returns
+        -------
+        CompiledOneClassSVM
+            The compiled model.
+
+        Raises
+        ------
+        NotImplementedError
+            If the model isn't a one-class SVM with a built-in kernel.
+        """
+        if type(model).__name__ != "OneClassSVM" or not isinstance(getattr(model, "kernel", None), str):
+            raise NotImplementedError(f"{type(model).__name__} can't be compiled")
+        return cls(
+            model.support_vectors_,
+            model.dual_coef_,
+            model.intercept_[0],
+            model.kernel,
+            model._gamma,
+            model.degree,
+            model.coef0,
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "CompiledOneClassSVM":
+        """Rebuild a compiled model from the arrays returned by `to_arrays`.
+
+        Parameters
+        ----------
+        arrays : dict
+            The arrays, by name.
+
+        Returns
+        -------
+        CompiledOneClassSVM
+            The compiled model.
+        """
+        return cls(
+            arrays["svm.support_vectors"],
+            arrays["svm.dual_coef"],
+            arrays["svm.intercept"].item(),
+            str(arrays["svm.kernel"]),
+            arrays["svm.gamma"].item(),
+            arrays["svm.degree"].item(),
+            arrays["svm.coef0"].item(),
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Get the arrays that make up the model, ready for `np.savez`.
+
+        Returns
+        -------
+        dict
+            The arrays, by name.
+        """
+        return {
+            "svm.support_vectors": self.support_vectors,
+            "svm.dual_coef": self.dual_coef,
+            "svm.intercept": np.array(self.intercept),
+            "svm.kernel": np.array(self.kernel),
+            "svm.gamma": np.array(self.gamma),
+            "svm.degree": np.array(self.degree),
+            "svm.coef0": np.array(self.coef0),
+        }
+
+    def kernel_matrix(self, rows: np.ndarray, vectors: Optional[np.ndarray] = None) -> np.ndarray:
+        """Evaluate the model's kernel between every row and every vector.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            The rows, one sample per row.
+        vectors : np.ndarray, optional
+            The vectors to compare against (the support vectors if None).
+
+        Returns
+        -------
+        np.ndarray
+            The kernel values, with one row per input row and one column per vector.
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        if vectors is None:
+            vectors, norms = self.support_vectors, self._sv_norms
+        else:
+            vectors = np.atleast_2d(np.asarray(vectors, dtype=float))
+            norms = np.einsum("ij,ij->i", vectors, vectors)
+        dot = rows @ vectors.T
+        if self.kernel == "rbf":
+            # ||x - y||^2 expanded the same way libsvm does it
+            distances = np.einsum("ij,ij->i", rows, rows)[:, None] + norms[None, :] - 2.0 * dot
+            return np.exp(-self.gamma * distances)
+        if self.kernel == "linear":
+            return dot
+        if self.kernel == "poly":
+            return (self.gamma * dot + self.coef0) ** self.degree
+        return np.tanh(self.gamma * dot + self.coef0)
+
+    def decision_function(self, rows: np.ndarray) -> np.ndarray:
+        """Compute the signed distance of each row to the separating hyperplane.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            The preprocessed rows, one sample per row.
+
+        Returns
+        -------
+        np.ndarray
+            The decision value of each row (positive for inliers).
+        """
+        return self.kernel_matrix(rows) @ self.dual_coef + self.intercept
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """Classify each row, exactly like `OneClassSVM.predict`.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            The preprocessed rows, one sample per row.
+
+        Returns
+        -------
+        np.ndarray
+            1 for inliers and -1 for outliers.
+        """
+        return np.where(self.decision_function(rows) > 0, 1, -1)
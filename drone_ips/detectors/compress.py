@@ -0,0 +1,232 @@
+"""Compress the detectors' one-class SVMs to a budget of support vectors.
+
+The cost of scoring a one-class SVM grows with its number of support vectors, so this
+builds smaller approximations of each model and reports what they cost in accuracy and
+what they save in latency on a labeled flight. Run it from the repository root:
+
+    python -m drone_ips.detectors.compress [test_data/labeled_attack_data.csv] -b 50 100 200 --save
+
+With `--save`, each approximation is written next to the model as
+`<model>.<method>-<budget>.npz`; rename one to `<model>.npz` to deploy it, since it
+carries the same fingerprint as the export from `python -m drone_ips.detectors.export`.
+"""
+
+import argparse
+import time
+from typing import Optional
+
+import numpy as np
+
+import drone_ips.utils as ips_utils
+from drone_ips.detectors import DETECTORS, Detector
+from drone_ips.detectors.benchmark import load_samples
+from drone_ips.detectors.compiled_svm import CompiledOneClassSVM
+
+# How each approximation picks its landmarks
+METHODS: tuple[str, ...] = ("prune", "kmeans", "nystrom")
+# The attack each detector is meant to catch; any other row is normal as far as it is concerned
+ATTACKS: dict[str, str] = {
+    "gps": "static_gps_spoofer",
+    "lidar": "lidar_spoofer",
+    "companion_computer": "high_cpu_load",
+}
+
+
+def select_landmarks(model: CompiledOneClassSVM, budget: int, method: str, seed: int = 0) -> np.ndarray:
+    """Pick the vectors the approximation will be built on.
+
+    Parameters
+    ----------
+    model : CompiledOneClassSVM
+        The full model.
+    budget : int
+        The number of vectors to pick.
+    method : str
+        "prune" keeps the support vectors with the largest weights, "kmeans" uses the
+        weighted k-means centers of the support vectors (a reduced set), and "nystrom"
+        samples support vectors at random in proportion to their weights.
+    seed : int, optional
+        The seed for the random choices.
+
+    Returns
+    -------
+    np.ndarray
+        The landmarks, one per row.
+    """
+    vectors, weights = model.support_vectors, np.abs(model.dual_coef)
+    if budget >= len(vectors):
+        return vectors
+    if method == "prune":
+        return vectors[np.argsort(weights)[::-1][:budget]]
+    if method == "nystrom":
+        rng = np.random.default_rng(seed)
+        return vectors[rng.choice(len(vectors), budget, replace=False, p=weights / weights.sum())]
+    if method == "kmeans":
+        # Offline tool, so scikit-learn is fine here
+        from sklearn.cluster import KMeans
+
+        return KMeans(budget, n_init=3, random_state=seed).fit(vectors, sample_weight=weights).cluster_centers_
+    raise ValueError(f"Unknown method: {method}")
+
+
+def reduce(model: CompiledOneClassSVM, landmarks: np.ndarray, ridge: float = 1e-8) -> CompiledOneClassSVM:
+    """Approximate a model with a weighted sum of kernels on a smaller set of vectors.
+
+    The weights are the projection of the model's decision function onto the span of
+    the landmarks in the kernel's feature space, i.e. the Nyström approximation of the
+    kernel: beta = K(Z, Z)^-1 K(Z, X) alpha. The intercept is unchanged.
+
+    Parameters
+    ----------
+    model : CompiledOneClassSVM
+        The full model.
+    landmarks : np.ndarray
+        The vectors to build the approximation on, one per row.
+    ridge : float, optional
+        The regularization added to K(Z, Z), relative to its largest diagonal entry.
+
+    Returns
+    -------
+    CompiledOneClassSVM
+        The approximation, which is scored exactly like the full model.
+    """
+    k_zz = model.kernel_matrix(landmarks, landmarks)
+    k_zx = model.kernel_matrix(landmarks)
+    k_zz[np.diag_indices_from(k_zz)] += ridge * np.max(np.diag(k_zz))
+    weights = np.linalg.solve(k_zz, k_zx @ model.dual_coef)
+    return CompiledOneClassSVM(
+        landmarks, weights, model.intercept, model.kernel, model.gamma, model.degree, model.coef0
+    )
+
+
+def evaluate(model: CompiledOneClassSVM, rows: np.ndarray, labels: np.ndarray, reference: np.ndarray) -> dict:
+    """Measure the accuracy and latency of a model.
+
+    Accuracy counts the model's outliers as attacks, which is how a one-class SVM is meant
+    to be read.
+
+    Parameters
+    ----------
+    model : CompiledOneClassSVM
+        The model.
+    rows : np.ndarray
+        The preprocessed rows.
+    labels : np.ndarray
+        True for the rows with the detector's attack.
+    reference : np.ndarray
+        The full model's predictions on the rows.
+
+    Returns
+    -------
+    dict
+        The number of support vectors, the accuracy, the recall on attacks, the false
+        positive rate, the agreement with the full model and the single-sample latency.
+    """
+    predictions = model.predict(rows)
+    flagged = predictions == -1
+    histogram = ips_utils.LatencyHistogram()
+    for row in rows:
+        start = time.perf_counter()
+        model.predict(row.reshape(1, -1))
+        histogram.record(time.perf_counter() - start)
+    return {
+        "vectors": len(model.support_vectors),
+        "accuracy": float(np.mean(flagged == labels)),
+        "recall": float(np.mean(flagged[labels])) if labels.any() else float("nan"),
+        "false_positives": float(np.mean(flagged[~labels])) if (~labels).any() else float("nan"),
+        "agreement": float(np.mean(predictions == reference)),
+        "latency": histogram.summary(),
+    }
+
+
+def preprocess(detector: Detector, samples: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """Preprocess the labeled samples for a detector.
+
+    Parameters
+    ----------
+    detector : Detector
+        The detector.
+    samples : list of dict
+        The samples, with their `attack_type`.
+
+    Returns
+    -------
+    tuple of (np.ndarray, np.ndarray)
+        The preprocessed rows, and whether each one has the detector's attack.
+    """
+    rows, labels = [], []
+    for sample in samples:
+        sample = detector.observe(sample, "compress")
+        try:
+            rows.append(detector.preprocess(sample))
+        except (KeyError, ValueError):
+            continue
+        labels.append(sample.get("attack_type") == ATTACKS.get(detector.NAME))
+    return np.vstack(rows), np.array(labels, dtype=bool)
+
+
+def save(detector: Detector, model: CompiledOneClassSVM, method: str) -> Optional[str]:
+    """Save an approximation in the same format as the detector's export.
+
+    Parameters
+    ----------
+    detector : Detector
+        The detector, loaded on the fast path.
+    model : CompiledOneClassSVM
+        The approximation.
+    method : str
+        The method that built it.
+
+    Returns
+    -------
+    str or None
+        The name of the file that was written, or None if the detector has no fast path.
+    """
+    if not detector.fast_path:
+        return None
+    path = detector.compiled_path.with_suffix(f".{method}-{len(model.support_vectors)}.npz")
+    return detector.export(path, model).name
+
+
+def main():
+    """Compress every detector to each budget and print the trade-offs."""
+    parser = argparse.ArgumentParser(description="Compress the one-class SVMs to a budget of support vectors.")
+    parser.add_argument("filename", nargs="?", default="test_data/labeled_attack_data.csv")
+    parser.add_argument("-b", "--budgets", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("-m", "--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("-d", "--detectors", nargs="+", choices=list(DETECTORS), default=list(DETECTORS))
+    parser.add_argument("--save", action="store_true", help="write each approximation next to the model.")
+    args = parser.parse_args()
+
+    samples = load_samples(args.filename)
+    print(f"{len(samples)} samples from {args.filename}")
+    for name in args.detectors:
+        detector = DETECTORS[name](fast_path=True)
+        if not isinstance(detector.model, CompiledOneClassSVM):
+            print(f"{name}: can't be compressed")
+            continue
+        rows, labels = preprocess(detector, samples)
+        full = detector.model
+        reference = full.predict(rows)
+        print(f"{name} ({labels.sum()} of {len(labels)} rows are {ATTACKS.get(name)}):")
+        results: list[tuple[str, dict, Optional[CompiledOneClassSVM]]] = [
+            ("full", evaluate(full, rows, labels, reference), None)
+        ]
+        for budget in sorted(args.budgets):
+            if budget >= len(full.support_vectors):
+                continue
+            for method in args.methods:
+                model = reduce(full, select_landmarks(full, budget, method))
+                results.append((method, evaluate(model, rows, labels, reference), model))
+        for method, result, approximation in results:
+            saved = save(detector, approximation, method) if args.save and approximation is not None else None
+            print(
+                f"  {method:>8} {result['vectors']:>5} SVs: accuracy {result['accuracy']:.3f}, "
+                f"recall {result['recall']:.3f}, false positives {result['false_positives']:.3f}, "
+                f"agrees {result['agreement']:.3f}; p50 {result['latency']['p50_ms']}ms"
+                + (f" -> {saved}" if saved is not None else "")
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Export the detectors' models to NumPy-only .npz files and check them against scikit-learn.
+
+Run it from the repository root after retraining a model:
+
+    python -m drone_ips.detectors.export [test_data/labeled_attack_data.csv]
+
+This rewrites the .npz files in the models directory; the committed exports are checked
+against scikit-learn without writing anything by `tests/test_compiled_svm.py`.
+"""
+
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+import drone_ips.utils as ips_utils
+from drone_ips.detectors import DETECTORS, Detector
+from drone_ips.detectors.benchmark import load_samples
+
+
+def check(detector: Detector, samples: list[dict], noise: float = 0.5, seed: int = 0) -> dict:
+    """Compare an exported detector with the pickled scikit-learn model and scaler.
+
+    The reference rows are preprocessed with the fitted scaler (the pandas path) and scored
+    with the pickled model; the exported detector preprocesses and scores on its own. Noisy
+    copies of the reference rows probe the model near its decision boundary as well.
+
+    Parameters
+    ----------
+    detector : Detector
+        The detector, loaded from its export.
+    samples : list of dict
+        The samples.
+    noise : float, optional
+        The standard deviation of the noise added to the preprocessed rows for the probes.
+    seed : int, optional
+        The seed for the noise.
+
+    Returns
+    -------
+    dict
+        The number of rows checked, mismatched predictions, the largest difference between
+        the decision values and the per-sample latency of each model.
+    """
+    estimator = joblib.load(detector.model_path)
+    reference, compiled = [], []
+    for sample in (detector.observe(sample, "export") for sample in samples):
+        try:
+            reference.append(detector.preprocess_pandas(sample))
+            compiled.append(detector.preprocess(sample))
+        except (KeyError, ValueError):
+            continue
+    reference_rows, compiled_rows = np.vstack(reference), np.vstack(compiled)
+    rng = np.random.default_rng(seed)
+    probes = reference_rows + rng.normal(0.0, noise, reference_rows.shape)
+    reference_rows, compiled_rows = np.vstack([reference_rows, probes]), np.vstack([compiled_rows, probes])
+    expected = estimator.decision_function(reference_rows)
+    actual = detector.model.decision_function(compiled_rows)
+    mismatches = int(np.sum(estimator.predict(reference_rows) != detector.model.predict(compiled_rows)))
+    # Time single-sample scoring, which is what the detectors do most
+    latency = {}
+    for name, model in (("sklearn", estimator), ("numpy", detector.model)):
+        histogram = ips_utils.LatencyHistogram()
+        for row in compiled_rows[: len(compiled)]:
+            start = time.perf_counter()
+            model.predict(row.reshape(1, -1))
+            histogram.record(time.perf_counter() - start)
+        latency[name] = histogram.summary()
+    return {
+        "rows": len(reference_rows),
+        "mismatches": mismatches,
+        "max_difference": float(np.max(np.abs(expected - actual))),
+        "sklearn": latency["sklearn"],
+        "numpy": latency["numpy"],
+    }
+
+
+def main():
+    """Export every detector, then reload each export and check it against scikit-learn."""
+    parser = argparse.ArgumentParser(description="Export the detectors' models to NumPy-only .npz files.")
+    parser.add_argument("filename", nargs="?", default="test_data/labeled_attack_data.csv")
+    parser.add_argument("-n", "--limit", type=int, default=None, help="the most samples to check with.")
+    args = parser.parse_args()
+
+    samples = load_samples(args.filename, args.limit)
+    print(f"{len(samples)} samples from {args.filename}")
+    ok = True
+    for name, detector_class in DETECTORS.items():
+        try:
+            path = detector_class(fast_path=False).export()
+        except NotImplementedError as e:
+            print(f"{name}: can't be exported ({e})")
+            continue
+        detector = detector_class(fast_path=True)
+        if not detector.precompiled:
+            print(f"{name}: {path.name} didn't load")
+            ok = False
+            continue
+        result = check(detector, samples)
+        ok = ok and result["mismatches"] == 0
+        print(
+            f"{name}: wrote {path.name} ({path.stat().st_size // 1024} KiB); "
+            f"{result['rows']} rows, predictions differ {result['mismatches']}, "
+            f"max |decision diff| {result['max_difference']:.3g}; "
+            f"p50 {result['sklearn']['p50_ms']}ms -> {result['numpy']['p50_ms']}ms"
+        )
+    print("PASS" if ok else "FAIL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""NumPy-only replacement for the detectors' fitted scikit-learn preprocessors."""
+
+import json
+from typing import Any
+
+import numpy as np
+
+# Static types
+Block = tuple[str, Any, np.ndarray, np.ndarray]  # (kind, input indices, first parameter, second parameter)
+
+
+class CompiledTransform:
+    """A fitted preprocessor reduced to a few NumPy arrays.
+
+    Calling `transform` on a fitted scikit-learn preprocessor validates its input,
+    converts it to a DataFrame or array and walks the pipeline every time, which costs
+    far more than the arithmetic for a single row. Here the fitted parameters are pulled
+    out once and the input columns are resolved to fixed indices, so a transform is just
+    array slicing and arithmetic into a preallocated output.
+
+    StandardScaler, OneHotEncoder (without dropped categories), single-step Pipelines and
+    ColumnTransformers built from those are supported; anything else raises
+    NotImplementedError so the caller can fall back to scikit-learn. Once compiled, the
+    transform can be saved (`to_arrays`) and loaded again (`from_arrays`) without importing
+    scikit-learn at all.
+
+    Parameters
+    ----------
+    transformer : object
+        The fitted preprocessor.
+    columns : list of str
+        The names of the columns of the rows that will be transformed. Categorical
+        columns hold the index of the value in the encoder's categories (NaN if missing).
+    """
+
+    def __init__(self, transformer: Any, columns: list[str]):
+        self.columns = list(columns)
+        names = list(getattr(transformer, "feature_names_in_", self.columns))
+        self._blocks: list[Block] = []
+        self._compile(transformer, names)
+        self.n_outputs = sum(self._block_width(block) for block in self._blocks)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "CompiledTransform":
+        """Rebuild a compiled transform from the arrays returned by `to_arrays`.
+
+        Parameters
+        ----------
+        arrays : dict
+            The arrays, by name.
+
+        Returns
+        -------
+        CompiledTransform
+            The compiled transform.
+        """
+        meta = json.loads(str(arrays["transform.meta"]))
+        compiled = cls.__new__(cls)
+        compiled.columns = meta["columns"]
+        compiled._blocks = []
+        for i, block in enumerate(meta["blocks"]):
+            indices = arrays[f"transform.{i}.indices"]
+            if block["kind"] == "onehot":
+                compiled._blocks.append(("onehot", indices.item(), np.asarray(block["categories"]), np.empty(0)))
+            else:
+                a, b = arrays[f"transform.{i}.a"], arrays[f"transform.{i}.b"]
+                compiled._blocks.append((block["kind"], indices, a, b))
+        compiled.n_outputs = sum(cls._block_width(block) for block in compiled._blocks)
+        return compiled
+
+    @property
+    def categories(self) -> dict[str, list[Any]]:
+        """The categories of each one-hot encoded column.
+
+        Returns
+        -------
+        dict
+            The categories, in the encoder's order, by column name.
+        """
+        return {self.columns[indices]: a.tolist() for kind, indices, a, _ in self._blocks if kind == "onehot"}
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Get the arrays that make up the transform, ready for `np.savez`.
+
+        Returns
+        -------
+        dict
+            The arrays, by name.
+        """
+        arrays: dict[str, np.ndarray] = {}
+        blocks = []
+        for i, (kind, indices, a, b) in enumerate(self._blocks):
+            arrays[f"transform.{i}.indices"] = np.asarray(indices, dtype=np.intp)
+            if kind == "onehot":
+                blocks.append({"kind": kind, "categories": a.tolist()})
+            else:
+                blocks.append({"kind": kind, "categories": None})
+                arrays[f"transform.{i}.a"] = a
+                arrays[f"transform.{i}.b"] = b
+        arrays["transform.meta"] = np.array(json.dumps({"columns": self.columns, "blocks": blocks}))
+        return arrays
+
+    def transform(self, rows: np.ndarray) -> np.ndarray:
+        """Transform rows exactly as the fitted preprocessor would.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            The rows to transform, one sample per row, with the columns in `columns` order.
+
+        Returns
+        -------
+        np.ndarray
+            The transformed rows.
+        """
+        rows = np.atleast_2d(rows)
+        out = np.empty((rows.shape[0], self.n_outputs))
+        start = 0
+        for kind, indices, a, b in self._blocks:
+            if kind == "scale":
+                end = start + len(indices)
+                np.subtract(rows[:, indices], a, out=out[:, start:end])
+                out[:, start:end] /= b
+            elif kind == "onehot":
+                end = start + len(a)
+                out[:, start:end] = 0.0
+                codes = rows[:, indices]
+                # Missing values and unknown categories are encoded as all zeros
+                valid = (codes >= 0) & (codes < len(a))
+                out[np.flatnonzero(valid), start + codes[valid].astype(np.intp)] = 1.0
+            else:
+                end = start + len(indices)
+                out[:, start:end] = rows[:, indices]
+            start = end
+        return out
+
+    def _compile(self, transformer: Any, names: list[str]):
+        """Turn a fitted preprocessor into output blocks.
+
+        Parameters
+        ----------
+        transformer : object
+            The fitted preprocessor.
+        names : list of str
+            The names of the columns the preprocessor takes, in order.
+        """
+        # Only needed to compile, so loading a saved transform doesn't pay for importing scikit-learn
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        if isinstance(transformer, Pipeline):
+            steps = [step for _, step in transformer.steps if step not in (None, "passthrough")]
+            if len(steps) != 1:
+                raise NotImplementedError("Only single-step pipelines can be compiled")
+            self._compile(steps[0], names)
+        elif isinstance(transformer, ColumnTransformer):
+            if transformer.sparse_output_:
+                raise NotImplementedError("Sparse output can't be compiled")
+            for _, step, selection in transformer.transformers_:
+                if isinstance(step, str) and step == "drop":
+                    continue
+                selected = self._select(transformer, selection)
+                if isinstance(step, str) and step == "passthrough":
+                    self._blocks.append(("passthrough", self._indices(selected), np.empty(0), np.empty(0)))
+                else:
+                    self._compile(step, selected)
+        elif isinstance(transformer, StandardScaler):
+            indices = self._indices(names)
+            mean = transformer.mean_ if transformer.with_mean else np.zeros(len(indices))
+            scale = transformer.scale_ if transformer.with_std else np.ones(len(indices))
+            self._blocks.append(("scale", indices, np.asarray(mean, dtype=float), np.asarray(scale, dtype=float)))
+        elif isinstance(transformer, OneHotEncoder):
+            if transformer.drop_idx_ is not None:
+                raise NotImplementedError("One-hot encoders that drop categories can't be compiled")
+            for name, categories in zip(names, transformer.categories_):
+                self._blocks.append(("onehot", self._indices([name])[0], np.asarray(categories), np.empty(0)))
+        else:
+            raise NotImplementedError(f"{type(transformer).__name__} can't be compiled")
+
+    def _indices(self, names: list[str]) -> np.ndarray:
+        """Resolve column names to their indices in the input rows.
+
+        Parameters
+        ----------
+        names : list of str
+            The names of the columns.
+
+        Returns
+        -------
+        np.ndarray
+            The index of each column in `columns`.
+        """
+        missing = [name for name in names if name not in self.columns]
+        if len(missing) > 0:
+            raise NotImplementedError(f"The preprocessor needs columns that aren't provided: {missing}")
+        return np.array([self.columns.index(name) for name in names], dtype=np.intp)
+
+    @staticmethod
+    def _select(transformer: Any, selection: Any) -> list[str]:
+        """Get the names of the columns a ColumnTransformer hands to one of its transformers.
+
+        Parameters
+        ----------
+        transformer : ColumnTransformer
+            The fitted ColumnTransformer.
+        selection : Any
+            The column selection, as stored in `transformers_`.
+
+        Returns
+        -------
+        list of str
+            The names of the selected columns.
+        """
+        names = list(transformer.feature_names_in_)
+        selected = np.atleast_1d(selection)
+        if selected.dtype == bool:
+            return [name for name, keep in zip(names, selected) if keep]
+        if np.issubdtype(selected.dtype, np.integer):
+            return [names[i] for i in selected]
+        return [str(name) for name in selected]
+
+    @staticmethod
+    def _block_width(block: Block) -> int:
+        """Get the number of output columns a block produces.
+
+        Parameters
+        ----------
+        block : tuple
+            The block.
+
+        Returns
+        -------
+        int
+            The number of output columns.
+        """
+        kind, indices, a, _ = block
+        return len(a) if kind == "onehot" else len(indices)
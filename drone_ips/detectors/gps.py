@@ -0,0 +1,172 @@
+"""Detector for GPS spoofing."""
+
+import pathlib
+from collections import OrderedDict
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from drone_ips.detectors import protocol
+from drone_ips.detectors.base import Detector
+from drone_ips.detectors.gps_features import GPSFeatureEngine
+
+
+class GPSDetector(Detector):
+    """A one-class SVM that flags GPS readings that don't fit normal flight.
+
+    The model was trained on the motion between successive samples as well as the
+    readings themselves, so each vehicle gets a `GPSFeatureEngine` that turns its
+    stream of samples into those deltas (plus speed statistics) as they arrive.
+
+    Accuracy: 50%
+
+    Parameters
+    ----------
+    model_path : str or pathlib.Path, optional
+        The path to the saved model (`MODEL_FILE` in the models directory if None).
+    scaler_path : str or pathlib.Path, optional
+        The path to the saved scaler (`SCALER_FILE` in the models directory if None).
+    fast_path : bool, optional
+        Whether to preprocess with NumPy instead of pandas (`FAST_PATH` if None).
+    mmap : bool, optional
+        Whether to memory-map the model's arrays instead of reading them (`MMAP` if None).
+    """
+
+    NAME: str = "gps"
+    PORT: int = 55550
+    MODEL_FILE: str = "one_class_svm_model.pkl"
+    SCALER_FILE: str = "scaler.pkl"
+    FEATURES: list[str] = [
+        "gps_0.eph",
+        "gps_0.epv",
+        "gps_0.satellites_visible",
+        "location.global_frame.lat",
+        "location.global_frame.lon",
+        "location.global_frame.alt",
+        "heading",
+    ]
+    STATE_FEATURES: list[str] = ["timestamp"]
+    # The engineered features the model was trained on, produced by the feature engine
+    MOTION_FEATURES: list[str] = ["delta_lat", "delta_lon", "delta_alt", "distance"]
+    # The monitor derives the same features in its feature graph; they are used when shipped
+    DERIVED_FEATURES: list[str] = MOTION_FEATURES
+    # The most vehicles to keep motion state for; the least recently heard from is forgotten
+    MAX_VEHICLES: int = 64
+
+    def __init__(
+        self,
+        model_path: Optional[Union[str, pathlib.Path]] = None,
+        scaler_path: Optional[Union[str, pathlib.Path]] = None,
+        fast_path: Optional[bool] = None,
+        mmap: Optional[bool] = None,
+    ):
+        super().__init__(model_path, scaler_path, fast_path, mmap)
+        self._engines: OrderedDict[Optional[str], GPSFeatureEngine] = OrderedDict()
+
+    def observe(self, current_data: dict, vehicle: Optional[str] = None) -> dict:
+        """Update the vehicle's feature engine and add the motion features to the sample.
+
+        If the monitor already derived the motion features and shipped them with the
+        telemetry, the sample is used as it is.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        vehicle : str, optional
+            The ID of the vehicle the data came from.
+
+        Returns
+        -------
+        dict
+            The current data plus the vehicle's motion features.
+        """
+        if all(current_data.get(name) is not None for name in self.DERIVED_FEATURES):
+            return current_data
+        engine = self._engines.get(vehicle)
+        if engine is None:
+            engine = self._engines[vehicle] = GPSFeatureEngine()
+            if len(self._engines) > self.MAX_VEHICLES:
+                self._engines.popitem(last=False)
+        else:
+            self._engines.move_to_end(vehicle)
+        motion = engine.update(
+            protocol.to_float(current_data.get("timestamp")),
+            protocol.to_float(current_data.get("location.global_frame.lat")),
+            protocol.to_float(current_data.get("location.global_frame.lon")),
+            protocol.to_float(current_data.get("location.global_frame.alt")),
+        )
+        return {**current_data, **motion}
+
+    def inputs(self) -> list[str]:
+        """Get the names of the columns the scaler takes, in the order `extract` fills them.
+
+        Returns
+        -------
+        list of str
+            The features followed by the engineered deltas and distance.
+        """
+        return self.FEATURES + self.MOTION_FEATURES
+
+    def extract(self, current_data: dict) -> np.ndarray:
+        """Extract the scaler's input columns from the vehicle data into a NumPy row.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The scaler's input columns, in `inputs()` order.
+        """
+        n = len(self.FEATURES)
+        row = np.empty(n + len(self.MOTION_FEATURES))
+        # Values that aren't numbers become 0, like pd.to_numeric(errors="coerce") then fillna(0)
+        features = self.schema.pack(current_data)[:n]
+        row[:n] = np.where(np.isnan(features), 0.0, features)
+        # Motion features are 0 if the sample didn't go through `observe`
+        row[n:] = [current_data.get(name) or 0.0 for name in self.MOTION_FEATURES]
+        return row
+
+    def preprocess_pandas(self, current_data: dict) -> np.ndarray:
+        """Preprocess the vehicle data for prediction with pandas and the fitted scaler.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The preprocessed data ready for prediction.
+        """
+        # Convert the current_data dictionary to a DataFrame
+        df = pd.DataFrame([current_data])
+
+        # Select all columns except those in columns_to_exclude
+        df = df[self.FEATURES].copy()
+
+        # Convert necessary columns to numeric values to avoid type errors
+        df["location.global_frame.lat"] = pd.to_numeric(df["location.global_frame.lat"], errors="coerce")
+        df["location.global_frame.lon"] = pd.to_numeric(df["location.global_frame.lon"], errors="coerce")
+        df["location.global_frame.alt"] = pd.to_numeric(df["location.global_frame.alt"], errors="coerce")
+        df["heading"] = pd.to_numeric(df["heading"], errors="coerce")
+        df["gps_0.eph"] = pd.to_numeric(df["gps_0.eph"], errors="coerce")
+        df["gps_0.epv"] = pd.to_numeric(df["gps_0.epv"], errors="coerce")
+        df["gps_0.satellites_visible"] = pd.to_numeric(df["gps_0.satellites_visible"], errors="coerce")
+
+        # Fill NaN values which might have been created during conversion to numeric
+        df.fillna(0, inplace=True)
+
+        # Feature Engineering
+        # The deltas and distance between successive GPS points come from the vehicle's
+        # feature engine (see `observe`); they are 0 if the sample didn't go through it
+        for column in self.MOTION_FEATURES:
+            df[column] = current_data.get(column) or 0.0
+
+        # Standardize the data using the loaded scaler
+        return self.scaler.transform(df)
@@ -0,0 +1,112 @@
+"""Incremental motion features for the GPS detector."""
+
+import math
+from collections import deque
+
+import drone_ips.utils as ips_utils
+
+
+class GPSFeatureEngine:
+    """Motion features for one vehicle, updated in constant time as each GPS sample arrives.
+
+    The GPS model was trained on the change in position between successive samples, but a
+    single sample can't provide that. This engine keeps just enough state per vehicle to
+    produce those deltas, plus smoothed and windowed speeds, without ever recomputing over
+    the history.
+
+    Parameters
+    ----------
+    window : int, optional
+        The number of samples in the rolling window.
+    alpha : float, optional
+        The weight of the newest speed in the exponentially weighted average.
+    """
+
+    WINDOW: int = 10
+    ALPHA: float = 0.3
+    # The features the engine produces; the first four are inputs to the GPS model
+    FEATURES: list[str] = [
+        "delta_lat",
+        "delta_lon",
+        "delta_alt",
+        "distance",
+        "climb_rate",
+        "speed",
+        "speed_ewma",
+        "speed_mean",
+        "speed_var",
+        "window_speed",
+    ]
+
+    def __init__(self, window: int = WINDOW, alpha: float = ALPHA):
+        self._positions: deque[tuple[float, float, float]] = deque(maxlen=window)
+        self._last_alt = 0.0
+        self._speed_ewma = ips_utils.EWMA(alpha)
+        self._speed_stats = ips_utils.RollingStats(window)
+        self._features = dict.fromkeys(self.FEATURES, 0.0)
+
+    @property
+    def features(self) -> dict[str, float]:
+        """The features as of the latest sample.
+
+        Returns
+        -------
+        dict
+            The features as of the latest sample.
+        """
+        return dict(self._features)
+
+    def update(self, timestamp: float, lat: float, lon: float, alt: float) -> dict[str, float]:
+        """Update the features with a new GPS sample.
+
+        Samples with a missing coordinate leave the state untouched and report no motion.
+
+        Parameters
+        ----------
+        timestamp : float
+            The time of the sample (seconds).
+        lat : float
+            The latitude (degrees).
+        lon : float
+            The longitude (degrees).
+        alt : float
+            The altitude (meters).
+
+        Returns
+        -------
+        dict
+            The features as of this sample.
+        """
+        features = self._features
+        if any(math.isnan(value) for value in (timestamp, lat, lon, alt)):
+            features.update(delta_lat=0.0, delta_lon=0.0, delta_alt=0.0, distance=0.0, climb_rate=0.0, speed=0.0)
+            return dict(features)
+        if len(self._positions) == 0:
+            self._positions.append((timestamp, lat, lon))
+            self._last_alt = alt
+            return dict(features)
+        last_time, last_lat, last_lon = self._positions[-1]
+        dt = timestamp - last_time
+        # The same deltas and (degree/meter) distance the model was trained on
+        delta_lat, delta_lon, delta_alt = lat - last_lat, lon - last_lon, alt - self._last_alt
+        features["delta_lat"] = delta_lat
+        features["delta_lon"] = delta_lon
+        features["delta_alt"] = delta_alt
+        features["distance"] = math.sqrt(delta_lat**2 + delta_lon**2 + delta_alt**2)
+        # Speeds in meters per second; repeated timestamps keep the previous speeds
+        if dt > 0:
+            speed = ips_utils.math.haversine_distance(last_lat, last_lon, lat, lon) / dt
+            features["climb_rate"] = delta_alt / dt
+            features["speed"] = speed
+            features["speed_ewma"] = self._speed_ewma.update(speed)
+            self._speed_stats.update(speed)
+            features["speed_mean"] = self._speed_stats.mean
+            features["speed_var"] = self._speed_stats.variance
+        self._positions.append((timestamp, lat, lon))
+        self._last_alt = alt
+        # The average speed across the whole window, which smooths out jumpy fixes
+        first_time, first_lat, first_lon = self._positions[0]
+        if timestamp > first_time:
+            window_distance = ips_utils.math.haversine_distance(first_lat, first_lon, lat, lon)
+            features["window_speed"] = window_distance / (timestamp - first_time)
+        return dict(features)
@@ -0,0 +1,78 @@
+"""Detector for LiDAR spoofing."""
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from drone_ips.detectors.base import Detector
+
+
+class LiDARDetector(Detector):
+    """A one-class SVM that flags rangefinder readings that don't fit normal flight.
+
+    Accuracy: 94% (training), 94% (testing)
+    """
+
+    NAME: str = "lidar"
+    PORT: int = 55551
+    MODEL_FILE: str = "one_class_lidar.pkl"
+    SCALER_FILE: str = "preprocessor_lidar.pkl"
+    FEATURES: list[str] = ["timestamp", "rangefinder.distance", "system_status.state"]
+
+    def categories(self) -> dict[str, list[Any]]:
+        """Get the possible values of each categorical feature.
+
+        Returns
+        -------
+        dict
+            The system states known to the preprocessor's one-hot encoder.
+        """
+        # An exported preprocessor carries its categories, without loading the pickle
+        if self._compiled is not None:
+            return self._compiled.categories
+        encoder = self.scaler.named_transformers_["cat"].named_steps["onehot"]
+        return {"system_status.state": encoder.categories_[0].tolist()}
+
+    def extract(self, current_data: dict) -> np.ndarray:
+        """Extract the scaler's input columns from the vehicle data into a NumPy row.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The scaler's input columns, in `inputs()` order.
+        """
+        row = self.schema.pack(current_data)
+        # Missing numbers become 0, like fillna(0); a missing state is left as NaN (no category)
+        row[:2] = np.where(np.isnan(row[:2]), 0.0, row[:2])
+        return row
+
+    def preprocess_pandas(self, current_data: dict) -> np.ndarray:
+        """Preprocess the vehicle data for prediction with pandas and the fitted scaler.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The preprocessed data ready for prediction.
+        """
+        # Convert the current_data dictionary to a DataFrame
+        df = pd.DataFrame([current_data])
+
+        # Select all columns except those in columns_to_exclude
+        df = df[self.FEATURES].copy()
+
+        # Fill NaN values which might have been created during conversion to numeric
+        df.fillna(0, inplace=True)
+
+        # Standardize the data using the loaded scaler
+        return self.scaler.transform(df)
@@ -0,0 +1,418 @@
+"""Compact, schema-negotiated protocol between the monitor and the machine learning detectors.
+
+Every request is a single zmq frame of one of two kinds:
+
+- A JSON object. Control messages carry a "command" key ("ping", "hello", "reload"); the JSON
+  fallback carries the full "current" (and optionally "last") telemetry dictionaries.
+  Both name the "detector" they are meant for, so one server can host several models,
+  and telemetry names the "vehicle" it came from, so detectors can keep state per vehicle.
+- A binary feature frame: a fixed header, the detector's name, the vehicle's ID and a
+  little-endian float64 matrix holding only the features the detector announced in its
+  hello reply.
+  The first row is the current sample; any further rows are the history window, newest
+  first.
+
+A detector program also prints a single "ready" line, a JSON object naming the detectors
+it serves, to its standard output once its models are loaded and its sockets are bound,
+so whatever launched it knows when it can start sending requests.
+"""
+
+import json
+import math
+import struct
+from collections.abc import Iterable
+from typing import Any, Optional
+
+import numpy as np
+
+VERSION = 3
+PING = "ping"
+HELLO = "hello"
+RELOAD = "reload"
+READY = "ready"
+
+# magic, protocol version, detector name length, vehicle ID length, rows, columns
+FEATURE_MAGIC = b"DF"
+FEATURE_HEADER = struct.Struct("<2sBBHHH")
+FEATURE_DTYPE = np.dtype("<f8")
+
+
+class ProtocolError(ValueError):
+    """Raised when a frame can't be decoded."""
+
+
+class FeatureSchema:
+    """The features a detector needs, in the order it wants them.
+
+    A detector announces its schema in reply to the "hello" command, and the monitor
+    uses it to pack the telemetry into a float64 vector. Categorical features are sent
+    as the index of the value in their list of categories; missing values, values that
+    aren't numbers and unknown categories are all sent as NaN and come back as None.
+
+    Parameters
+    ----------
+    detector : str
+        The name of the detector.
+    features : iterable of str
+        The telemetry fields the detector needs.
+    categories : dict, optional
+        The possible values of each categorical feature, by feature name.
+    history : int, optional
+        The number of previous samples the detector wants alongside the current one.
+    """
+
+    def __init__(
+        self,
+        detector: str,
+        features: Iterable[str],
+        categories: Optional[dict[str, list[Any]]] = None,
+        history: int = 0,
+    ):
+        self.detector = detector
+        self.features = list(features)
+        self.categories = {name: list(values) for name, values in (categories or {}).items()}
+        self.history = int(history)
+        self._indices = {name: {value: i for i, value in enumerate(values)} for name, values in self.categories.items()}
+
+    @classmethod
+    def from_announcement(cls, announcement: dict) -> "FeatureSchema":
+        """Build a schema from a detector's reply to the "hello" command.
+
+        Parameters
+        ----------
+        announcement : dict
+            The decoded reply.
+
+        Returns
+        -------
+        FeatureSchema
+            The announced schema.
+        """
+        if announcement.get("protocol") != VERSION:
+            raise ProtocolError(f"Unsupported protocol version {announcement.get('protocol')}")
+        return cls(
+            announcement["detector"],
+            announcement["features"],
+            announcement.get("categories"),
+            announcement.get("history", 0),
+        )
+
+    def announcement(self) -> dict:
+        """Describe the schema for the reply to the "hello" command.
+
+        Returns
+        -------
+        dict
+            The protocol version, detector name, features, categories and history length.
+        """
+        return {
+            "protocol": VERSION,
+            "detector": self.detector,
+            "features": self.features,
+            "categories": self.categories,
+            "history": self.history,
+        }
+
+    def pack(self, data: dict) -> np.ndarray:
+        """Pack the features out of a telemetry dictionary.
+
+        Parameters
+        ----------
+        data : dict
+            The telemetry from the vehicle.
+
+        Returns
+        -------
+        np.ndarray
+            The features as a float64 vector.
+        """
+        row = np.empty(len(self.features), dtype=FEATURE_DTYPE)
+        for i, name in enumerate(self.features):
+            value = data.get(name)
+            indices = self._indices.get(name)
+            if indices is not None:
+                row[i] = indices.get(value, math.nan)
+            else:
+                row[i] = to_float(value)
+        return row
+
+    def unpack(self, row: np.ndarray) -> dict:
+        """Unpack a float64 vector into a telemetry dictionary holding only the features.
+
+        Parameters
+        ----------
+        row : np.ndarray
+            The features as a float64 vector.
+
+        Returns
+        -------
+        dict
+            The features, by name.
+        """
+        data: dict[str, Any] = {}
+        for name, value in zip(self.features, row.tolist()):
+            if math.isnan(value):
+                data[name] = None
+            elif name in self.categories:
+                values = self.categories[name]
+                data[name] = values[int(value)] if 0 <= value < len(values) else None
+            else:
+                data[name] = value
+        return data
+
+
+def to_float(value: Any) -> float:
+    """Convert a telemetry value to a float, the same way `pd.to_numeric(errors="coerce")` would.
+
+    Parameters
+    ----------
+    value : Any
+        The value to convert.
+
+    Returns
+    -------
+    float
+        The value as a float, or NaN if it isn't a number.
+    """
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def encode_command(command: str, detector: Optional[str] = None) -> bytes:
+    """Encode a control message.
+
+    Parameters
+    ----------
+    command : str
+        The command to send (e.g. "ping").
+    detector : str, optional
+        The name of the detector the command is meant for.
+
+    Returns
+    -------
+    bytes
+        The encoded message.
+    """
+    message = {"command": command}
+    if detector is not None:
+        message["detector"] = detector
+    return bytes(json.dumps(message), "utf-8")
+
+
+def encode_ready(detectors: Iterable[str]) -> str:
+    """Encode the line a detector program prints once it is ready for requests.
+
+    Parameters
+    ----------
+    detectors : iterable of str
+        The names of the detectors the program serves.
+
+    Returns
+    -------
+    str
+        The ready line (without a newline).
+    """
+    return json.dumps({"command": READY, "detectors": list(detectors)})
+
+
+def decode_ready(line: str) -> Optional[list[str]]:
+    """Decode a line from a detector program's output, if it is the ready line.
+
+    Parameters
+    ----------
+    line : str
+        A line of output.
+
+    Returns
+    -------
+    list of str or None
+        The names of the detectors the program serves, or None if the line is anything else.
+    """
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get("command") != READY:
+        return None
+    return [str(name) for name in message.get("detectors", [])]
+
+
+def encode_announcement(schema: FeatureSchema) -> bytes:
+    """Encode a detector's reply to the "hello" command.
+
+    Parameters
+    ----------
+    schema : FeatureSchema
+        The detector's schema.
+
+    Returns
+    -------
+    bytes
+        The encoded reply.
+    """
+    return bytes(json.dumps(schema.announcement()), "utf-8")
+
+
+def encode_json(
+    detector: str, current_data: dict, last_data: Optional[dict] = None, vehicle: Optional[str] = None
+) -> bytes:
+    """Encode the full telemetry as JSON, for detectors that didn't announce a schema.
+
+    Parameters
+    ----------
+    detector : str
+        The name of the detector.
+    current_data : dict
+        The current data from the vehicle.
+    last_data : dict, optional
+        The previous data from the vehicle.
+    vehicle : str, optional
+        The ID of the vehicle the data came from.
+
+    Returns
+    -------
+    bytes
+        The encoded message.
+    """
+    message = {"detector": detector, "current": current_data}
+    if last_data is not None:
+        message["last"] = last_data
+    if vehicle is not None:
+        message["vehicle"] = vehicle
+    return bytes(json.dumps(message), "utf-8")
+
+
+def encode_features(detector: str, matrix: np.ndarray, vehicle: Optional[str] = None) -> bytes:
+    """Encode a binary feature frame.
+
+    Parameters
+    ----------
+    detector : str
+        The name of the detector.
+    matrix : np.ndarray
+        The features, one sample per row (current sample first).
+    vehicle : str, optional
+        The ID of the vehicle the data came from.
+
+    Returns
+    -------
+    bytes
+        The encoded frame.
+
+    Raises
+    ------
+    ProtocolError
+        If the detector's name is longer than 255 bytes, the vehicle's ID longer than
+        65535 bytes, or the matrix has more than 65535 rows or columns.
+    """
+    name = detector.encode("utf-8")
+    vehicle_id = vehicle.encode("utf-8") if vehicle is not None else b""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=FEATURE_DTYPE))
+    rows, cols = matrix.shape
+    try:
+        header = FEATURE_HEADER.pack(FEATURE_MAGIC, VERSION, len(name), len(vehicle_id), rows, cols)
+    except struct.error as e:
+        sizes = f"{len(name)}-byte name, {len(vehicle_id)}-byte vehicle ID, {rows}x{cols} matrix"
+        raise ProtocolError(f"Feature frame for {detector!r} doesn't fit its header ({sizes})") from e
+    return header + name + vehicle_id + matrix.tobytes()
+
+
+def is_feature_frame(frame: bytes) -> bool:
+    """Check if a frame is a binary feature frame rather than JSON.
+
+    Parameters
+    ----------
+    frame : bytes
+        The received frame.
+
+    Returns
+    -------
+    bool
+        True if the frame is a binary feature frame, False otherwise.
+    """
+    return frame[: len(FEATURE_MAGIC)] == FEATURE_MAGIC
+
+
+def decode_features(frame: bytes) -> tuple[str, Optional[str], np.ndarray]:
+    """Decode a binary feature frame.
+
+    Parameters
+    ----------
+    frame : bytes
+        The received frame.
+
+    Returns
+    -------
+    tuple of (str, str or None, np.ndarray)
+        The name of the detector, the ID of the vehicle (None if not given) and the features,
+        one sample per row.
+    """
+    if len(frame) < FEATURE_HEADER.size:
+        raise ProtocolError("Truncated feature frame header")
+    magic, version, name_length, vehicle_length, rows, cols = FEATURE_HEADER.unpack_from(frame)
+    if magic != FEATURE_MAGIC or version != VERSION:
+        raise ProtocolError(f"Unsupported feature frame (magic {magic!r}, version {version})")
+    vehicle_offset = FEATURE_HEADER.size + name_length
+    offset = vehicle_offset + vehicle_length
+    if len(frame) != offset + rows * cols * FEATURE_DTYPE.itemsize:
+        raise ProtocolError("Feature frame length doesn't match its header")
+    detector = frame[FEATURE_HEADER.size : vehicle_offset].decode("utf-8")
+    vehicle = frame[vehicle_offset:offset].decode("utf-8") if vehicle_length > 0 else None
+    matrix = np.frombuffer(frame, dtype=FEATURE_DTYPE, offset=offset).reshape(rows, cols)
+    return detector, vehicle, matrix
+
+
+def decode_request(
+    frame: bytes, schemas: dict[str, FeatureSchema]
+) -> tuple[Optional[str], Optional[str], Optional[str], dict, dict]:
+    """Decode a request for one of several detectors, whatever kind of frame it is.
+
+    Parameters
+    ----------
+    frame : bytes
+        The received frame.
+    schemas : dict
+        The schemas the detectors announced, by detector name. If there is only one,
+        it is used for every feature frame regardless of the name in the frame.
+
+    Returns
+    -------
+    tuple of (str or None, str or None, str or None, dict, dict)
+        The name of the detector and the ID of the vehicle (None if the request doesn't say),
+        the command (None for telemetry), and the current and previous data from the vehicle.
+
+    Raises
+    ------
+    ProtocolError
+        If the frame is neither a valid feature frame nor a JSON object.
+    """
+    if is_feature_frame(frame):
+        detector, vehicle, matrix = decode_features(frame)
+        schema = schemas.get(detector)
+        if schema is None and len(schemas) == 1:
+            schema = next(iter(schemas.values()))
+        if schema is None:
+            raise ProtocolError(f"No schema for detector {detector!r}")
+        current_data = schema.unpack(matrix[0])
+        last_data = schema.unpack(matrix[1]) if len(matrix) > 1 else {}
+        return detector, vehicle, None, current_data, last_data
+    try:
+        data = json.loads(frame.decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"Request is neither a feature frame nor JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ProtocolError(f"Request is JSON but not an object: {type(data).__name__}")
+    return (
+        data.get("detector"),
+        data.get("vehicle"),
+        data.get("command"),
+        data.get("current", {}),
+        data.get("last", {}),
+    )
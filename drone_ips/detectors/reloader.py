@@ -0,0 +1,178 @@
+"""Reload the detectors' models when their files change, without restarting or dropping requests.
+
+The reloader is polled by whatever loop serves the detectors. Run it as a program to
+ask running detectors to reload right away, e.g. after copying in a retrained model:
+
+    python -m drone_ips.detectors.reloader [gps lidar ...]
+"""
+
+import argparse
+import json
+import logging
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import zmq
+
+from drone_ips.detectors import protocol
+from drone_ips.detectors.base import Detector, Models
+
+logger = logging.getLogger(__name__)
+
+
+class ModelReloader:
+    """Watch the detectors' model files and swap in new models between requests.
+
+    Loading a model (and, without an up-to-date export, compiling it) takes far longer than
+    a request is allowed to, so it happens on a background thread while the old model keeps
+    answering. Once the new model has loaded and made its warm-up prediction, the serving
+    loop swaps it in at its next `poll`, between two requests. A model whose files are
+    still being written is left alone until they stop changing, and files that failed to
+    load aren't tried again until they change (or a reload is requested).
+
+    Parameters
+    ----------
+    detectors : iterable of Detector
+        The detectors to watch.
+    interval : float, optional
+        How often (in seconds) to look at the model files (`INTERVAL` if None; 0 to only reload on request).
+    """
+
+    INTERVAL: float = 2.0
+
+    def __init__(self, detectors: Iterable[Detector], interval: Optional[float] = None):
+        self._detectors = {detector.NAME: detector for detector in detectors}
+        self.interval = interval if interval is not None else self.INTERVAL
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loading: dict[str, Future] = {}
+        # The file stamps seen at the last check, and the ones that failed to load
+        self._seen = {name: detector.stamp for name, detector in self._detectors.items()}
+        self._failed: dict[str, tuple] = {}
+        self._requested: set[str] = set()
+        self._next_check = time.monotonic() + self.interval
+        # Counters
+        self.reloads = 0
+        self.failures = 0
+
+    def request(self, name: Optional[str] = None):
+        """Reload a detector's model at the next poll, even if its files haven't changed.
+
+        Parameters
+        ----------
+        name : str, optional
+            The detector to reload (all of them if None).
+        """
+        self._requested.update(self._detectors if name is None else [name] if name in self._detectors else [])
+
+    def poll(self) -> list[str]:
+        """Swap in the models that finished loading and start loading the ones that changed.
+
+        Call this from the thread that serves the detectors, between requests.
+
+        Returns
+        -------
+        list of str
+            The names of the detectors whose models were swapped.
+        """
+        swapped = []
+        for name, future in list(self._loading.items()):
+            if not future.done():
+                continue
+            del self._loading[name]
+            detector = self._detectors[name]
+            try:
+                models: Models = future.result()
+            except Exception as e:
+                self.failures += 1
+                self._failed[name] = self._seen[name]
+                logger.warning(f"Keeping the current {name} model: {e}")
+                continue
+            detector.swap(models)
+            self.reloads += 1
+            swapped.append(name)
+            logger.info(f"Reloaded the {name} model{' from its export' if detector.precompiled else ''}")
+        now = time.monotonic()
+        if self.interval > 0 and now >= self._next_check:
+            self._next_check = now + self.interval
+            for name, detector in self._detectors.items():
+                stamp = detector.file_stamp()
+                # Only reload once the files have stopped changing between two checks
+                stable, self._seen[name] = stamp == self._seen[name], stamp
+                if stable and stamp != detector.stamp and stamp != self._failed.get(name):
+                    self._requested.add(name)
+        for name in list(self._requested):
+            if name not in self._loading:
+                self._requested.discard(name)
+                self._loading[name] = self._submit(self._detectors[name])
+        return swapped
+
+    def close(self):
+        """Stop the background thread, abandoning any load in progress."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """Report how many reloads succeeded and failed.
+
+        Returns
+        -------
+        dict
+            The number of models swapped in and of loads that failed.
+        """
+        return {"reloads": self.reloads, "failures": self.failures}
+
+    def _submit(self, detector: Detector) -> Future:
+        """Start loading a detector's model on the background thread.
+
+        Parameters
+        ----------
+        detector : Detector
+            The detector.
+
+        Returns
+        -------
+        Future
+            The load, which gives the models for `Detector.swap`.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-reloader")
+        return self._executor.submit(detector.load)
+
+
+def main():
+    """Ask the running detectors to reload their models."""
+    # Imported here since the package imports this module
+    from drone_ips.detectors import DETECTORS
+
+    parser = argparse.ArgumentParser(description="Ask the running detectors to reload their models.")
+    parser.add_argument(
+        "detectors",
+        nargs="*",
+        help=f"the detectors to reload: {', '.join(DETECTORS)} (default = all of them).",
+    )
+    parser.add_argument("--host", default="localhost", help="the host the detectors run on.")
+    parser.add_argument("--timeout", type=int, default=1000, help="how long (in ms) to wait for each reply.")
+    args = parser.parse_args()
+    unknown = [name for name in args.detectors if name not in DETECTORS]
+    if len(unknown) > 0:
+        parser.error(f"unknown detectors: {', '.join(unknown)}")
+
+    context = zmq.Context()
+    for name in args.detectors or list(DETECTORS):
+        socket = context.socket(zmq.REQ)
+        socket.RCVTIMEO = args.timeout
+        socket.connect(f"tcp://{args.host}:{DETECTORS[name].PORT}")
+        socket.send(json.dumps({"command": protocol.RELOAD, "detector": name}).encode("utf-8"))
+        try:
+            print(f"{name}: {socket.recv().decode('utf-8')}")
+        except zmq.error.Again:
+            print(f"{name}: no reply")
+        socket.close(linger=0)
+    context.term()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""A single server that hosts several machine learning detectors with micro-batched inference."""
+
+import math
+import time
+from collections.abc import Iterable
+from typing import Optional
+
+import zmq
+
+from drone_ips.detectors import protocol
+from drone_ips.detectors.base import Detector
+from drone_ips.detectors.reloader import ModelReloader
+
+# Static types
+Request = tuple[list[bytes], bytes]  # (routing envelope, frame)
+
+
+class DetectorServer:
+    """Host several detectors in one process behind a single zmq ROUTER socket.
+
+    The ROUTER socket is bound to every detector's port, so monitors connect exactly as
+    they would to the standalone detectors, and any number of monitors (vehicles) can
+    share it. Each request is routed to a model by the detector name it carries. Requests
+    that arrive within a short window are grouped, and each model predicts its share of
+    the group with a single vectorized call before the replies are routed back. Models
+    are reloaded between batches when their files change or a "reload" command arrives.
+
+    Parameters
+    ----------
+    detectors : iterable of Detector
+        The loaded detectors to host.
+    batch_window : float, optional
+        How long (in seconds) to wait for more requests after the first one arrives.
+    max_batch : int, optional
+        The most requests to group together.
+    """
+
+    BATCH_WINDOW: float = 0.002
+    MAX_BATCH: int = 64
+    POLL_TIMEOUT: int = 1000
+    ERROR_REPLY: bytes = b"error"
+
+    def __init__(
+        self, detectors: Iterable[Detector], batch_window: Optional[float] = None, max_batch: Optional[int] = None
+    ):
+        self._detectors = {detector.NAME: detector for detector in detectors}
+        self._reloader = ModelReloader(self._detectors.values())
+        self.batch_window = batch_window if batch_window is not None else self.BATCH_WINDOW
+        self.max_batch = max_batch if max_batch is not None else self.MAX_BATCH
+        # Batching statistics
+        self.requests = 0
+        self.batches = 0
+        self.predictions = 0
+        self.largest_batch = 0
+
+    def stats(self) -> dict:
+        """Report how well the requests were batched.
+
+        Returns
+        -------
+        dict
+            The request, batch and prediction counts, the mean and largest batch sizes, and
+            the number of models reloaded.
+        """
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "predictions": self.predictions,
+            "mean_batch": self.requests / self.batches if self.batches > 0 else 0.0,
+            "largest_batch": self.largest_batch,
+            **self._reloader.stats(),
+        }
+
+    def serve(self, ports: Optional[Iterable[int]] = None):
+        """Answer requests from the monitors until interrupted.
+
+        Parameters
+        ----------
+        ports : iterable of int, optional
+            The ports to listen on (every detector's `PORT` if None).
+        """
+        context = zmq.Context()
+        socket = context.socket(zmq.ROUTER)
+        for port in ports if ports is not None else [detector.PORT for detector in self._detectors.values()]:
+            socket.bind(f"tcp://*:{port}")
+        # The models were loaded and warmed up with the detectors, so they can take requests now
+        print(protocol.encode_ready(self._detectors), flush=True)
+
+        while True:
+            try:
+                # Swap in new models between batches if their files changed
+                self._reloader.poll()
+                if not socket.poll(self.POLL_TIMEOUT, zmq.POLLIN):
+                    continue
+                batch = self._receive_batch(socket)
+                for envelope, reply in self.handle(batch):
+                    socket.send_multipart(envelope + [reply])
+            except KeyboardInterrupt:
+                break
+        self._reloader.close()
+        socket.close(linger=0)
+        context.term()
+
+    def handle(self, batch: list[Request]) -> list[tuple[list[bytes], bytes]]:
+        """Answer a group of requests, running each model once over its share of the group.
+
+        Parameters
+        ----------
+        batch : list of tuple
+            The routing envelope and frame of each request.
+
+        Returns
+        -------
+        list of tuple
+            The routing envelope and reply for each request, in the same order.
+        """
+        replies: list[bytes] = [self.ERROR_REPLY] * len(batch)
+        # Requests for each model: (index in the batch, current data, last data, vehicle)
+        groups: dict[str, list[tuple[int, dict, dict, Optional[str]]]] = {}
+        # A reload can change a model's schema, so look them up for every batch
+        schemas = {name: detector.schema for name, detector in self._detectors.items()}
+        for i, (_, frame) in enumerate(batch):
+            try:
+                name, vehicle, command, current_data, last_data = protocol.decode_request(frame, schemas)
+            except ValueError:
+                continue
+            # Answer health probes from the monitor
+            if command == protocol.PING:
+                replies[i] = b"pong"
+                continue
+            # Load every model again in the background, or just the one named
+            if command == protocol.RELOAD:
+                self._reloader.request(name)
+                replies[i] = b"reloading"
+                continue
+            detector = self._route(name)
+            if detector is None:
+                continue
+            # Announce the features this model needs
+            if command == protocol.HELLO:
+                replies[i] = protocol.encode_announcement(detector.schema)
+            elif command is None:
+                groups.setdefault(detector.NAME, []).append((i, current_data, last_data, vehicle))
+        # Run each model once over all of its requests
+        for name, requests in groups.items():
+            verdicts = self._detectors[name].predict_batch([request[1:] for request in requests])
+            self.predictions += 1
+            for (i, *_), verdict in zip(requests, verdicts):
+                if verdict is not None:
+                    replies[i] = bytes(str(verdict), "utf-8")
+        self.requests += len(batch)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        return [(envelope, reply) for (envelope, _), reply in zip(batch, replies)]
+
+    def _receive_batch(self, socket: zmq.Socket) -> list[Request]:
+        """Collect the requests that arrive within the batch window.
+
+        Parameters
+        ----------
+        socket : zmq.Socket
+            The ROUTER socket, which must already have a request waiting.
+
+        Returns
+        -------
+        list of tuple
+            The routing envelope and frame of each request.
+        """
+        batch = [self._split(socket.recv_multipart())]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            # The socket takes a whole number of milliseconds; round up so the window isn't cut short
+            if remaining <= 0 or not socket.poll(math.ceil(remaining * 1000), zmq.POLLIN):
+                break
+            batch.append(self._split(socket.recv_multipart()))
+        return batch
+
+    def _route(self, name: Optional[str]) -> Optional[Detector]:
+        """Find the detector a request is meant for.
+
+        Parameters
+        ----------
+        name : str or None
+            The name of the detector in the request.
+
+        Returns
+        -------
+        Detector or None
+            The detector, or None if the request doesn't name a hosted detector. A request
+            that doesn't name any detector goes to the only one, if only one is hosted.
+        """
+        if name is None and len(self._detectors) == 1:
+            return next(iter(self._detectors.values()))
+        return self._detectors.get(name) if name is not None else None
+
+    @staticmethod
+    def _split(message: list[bytes]) -> Request:
+        """Split a message from the ROUTER socket into its routing envelope and frame.
+
+        Parameters
+        ----------
+        message : list of bytes
+            The message, as received from the ROUTER socket.
+
+        Returns
+        -------
+        tuple of (list of bytes, bytes)
+            The routing envelope (identity and empty delimiter) and the frame.
+        """
+        return message[:-1], message[-1]
@@ -1,6 +1,10 @@
-"""Expose the LogManagerSingleton and CSVLogger classes."""
+"""Expose the LogManagerSingleton, CSVLogger, ColumnarLogger and DeltaLogger classes, and the readers for their logs."""
 
 from .log_manager import LogManagerSingleton
 LogManager: LogManagerSingleton = LogManagerSingleton()
 
-from .csv_logger import CSVLogger
\ No newline at end of file
+from .csv_logger import CSVLogger, DurabilityPolicy, read_csv_log
+from .columnar_logger import ColumnarLogger, read_columnar_log
+from .log_index import read_log_around, read_log_events, read_log_range
+from .delta_logger import DeltaLogger, iter_delta_log, read_delta_log
+from .formats import LOG_FORMATS, read_log
\ No newline at end of file
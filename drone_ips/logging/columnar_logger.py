@@ -0,0 +1,493 @@
+"""A logger that writes telemetry as typed, compressed columnar chunks instead of CSV text."""
+
+import json
+import numbers
+import os
+import pathlib
+import threading
+import time
+from io import TextIOWrapper
+from typing import Any, Optional, Union
+
+import numpy as np
+
+import drone_ips.utils as ips_utils
+from drone_ips.logging import LogManager
+from drone_ips.logging.csv_logger import DurabilityPolicy
+
+# Static types
+Encoded = tuple[dict, Optional[np.ndarray], Optional[np.ndarray]]  # (column metadata, data, mask)
+
+# The type of each kind of column, as it is read back
+_DTYPES: dict[str, Any] = {"bool": np.bool_, "int": np.int64, "float": np.float64, "str": object}
+
+
+class ColumnarLogger:
+    """A drop-in replacement for `CSVLogger` that writes typed, compressed columnar chunks.
+
+    Rows are kept in memory and written out as chunks of `chunk_rows` rows (or whatever
+    arrived in `flush_interval` seconds), each one a compressed .npz file with an array
+    per column: booleans, integers, floats and strings keep their type, missing values
+    are recorded in a mask, empty columns take no space and constant columns are stored
+    once. A log opened as `name.npz` is written as `name.000.npz`, `name.001.npz`, etc.,
+    and every chunk is recorded in the `name.chunks.jsonl` sidecar. Reading it back with
+    `read_columnar_log` is a typed load with no text parsing. Chunks are encoded and
+    written on a background thread, so `log` only keeps a reference to the row.
+
+    The ROW durability policy is rejected: a compressed chunk for every row would leave
+    thousands of tiny files per flight, and there is nothing to append a single row to.
+    Use the CSV or delta format to get every row onto the disk as it is logged.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the log to write.
+    fieldnames : list
+        A list of fieldnames to start the log with.
+    policy : DurabilityPolicy, optional
+        How eagerly chunks are written to the disk, BUFFERED or FSYNC (`POLICY` if None).
+    flush_interval : float, optional
+        The longest (in seconds) a row stays in memory (`FLUSH_INTERVAL` if None).
+    chunk_rows : int, optional
+        The number of rows in a full chunk (`CHUNK_ROWS` if None).
+
+    Raises
+    ------
+    ValueError
+        If the durability policy is ROW.
+    """
+
+    SUFFIX: str = ".npz"
+    MANIFEST_SUFFIX: str = ".chunks.jsonl"
+    POLICY: DurabilityPolicy = DurabilityPolicy.BUFFERED
+    # Bigger chunks compress better and load faster, but a crash loses the rows not yet written
+    FLUSH_INTERVAL: float = 30.0
+    CHUNK_ROWS: int = 5000
+
+    def __init__(
+        self,
+        filename: Optional[str] = None,
+        fieldnames: Optional[list] = None,
+        policy: Optional[Union[DurabilityPolicy, str]] = None,
+        flush_interval: Optional[float] = None,
+        chunk_rows: Optional[int] = None,
+    ):
+        self.logger = LogManager.get_logger("columnar_logger")
+        self.POLICY = DurabilityPolicy(policy) if policy is not None else ColumnarLogger.POLICY
+        if self.POLICY == DurabilityPolicy.ROW:
+            raise ValueError("Columnar logs are written in chunks; use the CSV or delta format to write every row.")
+        self.FLUSH_INTERVAL = flush_interval if flush_interval is not None else ColumnarLogger.FLUSH_INTERVAL
+        self.CHUNK_ROWS = chunk_rows if chunk_rows is not None else ColumnarLogger.CHUNK_ROWS
+        self._manifest_fh: Optional[TextIOWrapper] = None
+        self._fieldnames: list = []
+        self._known_fields: set = set()
+        self._chunks = 0
+        self._pending: list[dict] = []
+        self._pending_lock = threading.Lock()
+        # Only one thread writes chunks at a time
+        self._write_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        # The counters and latency histograms of the current log (see `stats`), reset by `open`
+        self.rows: int = 0
+        self.write_errors: int = 0
+        self.bytes_written: int = 0
+        self.max_pending_rows: int = 0
+        self._log_latency: ips_utils.LatencyHistogram = ips_utils.LatencyHistogram()
+        self._flush_latency: ips_utils.LatencyHistogram = ips_utils.LatencyHistogram()
+        if filename is not None:
+            self.open(filename, fieldnames)
+
+    @property
+    def file_open(self) -> bool:
+        """Check if the log is open.
+
+        Returns
+        -------
+        bool
+            True if the log is open, False otherwise.
+        """
+        return self._manifest_fh is not None and not self._manifest_fh.closed
+
+    @property
+    def chunks(self) -> int:
+        """The number of chunks written to the current log.
+
+        Returns
+        -------
+        int
+            The number of chunks.
+        """
+        return self._chunks
+
+    def log(self, data: dict):
+        """Log a dictionary of key/value pairs.
+
+        Parameters
+        ----------
+        data : dict
+            The data to log.
+        """
+        if not self.file_open:
+            raise RuntimeError("The log file is not open.")
+        start = time.perf_counter()
+        new_fields = [key for key in data.keys() if key not in self._known_fields]
+        if new_fields:
+            self.logger.info(f"Got new fields: {', '.join(new_fields)}")
+            self._fieldnames = self._sort_fieldnames(self._fieldnames + new_fields)
+            self._known_fields.update(new_fields)
+        # The row is only encoded when its chunk is written, so keep a copy that later changes can't reach
+        with self._pending_lock:
+            self._pending.append(dict(data))
+            pending_rows = len(self._pending)
+            self.max_pending_rows = max(self.max_pending_rows, pending_rows)
+        self.rows += 1
+        if pending_rows >= self.CHUNK_ROWS:
+            self._flush_event.set()
+        self._log_latency.record(time.perf_counter() - start)
+
+    def flush(self):
+        """Write every row in memory to the disk now, in chunks of at most `chunk_rows` rows."""
+        with self._write_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+                fieldnames = self._fieldnames
+            for i in range(0, len(rows), self.CHUNK_ROWS):
+                self._write_chunk(rows[i : i + self.CHUNK_ROWS], fieldnames)
+
+    def stats(self) -> dict:
+        """Report how the log is being written.
+
+        Returns
+        -------
+        dict
+            The number of rows, chunks, failed writes and bytes written, the rows waiting in
+            memory (now and at most), and the latency of logging a row and of writing a chunk.
+        """
+        with self._pending_lock:
+            pending_rows = len(self._pending)
+        return {
+            "policy": self.POLICY.value,
+            "rows": self.rows,
+            "chunks": self._chunks,
+            "write_errors": self.write_errors,
+            "bytes_written": self.bytes_written,
+            "pending_rows": pending_rows,
+            "max_pending_rows": self.max_pending_rows,
+            "log_latency": self._log_latency.summary(),
+            "flush_latency": self._flush_latency.summary(),
+        }
+
+    def open(self, filename: Union[str, pathlib.Path], fieldnames: Optional[list] = None):
+        """Close the current log and start a new one with a given filename.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the new log.
+        fieldnames : list, optional
+            A list of fieldnames to start the log with.
+        """
+        self.close()
+        self._fieldnames = self._sort_fieldnames(fieldnames)
+        self._known_fields = set(self._fieldnames)
+        self._chunks = 0
+        self._reset_stats()
+        # Save the absolute path so that it can be found later in the output
+        self._filename = pathlib.Path(filename).resolve()
+        self._manifest_fh = open(manifest_path(self._filename), mode="w", encoding="utf-8")
+        self.logger.info(f"Opened log file: {self._filename}")
+        # Write the chunks out in the background
+        self._stop_event.clear()
+        self._flusher = threading.Thread(target=self._run_flusher, name="columnar-flusher", daemon=True)
+        self._flusher.start()
+
+    def close(self):
+        """Write out every row in memory and close the log when done."""
+        if self._flusher is not None:
+            self._stop_event.set()
+            self._flush_event.set()
+            self._flusher.join()
+            self._flusher = None
+        if self.file_open:
+            self.flush()
+            assert isinstance(self._manifest_fh, TextIOWrapper)  # for mypy
+            self._manifest_fh.close()
+            self.logger.info(
+                f"Closed log file: {self._filename} ({self._chunks} chunks)", extra={"columnar_log": self.stats()}
+            )
+        self._manifest_fh = None
+
+    def _write_chunk(self, rows: list[dict], fieldnames: list):
+        """Encode rows as the next chunk, write it and record it in the sidecar.
+
+        Parameters
+        ----------
+        rows : list of dict
+            The rows.
+        fieldnames : list
+            The fields of the log so far.
+        """
+        start = time.perf_counter()
+        path = chunk_path(self._filename, self._chunks)
+        try:
+            meta, arrays = encode_rows(rows, fieldnames)
+            with open(path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+                if self.POLICY == DurabilityPolicy.FSYNC:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            self.write_errors += 1
+            self.logger.error(f"Failed to write {len(rows)} rows to {path}: {e}")
+            return
+        assert self._manifest_fh is not None  # for mypy
+        self._manifest_fh.write(json.dumps({"chunk": path.name, "rows": meta["rows"], "fields": fieldnames}) + "\n")
+        self._manifest_fh.flush()
+        self._chunks += 1
+        self.bytes_written += path.stat().st_size
+        self._flush_latency.record(time.perf_counter() - start)
+
+    def _sort_fieldnames(self, fieldnames: Optional[list] = None) -> list:
+        """Sort the fieldnames in alphabetical order, after the key, like `CSVLogger`.
+
+        Parameters
+        ----------
+        fieldnames : list, optional
+            A list of fieldnames to sort.
+
+        Returns
+        -------
+        list
+            The sorted list of fieldnames, preserving the key at index 0.
+        """
+        if fieldnames is None or len(fieldnames) == 0:
+            return []
+        sorted_fieldnames = fieldnames[:]
+        if len(sorted_fieldnames) > 2:
+            sorted_fieldnames = [sorted_fieldnames[0]] + sorted(sorted_fieldnames[1:])
+        return sorted_fieldnames
+
+    def _run_flusher(self):
+        """Write a chunk whenever one fills up or the flush interval passes, until the log is closed."""
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+
+    def _reset_stats(self):
+        """Reset the counters and latency histograms for a new log."""
+        self.rows = 0
+        self.write_errors = 0
+        self.bytes_written = 0
+        self.max_pending_rows = 0
+        self._log_latency = ips_utils.LatencyHistogram()
+        self._flush_latency = ips_utils.LatencyHistogram()
+
+
+def encode_column(values: list) -> Encoded:
+    """Encode a column of logged values as a typed array.
+
+    Parameters
+    ----------
+    values : list
+        The values, with None (or an empty string) where the value is missing.
+
+    Returns
+    -------
+    tuple of (dict, np.ndarray or None, np.ndarray or None)
+        The column's metadata (its kind, and its value if it is constant), its data (None
+        if it is empty or constant), and its mask (True where a value is present; None if
+        no value is missing).
+    """
+    present = [value is not None and not (isinstance(value, str) and value == "") for value in values]
+    items = [value for value, ok in zip(values, present) if ok]
+    if len(items) == 0:
+        return {"kind": "null"}, None, None
+    if all(isinstance(value, (bool, np.bool_)) for value in items):
+        kind = "bool"
+    elif all(isinstance(value, numbers.Integral) and not isinstance(value, (bool, np.bool_)) for value in items):
+        kind = "int"
+    elif all(isinstance(value, numbers.Real) for value in items):
+        kind = "float"
+    else:
+        # Text, and anything else, is stored as text, just like in a CSV file
+        kind = "str"
+        items = [str(value) for value in items]
+    data = np.array(items, dtype=_DTYPES[kind] if kind != "str" else str)
+    if len(items) < len(values):
+        mask = np.array(present, dtype=bool)
+        full = np.zeros(len(values), dtype=data.dtype)
+        full[mask] = data
+        return {"kind": kind}, full, mask
+    if len(data) > 1 and bool(np.all(data == data[0])):
+        # Constant columns (versions, home location, etc.) are stored once
+        return {"kind": kind, "value": data[0].item()}, None, None
+    return {"kind": kind}, data, None
+
+
+def decode_column(column: dict, arrays: dict[str, np.ndarray], rows: int) -> np.ndarray:
+    """Decode a column of a chunk into an array ready for pandas.
+
+    Missing values come back as NaN, which makes integer columns with missing values
+    floats and boolean or text columns with missing values objects, as in a CSV file.
+
+    Parameters
+    ----------
+    column : dict
+        The column's entry in the chunk's metadata.
+    arrays : dict
+        The chunk's arrays.
+    rows : int
+        The number of rows in the chunk.
+
+    Returns
+    -------
+    np.ndarray
+        The column.
+    """
+    kind = column["kind"]
+    if kind == "null":
+        return np.full(rows, np.nan)
+    if "value" in column:
+        return np.full(rows, column["value"], dtype=_DTYPES[kind])
+    data = arrays[kind][column["index"]].astype(_DTYPES[kind], copy=False)
+    if "mask" not in column:
+        return data
+    mask = arrays["mask"][column["mask"]]
+    data = data.astype(np.float64 if kind in ("int", "float") else object)
+    data[~mask] = np.nan
+    return data
+
+
+def encode_rows(rows: list[dict], fieldnames: list) -> tuple[dict, dict[str, np.ndarray]]:
+    """Encode rows as a chunk of typed columns.
+
+    The columns of each kind are stacked into one array (and the masks into another), so
+    a chunk holds a handful of arrays however many fields the log has.
+
+    Parameters
+    ----------
+    rows : list of dict
+        The rows.
+    fieldnames : list
+        The fields of the log so far, in order.
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        The chunk's metadata (the number of rows, and where to find each column) and the
+        arrays to save, by kind.
+    """
+    columns = []
+    stacks: dict[str, list[np.ndarray]] = {kind: [] for kind in _DTYPES}
+    masks: list[np.ndarray] = []
+    for name in fieldnames:
+        meta, data, mask = encode_column([row.get(name) for row in rows])
+        column = {"name": name, **meta}
+        if data is not None:
+            column["index"] = len(stacks[meta["kind"]])
+            stacks[meta["kind"]].append(data)
+        if mask is not None:
+            column["mask"] = len(masks)
+            masks.append(mask)
+        columns.append(column)
+    arrays = {kind: np.stack(stack) for kind, stack in stacks.items() if len(stack) > 0}
+    if len(masks) > 0:
+        arrays["mask"] = np.stack(masks)
+    meta = {"rows": len(rows), "columns": columns}
+    arrays["meta"] = np.array(json.dumps(meta))
+    return meta, arrays
+
+
+def manifest_path(filename: Union[str, pathlib.Path]) -> pathlib.Path:
+    """Get the path of the sidecar listing a log's chunks.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with (e.g. "logs/name.npz").
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the sidecar (e.g. "logs/name.chunks.jsonl").
+    """
+    path = pathlib.Path(filename)
+    return path.with_name(path.stem + ColumnarLogger.MANIFEST_SUFFIX)
+
+
+def chunk_path(filename: Union[str, pathlib.Path], index: int) -> pathlib.Path:
+    """Get the path of one of a log's chunks.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with (e.g. "logs/name.npz").
+    index : int
+        The number of the chunk, from 0.
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the chunk (e.g. "logs/name.000.npz").
+    """
+    path = pathlib.Path(filename)
+    return path.with_name(f"{path.stem}.{index:03d}{ColumnarLogger.SUFFIX}")
+
+
+def read_columnar_log(filename: Union[str, pathlib.Path]):
+    """Read a log written by `ColumnarLogger` as one table.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The logged rows, with every field of the log in order.
+    """
+    # Only the tools that read logs back need pandas
+    import pandas as pd
+
+    path = pathlib.Path(filename)
+    with open(manifest_path(path), encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    if len(entries) == 0:
+        return pd.DataFrame()
+    fields = entries[-1]["fields"]
+    parts: dict[str, list[np.ndarray]] = {name: [] for name in fields}
+    for entry in entries:
+        with np.load(path.with_name(entry["chunk"])) as npz:
+            arrays = {key: npz[key] for key in npz.files}
+        meta = json.loads(str(arrays["meta"]))
+        decoded = {column["name"]: decode_column(column, arrays, meta["rows"]) for column in meta["columns"]}
+        for name in fields:
+            # Fields that turned up later have no value in the earlier chunks
+            parts[name].append(decoded[name] if name in decoded else np.full(meta["rows"], np.nan))
+    return pd.DataFrame({name: _concatenate(arrays) for name, arrays in parts.items()}, columns=fields)
+
+
+def _concatenate(arrays: list[np.ndarray]) -> np.ndarray:
+    """Join a column's arrays from each chunk, keeping booleans and text apart from numbers.
+
+    Parameters
+    ----------
+    arrays : list of np.ndarray
+        The column in each chunk.
+
+    Returns
+    -------
+    np.ndarray
+        The whole column.
+    """
+    if len(arrays) == 1:
+        return arrays[0]
+    kinds = {array.dtype.kind for array in arrays}
+    # NumPy would turn booleans into numbers, where a CSV file keeps them as they are
+    if len(kinds) > 1 and kinds & {"b", "O"}:
+        arrays = [array.astype(object) for array in arrays]
+    return np.concatenate(arrays)
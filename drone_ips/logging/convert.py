@@ -0,0 +1,75 @@
+"""Convert CSV telemetry logs to the columnar or delta log format.
+
+Each log is written next to it (or into the output directory) under the same name with
+the format's suffix (`.npz` or `.delta.jsonl`), ready for `read_log`:
+
+    python -m drone_ips.logging.convert test_data/*.csv [-o converted/] [--format delta] [--chunk-rows 5000]
+"""
+
+import argparse
+import pathlib
+from typing import Union
+
+import numpy as np
+
+from drone_ips.logging.columnar_logger import ColumnarLogger
+from drone_ips.logging.csv_logger import read_csv_log
+from drone_ips.logging.delta_logger import DeltaLogger
+
+# The loggers that can be converted to, by format
+FORMATS: dict[str, type] = {"columnar": ColumnarLogger, "delta": DeltaLogger}
+
+
+def convert(filename: pathlib.Path, output: pathlib.Path, writer: Union[ColumnarLogger, DeltaLogger]):
+    """Convert one CSV log to another format.
+
+    Parameters
+    ----------
+    filename : pathlib.Path
+        The CSV log (the name it was opened with, if it was written in segments).
+    output : pathlib.Path
+        The name of the log to write.
+    writer : ColumnarLogger or DeltaLogger
+        The logger to write it with; it is closed when done.
+    """
+    df = read_csv_log(filename)
+    # Empty cells are missing values, as when the row was logged
+    rows = df.replace({np.nan: None}).to_dict(orient="records")
+    writer.open(output, list(df.columns))
+    for row in rows:
+        writer.log(row)
+    writer.close()
+
+
+def main():
+    """Convert each CSV log given on the command line."""
+    parser = argparse.ArgumentParser(description="Convert CSV telemetry logs to the columnar or delta log format.")
+    parser.add_argument("filenames", nargs="+", type=pathlib.Path, help="the CSV logs to convert.")
+    parser.add_argument(
+        "-o", "--output", type=pathlib.Path, help="the directory to write to (default = next to each log)."
+    )
+    parser.add_argument(
+        "--format", choices=list(FORMATS), default="columnar", help="the format to write (default = 'columnar')."
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=ColumnarLogger.CHUNK_ROWS,
+        help=f"the number of rows in each chunk of a columnar log (default = {ColumnarLogger.CHUNK_ROWS}).",
+    )
+    args = parser.parse_args()
+
+    if args.output is not None:
+        args.output.mkdir(parents=True, exist_ok=True)
+    for filename in args.filenames:
+        directory = args.output if args.output is not None else filename.parent
+        writer = ColumnarLogger(chunk_rows=args.chunk_rows) if args.format == "columnar" else DeltaLogger()
+        output = directory / (filename.stem + writer.SUFFIX)
+        convert(filename, output, writer)
+        stats = writer.stats()
+        size = filename.stat().st_size if filename.exists() else 0
+        print(f"Wrote {stats['rows']} rows to {output} ({stats['bytes_written']} bytes, from {size} bytes of CSV)")
+
+
+if __name__ == "__main__":
+    main()
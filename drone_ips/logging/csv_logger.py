@@ -1,27 +1,132 @@
 """A simple CSV logger that logs data to a CSV file."""
 
 import csv
+import io
+import json
+import os
 import pathlib
+import threading
+import time
+from enum import Enum
 from io import TextIOWrapper
-from typing import Optional, Union
+from typing import Any, Optional, Union
 
+import drone_ips.utils as ips_utils
 from drone_ips.logging import LogManager
 
 
+class DurabilityPolicy(Enum):
+    """How eagerly the CSV logger gets rows onto the disk."""
+
+    ROW = "row"  # Write and flush every row as it is logged
+    BUFFERED = "buffered"  # Buffer rows in memory and write them from a background thread
+    FSYNC = "fsync"  # Like BUFFERED, but also sync the file to the disk after every write
+
+
 class CSVLogger:
     """A simple CSV logger that logs data to a CSV file.
 
+    The log is append-only, so writing a row costs the same however many fields turn up
+    late. Rather than rewriting the file when a row brings new fields, the current file
+    is closed and a new segment is started with the wider header: a log opened as
+    `name.csv` is written as `name.000.csv`, `name.001.csv`, etc., and every segment is
+    recorded, with its fields, in the `name.segments.jsonl` sidecar. Use `read_csv_log`
+    to read the segments back as one table, or `python -m drone_ips.logging.merge` to
+    merge them into `name.csv`.
+
+    A segment is also closed once it holds `segment_seconds` of flight or `segment_bytes`
+    of rows, so a long flight is never one huge file. At most every `INDEX_INTERVAL`
+    seconds of flight, and whenever the ML verdict changes to an alarm, the row's
+    timestamp, segment and byte offset are recorded in the `name.index.jsonl` sidecar,
+    so `read_log_range` and `read_log_around` can seek straight to a time range or to
+    the rows around an alarm without reading the rest of the flight.
+
+    Unless the durability policy is ROW, `log` only formats the row into an in-memory
+    buffer; a background thread writes the buffer out every `flush_interval` seconds, or
+    as soon as it holds `flush_bytes`, so the poll loop doesn't wait on the SD card. If
+    the disk falls so far behind that the buffer reaches `MAX_BUFFER_BYTES`, `log`
+    writes it out itself rather than dropping rows. `flush` and `close` always write
+    everything out before returning.
+
     Parameters
     ----------
     filename : str
         The name of the CSV file to log data to.
     fieldnames : list
         A list of fieldnames to use in the CSV file.
+    policy : DurabilityPolicy, optional
+        How eagerly rows are written to the disk (`POLICY` if None).
+    flush_interval : float, optional
+        The longest (in seconds) a row stays in the buffer (`FLUSH_INTERVAL` if None).
+    flush_bytes : int, optional
+        The buffer size (in bytes) that triggers a write (`FLUSH_BYTES` if None).
+    segment_seconds : float, optional
+        The longest (in seconds of flight) a segment spans (`SEGMENT_SECONDS` if None; 0 for no limit).
+    segment_bytes : int, optional
+        The largest (in bytes) a segment grows (`SEGMENT_BYTES` if None; 0 for no limit).
     """
 
-    def __init__(self, filename: Optional[str] = None, fieldnames: Optional[list] = None):
+    SUFFIX: str = ".csv"
+    MANIFEST_SUFFIX: str = ".segments.jsonl"
+    POLICY: DurabilityPolicy = DurabilityPolicy.BUFFERED
+    FLUSH_INTERVAL: float = 1.0
+    FLUSH_BYTES: int = 64 * 1024
+    MAX_BUFFER_BYTES: int = 8 * 1024 * 1024
+    SEGMENT_SECONDS: float = 600.0
+    SEGMENT_BYTES: int = 64 * 1024 * 1024
+    INDEX_SUFFIX: str = ".index.jsonl"
+    INDEX_INTERVAL: float = 1.0
+    # The fields the index is keyed on: the time of each row, and the verdict that marks an alarm
+    INDEX_KEY: str = "timestamp"
+    EVENT_KEY: str = "ml_verdict"
+
+    def __init__(
+        self,
+        filename: Optional[str] = None,
+        fieldnames: Optional[list] = None,
+        policy: Optional[Union[DurabilityPolicy, str]] = None,
+        flush_interval: Optional[float] = None,
+        flush_bytes: Optional[int] = None,
+        segment_seconds: Optional[float] = None,
+        segment_bytes: Optional[int] = None,
+    ):
         self.logger = LogManager.get_logger("csv_logger")
+        self.POLICY = DurabilityPolicy(policy) if policy is not None else CSVLogger.POLICY
+        self.FLUSH_INTERVAL = flush_interval if flush_interval is not None else CSVLogger.FLUSH_INTERVAL
+        self.FLUSH_BYTES = flush_bytes if flush_bytes is not None else CSVLogger.FLUSH_BYTES
+        self.SEGMENT_SECONDS = segment_seconds if segment_seconds is not None else CSVLogger.SEGMENT_SECONDS
+        self.SEGMENT_BYTES = segment_bytes if segment_bytes is not None else CSVLogger.SEGMENT_BYTES
         self._fh: Optional[TextIOWrapper] = None
+        self._manifest_fh: Optional[TextIOWrapper] = None
+        self._index_fh: Optional[TextIOWrapper] = None
+        self._fieldnames: list = []
+        self._known_fields: set = set()
+        self._segments = 0
+        # Rows are formatted into a reusable string buffer, then queued until they are written
+        self._row_buffer = io.StringIO()
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        # Index entries are written after the rows they point to; until then, their offsets count from the first pending row
+        self._pending_index: list[dict] = []
+        # How much of the current segment has been written, and when the segment and the last index entry started
+        self._segment_offset = 0
+        self._segment_start: Optional[float] = None
+        self._last_indexed: Optional[float] = None
+        self._last_event: Any = None
+        self._pending_lock = threading.Lock()
+        # Only one thread writes to the file at a time
+        self._write_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        # The counters and latency histograms of the current log (see `stats`), reset by `open`
+        self.rows: int = 0
+        self.flushes: int = 0
+        self.write_errors: int = 0
+        self.max_pending_rows: int = 0
+        self.max_pending_bytes: int = 0
+        self._log_latency: ips_utils.LatencyHistogram = ips_utils.LatencyHistogram()
+        self._flush_latency: ips_utils.LatencyHistogram = ips_utils.LatencyHistogram()
         if filename is not None:
             self.open(filename, fieldnames)
 
@@ -34,7 +139,18 @@ class CSVLogger:
         bool
             True if the log file is open, False otherwise.
         """
-        return self._fh is not None and not self._fh.closed
+        return self._manifest_fh is not None and not self._manifest_fh.closed
+
+    @property
+    def segments(self) -> int:
+        """The number of segments written to the current log.
+
+        Returns
+        -------
+        int
+            The number of segments.
+        """
+        return self._segments
 
     def log(self, data: dict):
         """Log a dictionary of key/value pairs to the CSV file.
@@ -46,18 +162,90 @@ class CSVLogger:
         """
         if not self.file_open:
             raise RuntimeError("The log file is not open.")
-        assert self._fh is not None  # for mypy
+        start = time.perf_counter()
 
-        new_fields = [key for key in data.keys() if key not in self._fieldnames]
+        new_fields = [key for key in data.keys() if key not in self._known_fields]
 
-        # If new fields are discovered, recreate the log file with updated fieldnames
-        if new_fields:
-            self._update_fieldnames(new_fields)
+        # If new fields are discovered, continue the log in a new segment with the updated fieldnames
+        timestamp = data.get(self.INDEX_KEY)
+        if new_fields or self._fh is None or self._segment_full(timestamp):
+            self._start_segment(new_fields)
+
+        # Fields missing from the data are written as empty strings
+        self._row_buffer.seek(0)
+        self._row_buffer.truncate()
+        self._writer.writerow(data)
+        row = self._row_buffer.getvalue()
+        size = len(row.encode("utf-8")) if not row.isascii() else len(row)
+        entry = self._index_entry(timestamp, data.get(self.EVENT_KEY))
+        with self._pending_lock:
+            if entry is not None:
+                entry["offset"] = self._pending_bytes
+                self._pending_index.append(entry)
+            self._pending.append(row)
+            self._pending_bytes += size
+            pending_bytes = self._pending_bytes
+            self.max_pending_rows = max(self.max_pending_rows, len(self._pending))
+            self.max_pending_bytes = max(self.max_pending_bytes, pending_bytes)
+        self.rows += 1
+        if self.POLICY == DurabilityPolicy.ROW or pending_bytes >= self.MAX_BUFFER_BYTES:
+            self.flush()
+        elif pending_bytes >= self.FLUSH_BYTES:
+            self._flush_event.set()
+        self._log_latency.record(time.perf_counter() - start)
 
-        # Ensure all fieldnames are in the data, filling missing fields with empty strings
-        row = {field: data.get(field, "") for field in self._fieldnames}
-        self._writer.writerow(row)
-        self._fh.flush()
+    def flush(self):
+        """Write every buffered row to the disk now."""
+        with self._write_lock:
+            with self._pending_lock:
+                rows, size, self._pending, self._pending_bytes = self._pending, self._pending_bytes, [], 0
+                entries, self._pending_index = self._pending_index, []
+            if self._fh is None or len(rows) == 0:
+                return
+            start = time.perf_counter()
+            try:
+                # Take the offset from the file, which counts whatever a failed write left behind
+                offset = self._fh.tell()
+                self._fh.write("".join(rows))
+                self._fh.flush()
+                if self.POLICY == DurabilityPolicy.FSYNC:
+                    os.fsync(self._fh.fileno())
+            except OSError as e:
+                self.write_errors += 1
+                self.logger.error(f"Failed to write {len(rows)} rows to {self._fh.name}: {e}")
+                return
+            self._segment_offset = offset + size
+            for entry in entries:
+                entry["offset"] += offset
+            if entries and self._index_fh is not None:
+                self._index_fh.write("".join(json.dumps(entry) + "\n" for entry in entries))
+                self._index_fh.flush()
+            self._flush_latency.record(time.perf_counter() - start)
+            self.flushes += 1
+
+    def stats(self) -> dict:
+        """Report how the log is being written.
+
+        Returns
+        -------
+        dict
+            The number of rows, writes and failed writes, the rows and bytes waiting in the
+            buffer (now and at most), and the latency of logging a row and of each write.
+        """
+        with self._pending_lock:
+            pending_rows, pending_bytes = len(self._pending), self._pending_bytes
+        return {
+            "policy": self.POLICY.value,
+            "rows": self.rows,
+            "flushes": self.flushes,
+            "write_errors": self.write_errors,
+            "pending_rows": pending_rows,
+            "pending_bytes": pending_bytes,
+            "max_pending_rows": self.max_pending_rows,
+            "max_pending_bytes": self.max_pending_bytes,
+            "log_latency": self._log_latency.summary(),
+            "flush_latency": self._flush_latency.summary(),
+        }
 
     def open(self, filename: Union[str, pathlib.Path], fieldnames: Optional[list] = None):
         """Close the current log file and start a new one with a given filename.
@@ -72,27 +260,46 @@ class CSVLogger:
         # Close the current log file if one exists
         self.close()
 
-        # Set the new filename and check if the file exists
         self._fieldnames = self._sort_fieldnames(fieldnames)
-        # Set the filename as a pathlib.Path object
-        if isinstance(filename, str):
-            # Save the absolute path so that it can be found later in the output
-            self._filename = pathlib.Path(filename).resolve()
-        # Open the new file in write mode and set up the CSV writer
-        self._fh = open(self._filename, mode="w", newline="", encoding="utf-8")
+        self._known_fields = set(self._fieldnames)
+        self._segments = 0
+        self._reset_stats()
+        # Save the absolute path so that it can be found later in the output
+        self._filename = pathlib.Path(filename).resolve()
+        # Start the list of segments; the first one is created with the first row, unless the fields are known
+        self._manifest_fh = open(manifest_path(self._filename), mode="w", encoding="utf-8")
+        self._index_fh = open(index_path(self._filename), mode="w", encoding="utf-8")
+        self._last_event = None
         self.logger.info(f"Opened log file: {self._filename}")
-        # Create a new writer
-        self._writer = csv.DictWriter(self._fh, fieldnames=self._fieldnames)
-        # Write the header row
-        self._writer.writeheader()
+        if len(self._fieldnames) > 0:
+            self._start_segment([])
+        # Write the buffered rows out in the background
+        if self.POLICY != DurabilityPolicy.ROW:
+            self._stop_event.clear()
+            self._flusher = threading.Thread(target=self._run_flusher, name="csv-flusher", daemon=True)
+            self._flusher.start()
 
     def close(self):
-        """Close the file when done."""
-        if self.file_open:
-            assert isinstance(self._fh, TextIOWrapper)  # for mypy
+        """Write out every buffered row and close the file when done."""
+        if self._flusher is not None:
+            self._stop_event.set()
+            self._flush_event.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self._fh is not None and not self._fh.closed:
             self._fh.close()
-            self.logger.info(f"Closed log file: {self._filename}")
-            self._fh = None
+        self._fh = None
+        if self.file_open:
+            assert isinstance(self._manifest_fh, TextIOWrapper)  # for mypy
+            self._manifest_fh.close()
+            self.logger.info(
+                f"Closed log file: {self._filename} ({self._segments} segments)", extra={"csv_log": self.stats()}
+            )
+        if self._index_fh is not None:
+            self._index_fh.close()
+        self._manifest_fh = None
+        self._index_fh = None
 
     def _sort_fieldnames(self, fieldnames: Optional[list] = None) -> list:
         """Sort the fieldnames in alphabetical order, after the key.
@@ -114,40 +321,212 @@ class CSVLogger:
             sorted_fieldnames = [sorted_fieldnames[0]] + sorted(sorted_fieldnames[1:])
         return sorted_fieldnames
 
-    def _update_fieldnames(self, new_fields: list):
-        """Update the CSV file with new fieldnames and retain the existing data.
+    def _start_segment(self, new_fields: list):
+        """Close the current segment and start the next one with the new fields added.
 
         Parameters
         ----------
         new_fields : list
             A list of new fields to add to the CSV file.
         """
+        if new_fields:
+            self.logger.info(f"Got new fields: {', '.join(new_fields)}")
+        # Update fieldnames by adding the new fields and sorting them again, after the key
+        self._fieldnames = self._sort_fieldnames(self._fieldnames + new_fields)
+        self._known_fields.update(new_fields)
+        # The rows already logged belong in the old segment
+        self.flush()
+        path = segment_path(self._filename, self._segments)
+        with self._write_lock:
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(path, mode="w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._row_buffer, fieldnames=self._fieldnames, restval="")
+            self._row_buffer.seek(0)
+            self._row_buffer.truncate()
+            self._writer.writeheader()
+            header = self._row_buffer.getvalue()
+            self._fh.write(header)
+        self._segment_offset = len(header.encode("utf-8"))
+        self._segment_start = None
+        self._last_indexed = None
+        # Record the segment before any row goes in it
+        assert self._manifest_fh is not None  # for mypy
+        entry = {"segment": path.name, "fields": self._fieldnames, "new_fields": new_fields}
+        self._manifest_fh.write(json.dumps(entry) + "\n")
+        self._manifest_fh.flush()
+        self._segments += 1
+
+    def _segment_full(self, timestamp: Any) -> bool:
+        """Check if the current segment has reached its time or size limit.
+
+        Parameters
+        ----------
+        timestamp : float
+            The timestamp of the row about to be logged, if it has one.
+
+        Returns
+        -------
+        bool
+            True if the row should start a new segment.
+        """
+        if self.SEGMENT_BYTES > 0 and self._segment_offset + self._pending_bytes >= self.SEGMENT_BYTES:
+            return True
+        if self.SEGMENT_SECONDS > 0 and self._segment_start is not None and isinstance(timestamp, (int, float)):
+            return timestamp - self._segment_start >= self.SEGMENT_SECONDS
+        return False
+
+    def _index_entry(self, timestamp: Any, verdict: Any) -> Optional[dict]:
+        """Decide if the row about to be logged goes in the index, and make its entry.
+
+        The first row of each segment is indexed, then a row at most every `INDEX_INTERVAL`
+        seconds, and every row where the verdict changes to an alarm (a non-zero verdict).
+
+        Parameters
+        ----------
+        timestamp : float
+            The timestamp of the row, if it has one.
+        verdict : int
+            The ML verdict of the row, if it has one.
+
+        Returns
+        -------
+        dict or None
+            The row's timestamp, segment, byte offset and row number (and its verdict, if it
+            is an alarm), or None if the row isn't indexed.
+        """
+        if not isinstance(timestamp, (int, float)):
+            return None
+        if self._segment_start is None:
+            self._segment_start = timestamp
+        event = verdict if verdict and verdict != self._last_event else None
+        self._last_event = verdict
+        if event is None and self._last_indexed is not None and timestamp - self._last_indexed < self.INDEX_INTERVAL:
+            return None
+        # The offset is filled in as the row is queued, and made absolute once it is written
+        entry = {"t": timestamp, "segment": self._segments - 1, "offset": 0, "row": self.rows}
+        if event is not None:
+            entry["event"] = event
+        else:
+            self._last_indexed = timestamp
+        return entry
+
+    def _run_flusher(self):
+        """Write the buffer out whenever it fills up or the flush interval passes, until the log is closed."""
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+
+    def _reset_stats(self):
+        """Reset the counters and latency histograms for a new log."""
+        self.rows = 0
+        self.flushes = 0
+        self.write_errors = 0
+        self.max_pending_rows = 0
+        self.max_pending_bytes = 0
+        self._log_latency = ips_utils.LatencyHistogram()
+        self._flush_latency = ips_utils.LatencyHistogram()
+
+
+def manifest_path(filename: Union[str, pathlib.Path]) -> pathlib.Path:
+    """Get the path of the sidecar listing a log's segments.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with (e.g. "logs/name.csv").
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the sidecar (e.g. "logs/name.segments.jsonl").
+    """
+    path = pathlib.Path(filename)
+    return path.with_name(path.stem + CSVLogger.MANIFEST_SUFFIX)
+
+
+def segment_path(filename: Union[str, pathlib.Path], index: int) -> pathlib.Path:
+    """Get the path of one of a log's segments.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with (e.g. "logs/name.csv").
+    index : int
+        The number of the segment, from 0.
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the segment (e.g. "logs/name.000.csv").
+    """
+    path = pathlib.Path(filename)
+    return path.with_name(f"{path.stem}.{index:03d}{path.suffix}")
+
+
+def index_path(filename: Union[str, pathlib.Path]) -> pathlib.Path:
+    """Get the path of the sidecar indexing a log's rows by time.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with (e.g. "logs/name.csv").
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the index (e.g. "logs/name.index.jsonl").
+    """
+    path = pathlib.Path(filename)
+    return path.with_name(path.stem + CSVLogger.INDEX_SUFFIX)
+
+
+def read_manifest(filename: Union[str, pathlib.Path]) -> list[dict]:
+    """Read the list of a log's segments from its sidecar.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with.
+
+    Returns
+    -------
+    list of dict
+        The name, fields and new fields of each segment, in order.
+    """
+    with open(manifest_path(filename), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_csv_log(filename: Union[str, pathlib.Path], **kwargs: Any):
+    """Read a log written by `CSVLogger` as one table, merging its segments.
+
+    The merged table has every field of the last segment, in order; rows from earlier
+    segments have no value for the fields that appeared later. A plain CSV file (e.g. a
+    merged log, or one written before logs were segmented) is read as it is.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with.
+    **kwargs : dict
+        Keyword arguments for `pandas.read_csv`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The logged rows.
+    """
+    # Only the tools that read logs back need pandas
+    import pandas as pd
 
-        self.logger.info(f"Got new fields: {', '.join(new_fields)}")
-        # Update fieldnames by appending new fields to the original fieldnames
-        updated_fieldnames = self._fieldnames + new_fields
-
-        # Read the existing data
-        with open(self._filename, mode="r", newline="", encoding="utf-8") as file:
-            reader = csv.DictReader(file, fieldnames=self._fieldnames)
-            rows = list(reader)
-        # Skip the header row
-        if len(rows) > 0:
-            for k, v in rows[0].items():
-                # In the header row, the key and value are the same
-                # If any values are different, this isn't a duplicate header
-                if k != v:
-                    break
-            else:
-                if len(rows) > 1:
-                    rows = rows[1:]
-                else:
-                    rows = []
-
-        # Re-open the file using the new fields
-        self.open(self._filename, updated_fieldnames)
-
-        # Write back the old data with the new fieldnames (fill missing fields with empty strings)
-        for row in rows:
-            updated_row = {field: row.get(field, "") for field in updated_fieldnames}
-            self._writer.writerow(updated_row)
+    path = pathlib.Path(filename)
+    if not manifest_path(path).exists():
+        return pd.read_csv(path, **kwargs)
+    entries = read_manifest(path)
+    frames = [pd.read_csv(path.with_name(entry["segment"]), **kwargs) for entry in entries]
+    if len(frames) == 0:
+        return pd.DataFrame()
+    columns = entries[-1]["fields"]
+    return pd.concat(frames, ignore_index=True, sort=False).reindex(columns=columns)
@@ -0,0 +1,332 @@
+"""A logger that only writes the fields that changed since the previous row."""
+
+import json
+import os
+import pathlib
+import threading
+import time
+from collections.abc import Iterator
+from io import TextIOWrapper
+from typing import Any, Optional, Union
+
+import drone_ips.utils as ips_utils
+from drone_ips.logging import LogManager
+from drone_ips.logging.csv_logger import DurabilityPolicy
+
+
+class DeltaLogger:
+    """A drop-in replacement for `CSVLogger` that delta-encodes the rows.
+
+    Most fields (versions, the home location, the number of commands, etc.) hardly ever
+    change during a flight, so each row is written as a JSON line holding only the fields
+    that changed since the previous row, as a flat list of `[position, value, ...]` pairs
+    (a missing value is null). Every `keyframe_rows` rows, at the start of a log and
+    whenever new fields turn up, a keyframe holding the field names and every value is
+    written instead, so a log can be decoded from any keyframe and a damaged line only
+    spoils the rows up to the next one. Use `read_delta_log` (or `iter_delta_log`) to
+    rebuild the full rows.
+
+    Lines are buffered and written from a background thread, exactly as `CSVLogger` does.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the log to write.
+    fieldnames : list
+        A list of fieldnames to start the log with.
+    policy : DurabilityPolicy, optional
+        How eagerly rows are written to the disk (`POLICY` if None).
+    flush_interval : float, optional
+        The longest (in seconds) a row stays in the buffer (`FLUSH_INTERVAL` if None).
+    keyframe_rows : int, optional
+        The number of rows from one keyframe to the next (`KEYFRAME_ROWS` if None).
+    """
+
+    SUFFIX: str = ".delta.jsonl"
+    POLICY: DurabilityPolicy = DurabilityPolicy.BUFFERED
+    FLUSH_INTERVAL: float = 1.0
+    FLUSH_BYTES: int = 64 * 1024
+    MAX_BUFFER_BYTES: int = 8 * 1024 * 1024
+    KEYFRAME_ROWS: int = 600
+
+    def __init__(
+        self,
+        filename: Optional[str] = None,
+        fieldnames: Optional[list] = None,
+        policy: Optional[Union[DurabilityPolicy, str]] = None,
+        flush_interval: Optional[float] = None,
+        keyframe_rows: Optional[int] = None,
+    ):
+        self.logger = LogManager.get_logger("delta_logger")
+        self.POLICY = DurabilityPolicy(policy) if policy is not None else DeltaLogger.POLICY
+        self.FLUSH_INTERVAL = flush_interval if flush_interval is not None else DeltaLogger.FLUSH_INTERVAL
+        self.KEYFRAME_ROWS = keyframe_rows if keyframe_rows is not None else DeltaLogger.KEYFRAME_ROWS
+        self._fh: Optional[TextIOWrapper] = None
+        # The fields of the log in the order they turned up, and the last row's values, to compare the next one against
+        self._fields: list = []
+        self._known_fields: set = set()
+        self._previous: list = []
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        self._pending_lock = threading.Lock()
+        # Only one thread writes to the file at a time
+        self._write_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        # The counters and latency histograms of the current log (see `stats`), reset by `open`
+        self.rows: int = 0
+        self.keyframes: int = 0
+        self.flushes: int = 0
+        self.write_errors: int = 0
+        self.fields_logged: int = 0
+        self.fields_written: int = 0
+        self.bytes_written: int = 0
+        self.max_pending_rows: int = 0
+        self._log_latency: ips_utils.LatencyHistogram = ips_utils.LatencyHistogram()
+        self._flush_latency: ips_utils.LatencyHistogram = ips_utils.LatencyHistogram()
+        if filename is not None:
+            self.open(filename, fieldnames)
+
+    @property
+    def file_open(self) -> bool:
+        """Check if the log file is open.
+
+        Returns
+        -------
+        bool
+            True if the log file is open, False otherwise.
+        """
+        return self._fh is not None and not self._fh.closed
+
+    def log(self, data: dict):
+        """Log a dictionary of key/value pairs.
+
+        Parameters
+        ----------
+        data : dict
+            The data to log; fields with no value (None) are left out, as in a CSV file.
+        """
+        if not self.file_open:
+            raise RuntimeError("The log file is not open.")
+        start = time.perf_counter()
+        new_fields = [key for key in data.keys() if key not in self._known_fields]
+        if new_fields:
+            self.logger.info(f"Got new fields: {', '.join(new_fields)}")
+            self._fields = self._fields + new_fields
+            self._known_fields.update(new_fields)
+        values = [data.get(name) for name in self._fields]
+        line: Union[dict, list]
+        if new_fields or self.rows % self.KEYFRAME_ROWS == 0:
+            line = {"f": self._fields, "k": values}
+            self.keyframes += 1
+            self.fields_written += len(values)
+        else:
+            line = []
+            for i, (value, previous) in enumerate(zip(values, self._previous)):
+                if not _same(value, previous):
+                    line += [i, value]
+            self.fields_written += len(line) // 2
+        self._previous = values
+        self.fields_logged += len(values)
+        text = json.dumps(line, separators=(",", ":"), default=str) + "\n"
+        with self._pending_lock:
+            self._pending.append(text)
+            self._pending_bytes += len(text)
+            pending_bytes = self._pending_bytes
+            self.max_pending_rows = max(self.max_pending_rows, len(self._pending))
+        self.rows += 1
+        if self.POLICY == DurabilityPolicy.ROW or pending_bytes >= self.MAX_BUFFER_BYTES:
+            self.flush()
+        elif pending_bytes >= self.FLUSH_BYTES:
+            self._flush_event.set()
+        self._log_latency.record(time.perf_counter() - start)
+
+    def flush(self):
+        """Write every buffered row to the disk now."""
+        with self._write_lock:
+            with self._pending_lock:
+                lines, self._pending, self._pending_bytes = self._pending, [], 0
+            if self._fh is None or len(lines) == 0:
+                return
+            start = time.perf_counter()
+            try:
+                text = "".join(lines)
+                self._fh.write(text)
+                self._fh.flush()
+                if self.POLICY == DurabilityPolicy.FSYNC:
+                    os.fsync(self._fh.fileno())
+            except OSError as e:
+                self.write_errors += 1
+                self.logger.error(f"Failed to write {len(lines)} rows to {self._fh.name}: {e}")
+                return
+            self.bytes_written += len(text.encode("utf-8"))
+            self._flush_latency.record(time.perf_counter() - start)
+            self.flushes += 1
+
+    def stats(self) -> dict:
+        """Report how the log is being written.
+
+        Returns
+        -------
+        dict
+            The number of rows, keyframes, writes and failed writes, the number of values
+            logged and actually written, the bytes written, the rows waiting in the buffer
+            (at most), and the latency of logging a row and of each write.
+        """
+        return {
+            "policy": self.POLICY.value,
+            "rows": self.rows,
+            "keyframes": self.keyframes,
+            "flushes": self.flushes,
+            "write_errors": self.write_errors,
+            "fields_logged": self.fields_logged,
+            "fields_written": self.fields_written,
+            "bytes_written": self.bytes_written,
+            "max_pending_rows": self.max_pending_rows,
+            "log_latency": self._log_latency.summary(),
+            "flush_latency": self._flush_latency.summary(),
+        }
+
+    def open(self, filename: Union[str, pathlib.Path], fieldnames: Optional[list] = None):
+        """Close the current log file and start a new one with a given filename.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the new log file.
+        fieldnames : list, optional
+            A list of fieldnames to start the log with.
+        """
+        self.close()
+        self._fields = list(fieldnames) if fieldnames is not None else []
+        self._known_fields = set(self._fields)
+        self._previous = []
+        self._reset_stats()
+        # Save the absolute path so that it can be found later in the output
+        self._filename = pathlib.Path(filename).resolve()
+        self._fh = open(self._filename, mode="w", encoding="utf-8")
+        self.logger.info(f"Opened log file: {self._filename}")
+        # Write the buffered rows out in the background
+        if self.POLICY != DurabilityPolicy.ROW:
+            self._stop_event.clear()
+            self._flusher = threading.Thread(target=self._run_flusher, name="delta-flusher", daemon=True)
+            self._flusher.start()
+
+    def close(self):
+        """Write out every buffered row and close the file when done."""
+        if self._flusher is not None:
+            self._stop_event.set()
+            self._flush_event.set()
+            self._flusher.join()
+            self._flusher = None
+        if self.file_open:
+            self.flush()
+            assert isinstance(self._fh, TextIOWrapper)  # for mypy
+            self._fh.close()
+            self.logger.info(
+                f"Closed log file: {self._filename} ({self.rows} rows, {self.keyframes} keyframes)",
+                extra={"delta_log": self.stats()},
+            )
+        self._fh = None
+
+    def _run_flusher(self):
+        """Write the buffer out whenever it fills up or the flush interval passes, until the log is closed."""
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+
+    def _reset_stats(self):
+        """Reset the counters and latency histograms for a new log."""
+        self.rows = 0
+        self.keyframes = 0
+        self.flushes = 0
+        self.write_errors = 0
+        self.fields_logged = 0
+        self.fields_written = 0
+        self.bytes_written = 0
+        self.max_pending_rows = 0
+        self._log_latency = ips_utils.LatencyHistogram()
+        self._flush_latency = ips_utils.LatencyHistogram()
+
+
+def _same(value: Any, previous: Any) -> bool:
+    """Check if a field kept its value, telling apart values that compare equal but read back differently.
+
+    Parameters
+    ----------
+    value : Any
+        The new value.
+    previous : Any
+        The previous value.
+
+    Returns
+    -------
+    bool
+        True if the value didn't change.
+    """
+    # True == 1 and 1 == 1.0, but they are written (and read back) differently
+    return type(value) is type(previous) and value == previous
+
+
+def iter_delta_log(filename: Union[str, pathlib.Path]) -> Iterator[dict]:
+    """Rebuild the full rows of a log written by `DeltaLogger`, one at a time.
+
+    A line that can't be decoded (e.g. the last one, if the program was killed while
+    writing it) spoils the rows up to the next keyframe, which are skipped.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The log.
+
+    Yields
+    ------
+    dict
+        Each logged row, with every field of the log so far (None where it has no value).
+    """
+    logger = LogManager.get_logger("delta_logger")
+    fields: list = []
+    values: Optional[list] = None
+    with open(filename, encoding="utf-8") as f:
+        for number, text in enumerate(f, start=1):
+            try:
+                line = json.loads(text)
+                if isinstance(line, dict):
+                    fields, values = line["f"], line["k"]
+                elif values is not None:
+                    for i in range(0, len(line), 2):
+                        values[line[i]] = line[i + 1]
+            except (json.JSONDecodeError, KeyError, IndexError, TypeError):
+                logger.warning(f"Skipping the rows up to the next keyframe after line {number} of {filename}")
+                values = None
+            if values is not None:
+                yield dict(zip(fields, values))
+
+
+def read_delta_log(filename: Union[str, pathlib.Path]):
+    """Read a log written by `DeltaLogger` as one table of full rows.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The log.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The logged rows, with every field of the log, sorted after the key as in a CSV log.
+    """
+    # Only the tools that read logs back need pandas
+    import numpy as np
+    import pandas as pd
+
+    rows = list(iter_delta_log(filename))
+    # The fields only ever grow, so the last row has them all
+    names = list(rows[-1]) if len(rows) > 0 else []
+    if len(names) > 2:
+        names = [names[0]] + sorted(names[1:])
+    df = pd.DataFrame.from_records(rows, columns=names)
+    # Missing values read back as NaN, as they do from a CSV file; `fillna` would quietly downcast the object columns
+    return df.where(df.notna(), np.nan).infer_objects()
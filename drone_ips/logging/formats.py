@@ -0,0 +1,39 @@
+"""The formats telemetry logs can be written in, and a reader that handles any of them."""
+
+import pathlib
+from typing import Any, Union
+
+from drone_ips.logging import columnar_logger, csv_logger, delta_logger
+from drone_ips.logging.columnar_logger import ColumnarLogger
+from drone_ips.logging.csv_logger import CSVLogger
+from drone_ips.logging.delta_logger import DeltaLogger
+
+# The loggers for each log format, by name
+LOG_FORMATS: dict[str, type] = {
+    "csv": CSVLogger,
+    "columnar": ColumnarLogger,
+    "delta": DeltaLogger,
+}
+
+
+def read_log(filename: Union[str, pathlib.Path], **kwargs: Any):
+    """Read a telemetry log as one table, whatever format it was written in.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with, or a plain CSV file.
+    **kwargs : dict
+        Keyword arguments for `pandas.read_csv`, for CSV logs.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The logged rows.
+    """
+    path = pathlib.Path(filename)
+    if path.name.endswith(DeltaLogger.SUFFIX):
+        return delta_logger.read_delta_log(path)
+    if path.suffix == ColumnarLogger.SUFFIX or columnar_logger.manifest_path(path).exists():
+        return columnar_logger.read_columnar_log(path)
+    return csv_logger.read_csv_log(path, **kwargs)
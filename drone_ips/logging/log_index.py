@@ -0,0 +1,144 @@
+"""Read parts of a CSV log by time, using its index, without reading the rest of the flight."""
+
+import bisect
+import io
+import json
+import pathlib
+from typing import Any, Optional, Union
+
+from drone_ips.logging.csv_logger import CSVLogger, index_path, read_manifest
+
+
+def read_index(filename: Union[str, pathlib.Path]) -> list[dict]:
+    """Read a log's index.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with.
+
+    Returns
+    -------
+    list of dict
+        The timestamp, segment, byte offset and row number of each indexed row (and its
+        verdict, for alarms), in the order they were logged.
+    """
+    with open(index_path(filename), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_log_events(filename: Union[str, pathlib.Path]) -> list[dict]:
+    """List the alarms in a log: the rows where the ML verdict changed to a non-zero value.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with.
+
+    Returns
+    -------
+    list of dict
+        The index entry of each alarm; "t" is its timestamp and "event" its verdict.
+    """
+    return [entry for entry in read_index(filename) if "event" in entry]
+
+
+def read_log_range(filename: Union[str, pathlib.Path], start: float, end: float, **kwargs: Any):
+    """Read the rows logged between two times.
+
+    The index gives the segment and byte offset of the last indexed row before `start`
+    and the first one after `end`, so only the bytes between them are read and parsed.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with.
+    start : float
+        The first timestamp to read.
+    end : float
+        The last timestamp to read.
+    **kwargs : dict
+        Keyword arguments for `pandas.read_csv`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The rows with `start <= timestamp <= end`, with the fields of the last segment read.
+    """
+    # Only the tools that read logs back need pandas
+    import pandas as pd
+
+    path = pathlib.Path(filename)
+    segments = read_manifest(path)
+    # Alarms are indexed out of step with the regular entries, but every entry is a place to start reading
+    entries = sorted(read_index(path), key=lambda entry: entry["row"])
+    if len(segments) == 0 or len(entries) == 0:
+        return pd.DataFrame()
+    times = [entry["t"] for entry in entries]
+    first = entries[max(bisect.bisect_right(times, start) - 1, 0)]
+    stop = bisect.bisect_right(times, end)
+    last: Optional[dict] = entries[stop] if stop < len(entries) else None
+    last_segment = last["segment"] if last is not None else len(segments) - 1
+
+    frames = []
+    for segment in range(first["segment"], last_segment + 1):
+        offset = first["offset"] if segment == first["segment"] else None
+        until = last["offset"] if last is not None and segment == last["segment"] else None
+        frames.append(_read_segment(path.with_name(segments[segment]["segment"]), offset, until, **kwargs))
+    # A range that ends just before a segment boundary reads no rows from the next segment, and concatenating
+    # that empty frame would turn every column into objects
+    frames = [frame for frame in frames if len(frame) > 0] or frames[:1]
+    df = pd.concat(frames, ignore_index=True, sort=False).reindex(columns=segments[last_segment]["fields"])
+    timestamps = df[CSVLogger.INDEX_KEY]
+    return df[(timestamps >= start) & (timestamps <= end)].reset_index(drop=True)
+
+
+def read_log_around(filename: Union[str, pathlib.Path], timestamp: float, before: float = 10.0, after: float = 10.0):
+    """Read the rows logged around a moment, such as an alarm from `read_log_events`.
+
+    Parameters
+    ----------
+    filename : str or pathlib.Path
+        The name the log was opened with.
+    timestamp : float
+        The moment to read around.
+    before : float, optional
+        The number of seconds to read before it.
+    after : float, optional
+        The number of seconds to read after it.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The rows from `timestamp - before` to `timestamp + after`.
+    """
+    return read_log_range(filename, timestamp - before, timestamp + after)
+
+
+def _read_segment(path: pathlib.Path, offset: Optional[int] = None, until: Optional[int] = None, **kwargs: Any):
+    """Read the rows of a segment between two byte offsets.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The segment.
+    offset : int, optional
+        Where to start reading (just after the header if None).
+    until : int, optional
+        Where to stop reading (the end of the segment if None).
+    **kwargs : dict
+        Keyword arguments for `pandas.read_csv`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The rows.
+    """
+    import pandas as pd
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        if offset is not None:
+            f.seek(offset)
+        rows = f.read(max(until - f.tell(), 0)) if until is not None else f.read()
+    return pd.read_csv(io.BytesIO(header + rows), **kwargs)
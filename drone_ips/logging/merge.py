@@ -0,0 +1,31 @@
+"""Merge the segments of a CSV log (or the chunks of a columnar log) into a single CSV file.
+
+Run it on the name the log was opened with (the segments or chunks and their sidecar are
+found next to it):
+
+    python -m drone_ips.logging.merge logs/<date>_data.csv [-o merged.csv]
+"""
+
+import argparse
+import pathlib
+
+from drone_ips.logging.formats import read_log
+
+
+def main():
+    """Merge a log's segments and write them out as one CSV file."""
+    parser = argparse.ArgumentParser(description="Merge the segments or chunks of a log into a single CSV file.")
+    parser.add_argument("filename", type=pathlib.Path, help="the name the log was opened with.")
+    parser.add_argument(
+        "-o", "--output", type=pathlib.Path, help="the file to write (default = the log's name, as .csv)."
+    )
+    args = parser.parse_args()
+
+    df = read_log(args.filename)
+    output = args.output if args.output is not None else args.filename.with_suffix(".csv")
+    df.to_csv(output, index=False)
+    print(f"Wrote {len(df)} rows and {len(df.columns)} columns to {output}")
+
+
+if __name__ == "__main__":
+    main()
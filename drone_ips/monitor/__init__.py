@@ -1,4 +1,11 @@
 """Export Monitor and TestManager classes."""
 
+from .detector_client import CircuitState, DetectorClient
+from .detector_supervisor import DetectorSupervisor
+from .health_sampler import ComputerHealthSampler
 from .mavlink_router import MAVLinkManager
+from .ml_dispatcher import MLDispatcher
 from .monitor import ML_Ports, Monitor
+from .scheduler import FixedRateScheduler, OverrunPolicy
+from .telemetry_schema import TelemetrySchema
+from .telemetry_store import TelemetryStore
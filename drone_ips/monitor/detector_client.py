@@ -0,0 +1,327 @@
+"""Self-healing client for a single machine learning detector."""
+
+import json
+import threading
+from collections import deque
+from enum import Enum
+from typing import Optional
+
+import numpy as np
+import zmq
+
+import drone_ips.logging as ips_logging
+from drone_ips.detectors import protocol
+
+
+class CircuitState(Enum):
+    """The state of a detector's circuit breaker."""
+
+    CLOSED = "closed"  # The detector is healthy and is queried every tick
+    OPEN = "open"  # The detector is unresponsive and is skipped until a probe succeeds
+
+
+class DetectorClient:
+    """A self-healing client for a single machine learning detector.
+
+    A zmq REQ socket that misses a reply is stuck waiting for it, so every later send
+    fails. This client follows the "lazy pirate" pattern: after a timeout the socket
+    is closed and rebuilt. After several consecutive timeouts the circuit breaker opens
+    and the detector is skipped entirely, costing nothing per tick, while a background
+    thread probes it until it answers again.
+
+    The first request to a detector is a "hello" handshake, in which the detector
+    announces the features it needs, so the first tick gets no verdict from it. From then
+    on only those features are sent, packed into a binary float64 frame (plus the announced
+    history window). Detectors that don't announce a schema are sent the full telemetry as
+    JSON instead. The background probe repeats the handshake, in case the detector was
+    restarted, so a recovery doesn't cost a tick.
+
+    Every tick goes into the history window (see `record`), including those the detector
+    isn't asked about because its verdict was cached, a rule decided it, or its circuit
+    was open, so the window never has gaps.
+
+    Parameters
+    ----------
+    port : int
+        The port the detector listens on.
+    context : zmq.Context, optional
+        The zmq context to create sockets from (the global instance if None).
+    name : str, optional
+        The name of the detector, sent in every request (the port number if None).
+    vehicle : str, optional
+        The ID of the vehicle, sent with the telemetry so the detector can keep state per vehicle.
+    """
+
+    FAILURE_THRESHOLD: int = 3
+    PROBE_INTERVAL: float = 1.0
+    PROBE_TIMEOUT: int = 500
+
+    def __init__(
+        self,
+        port: int,
+        context: Optional[zmq.Context] = None,
+        name: Optional[str] = None,
+        vehicle: Optional[str] = None,
+    ):
+        self._logger = ips_logging.LogManager.get_logger(f"detector_client.{port}")
+        self.port = int(port)
+        self.name = name if name is not None else str(self.port)
+        self.vehicle = vehicle
+        self._hello_message = protocol.encode_command(protocol.HELLO, self.name)
+        self._context = context if context is not None else zmq.Context.instance()
+        self._socket: Optional[zmq.Socket] = None
+        self._awaiting_reply = False
+        self._state = CircuitState.CLOSED
+        self._closed = threading.Event()
+        self._probe_thread: Optional[threading.Thread] = None
+        # Negotiated protocol
+        self._schema: Optional[protocol.FeatureSchema] = None
+        self._negotiated = False
+        self._awaiting_hello = False
+        self._history: deque[np.ndarray] = deque(maxlen=0)
+        # The current tick's packed row, once encoded, and the probe's handshake reply, once it recovers
+        self._row: Optional[np.ndarray] = None
+        self._probe_reply: Optional[bytes] = None
+        # Health counters
+        self._consecutive_failures = 0
+        self.requests = 0
+        self.replies = 0
+        self.timeouts = 0
+        self.circuit_trips = 0
+        self._connect()
+
+    @property
+    def available(self) -> bool:
+        """Check if the detector should be queried this tick.
+
+        Returns
+        -------
+        bool
+            True if the circuit breaker is closed, False otherwise.
+        """
+        return self._state == CircuitState.CLOSED and not self._closed.is_set()
+
+    @property
+    def schema(self) -> Optional[protocol.FeatureSchema]:
+        """The features the detector announced in the handshake.
+
+        Returns
+        -------
+        protocol.FeatureSchema or None
+            The announced schema, or None if the detector is sent JSON.
+        """
+        return self._schema
+
+    @property
+    def socket(self) -> zmq.Socket:
+        """The socket currently used to talk to the detector.
+
+        Returns
+        -------
+        zmq.Socket
+            The socket currently used to talk to the detector.
+        """
+        assert self._socket is not None  # for mypy
+        return self._socket
+
+    @property
+    def state(self) -> CircuitState:
+        """The state of the circuit breaker.
+
+        Returns
+        -------
+        CircuitState
+            The state of the circuit breaker.
+        """
+        return self._state
+
+    def encode(self, current_data: dict, last_data: Optional[dict] = None) -> bytes:
+        """Encode the telemetry for the detector, or the handshake if it hasn't been done yet.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        last_data : dict, optional
+            The previous data from the vehicle, only sent to detectors that use JSON.
+
+        Returns
+        -------
+        bytes
+            The encoded request.
+        """
+        # Adopt the schema announced to the probe here, so it never changes while a tick is recorded
+        if self._probe_reply is not None:
+            reply, self._probe_reply = self._probe_reply, None
+            self._accept_announcement(reply)
+        self._awaiting_hello = not self._negotiated
+        if self._awaiting_hello:
+            return self._hello_message
+        if self._schema is None:
+            return protocol.encode_json(self.name, current_data, last_data, self.vehicle)
+        self._row = self._schema.pack(current_data)
+        return protocol.encode_features(self.name, np.vstack((self._row, *self._history)), self.vehicle)
+
+    def record(self, current_data: dict):
+        """Add a tick to the history window sent with the next requests, whether or not it was sent itself.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        """
+        row, self._row = self._row, None
+        if self._schema is None or self._history.maxlen == 0:
+            return
+        self._history.appendleft(row if row is not None else self._schema.pack(current_data))
+
+    def send(self, message: bytes) -> bool:
+        """Send a request to the detector without waiting for the reply.
+
+        Parameters
+        ----------
+        message : bytes
+            The encoded request to send.
+
+        Returns
+        -------
+        bool
+            True if the request was sent, False if the detector is unavailable or the send failed.
+        """
+        if not self.available:
+            return False
+        # A reply from an earlier request was never collected, so the socket can't be reused
+        if self._awaiting_reply:
+            self.mark_timeout()
+            if not self.available:
+                return False
+        try:
+            self.socket.send(message, zmq.NOBLOCK)
+        except zmq.ZMQError as e:
+            self._logger.warning(f"Failed to send to port {self.port}: {e}")
+            self.mark_timeout()
+            return False
+        self._awaiting_reply = True
+        self.requests += 1
+        return True
+
+    def receive(self) -> Optional[bytes]:
+        """Receive the reply to the last request, which must already be waiting on the socket.
+
+        Returns
+        -------
+        bytes or None
+            The reply from the detector, or None if it could not be read or was the handshake.
+        """
+        try:
+            reply = self.socket.recv(zmq.NOBLOCK)
+        except zmq.ZMQError as e:
+            self._logger.warning(f"Failed to receive from port {self.port}: {e}")
+            self.mark_timeout()
+            return None
+        self._awaiting_reply = False
+        self._consecutive_failures = 0
+        self.replies += 1
+        if self._awaiting_hello:
+            self._accept_announcement(reply)
+            return None
+        return reply
+
+    def mark_timeout(self):
+        """Record that the detector didn't answer in time and rebuild the socket."""
+        self.timeouts += 1
+        self._consecutive_failures += 1
+        # Lazy pirate: the REQ socket is stuck waiting for a reply, so replace it
+        self._connect()
+        if self._consecutive_failures >= self.FAILURE_THRESHOLD and self._state == CircuitState.CLOSED:
+            self._open_circuit()
+
+    def health(self) -> dict:
+        """Report the health of the detector.
+
+        Returns
+        -------
+        dict
+            The availability, circuit state and request counters for the detector.
+        """
+        return {
+            "available": self.available,
+            "state": self._state.value,
+            "requests": self.requests,
+            "replies": self.replies,
+            "timeouts": self.timeouts,
+            "circuit_trips": self.circuit_trips,
+        }
+
+    def close(self):
+        """Close the socket and stop the background probe."""
+        self._closed.set()
+        if self._probe_thread is not None:
+            self._probe_thread.join(timeout=(self.PROBE_TIMEOUT / 1000) + self.PROBE_INTERVAL)
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+
+    def _accept_announcement(self, reply: bytes):
+        """Adopt the schema from the detector's reply to the handshake, or fall back to JSON.
+
+        Parameters
+        ----------
+        reply : bytes
+            The detector's reply to the "hello" command.
+        """
+        self._awaiting_hello = False
+        self._negotiated = True
+        try:
+            schema = protocol.FeatureSchema.from_announcement(json.loads(reply.decode("utf-8")))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._logger.info(f"Detector on port {self.port} didn't announce its features ({e}); sending JSON")
+            self._schema = None
+            return
+        if schema.detector != self.name:
+            self._logger.warning(f"Expected detector {self.name} on port {self.port}, found {schema.detector}")
+        self._logger.info(f"Detector on port {self.port} wants {len(schema.features)} feature(s)")
+        # Keep the history window unless the detector now wants different rows
+        if self._schema is None or schema.announcement() != self._schema.announcement():
+            self._history = deque(maxlen=schema.history)
+        self._schema = schema
+
+    def _connect(self):
+        """Close the current socket, if any, and connect a fresh one."""
+        if self._socket is not None:
+            self._socket.close(linger=0)
+        self._socket = self._context.socket(zmq.REQ)
+        self._socket.connect(f"tcp://localhost:{self.port}")
+        self._awaiting_reply = False
+
+    def _open_circuit(self):
+        """Stop querying the detector and start probing it in the background."""
+        self._logger.warning(
+            f"Detector on port {self.port} missed {self._consecutive_failures} replies; skipping it until it recovers"
+        )
+        self._state = CircuitState.OPEN
+        self.circuit_trips += 1
+        self._probe_thread = threading.Thread(target=self._probe_loop, name=f"probe-{self.port}", daemon=True)
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        """Probe the detector on a private socket until it answers, then close the circuit.
+
+        The probe is the handshake itself, since the detector may have been restarted.
+        """
+        while not self._closed.is_set():
+            socket = self._context.socket(zmq.REQ)
+            socket.connect(f"tcp://localhost:{self.port}")
+            try:
+                socket.send(self._hello_message)
+                if socket.poll(self.PROBE_TIMEOUT, zmq.POLLIN):
+                    self._probe_reply = socket.recv()
+                    self._consecutive_failures = 0
+                    self._state = CircuitState.CLOSED
+                    self._logger.info(f"Detector on port {self.port} is responding again")
+                    return
+            except zmq.ZMQError as e:
+                self._logger.debug(f"Probe of port {self.port} failed: {e}")
+            finally:
+                socket.close(linger=0)
+            self._closed.wait(self.PROBE_INTERVAL)
@@ -0,0 +1,137 @@
+"""In-process runner for a machine learning detector."""
+
+import time
+from concurrent.futures import Executor, Future
+from typing import Optional
+
+import drone_ips.logging as ips_logging
+from drone_ips.detectors import Detector
+
+
+class DetectorPlugin:
+    """Run a detector inside the monitor's process on a shared worker pool.
+
+    This skips the zmq round-trip and the (de)serialization entirely: the telemetry
+    is handed straight to `Detector.predict`. A detector that is still busy with the
+    previous tick is skipped rather than queued, so a slow model can't build a backlog.
+
+    Parameters
+    ----------
+    port : int
+        The port the detector would listen on out of process, used to identify it.
+    detector : Detector
+        The loaded detector.
+    executor : concurrent.futures.Executor
+        The worker pool to run predictions on.
+    vehicle : str, optional
+        The ID of the vehicle, passed to the detector so it can keep state per vehicle.
+    """
+
+    def __init__(self, port: int, detector: Detector, executor: Executor, vehicle: Optional[str] = None):
+        self._logger = ips_logging.LogManager.get_logger(f"detector_plugin.{port}")
+        self.port = int(port)
+        self.detector = detector
+        self.vehicle = vehicle
+        self._executor = executor
+        self._future: Optional[Future] = None
+        # Health counters
+        self.requests = 0
+        self.replies = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @property
+    def available(self) -> bool:
+        """Check if the detector is free to take a new request.
+
+        Returns
+        -------
+        bool
+            True if the previous prediction has finished, False otherwise.
+        """
+        return self._future is None or self._future.done()
+
+    def submit(self, current_data: dict, last_data: Optional[dict] = None) -> Optional[Future]:
+        """Start a prediction on the worker pool.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        last_data : dict, optional
+            The previous data from the vehicle.
+
+        Returns
+        -------
+        concurrent.futures.Future or None
+            The pending result, which resolves to the verdict and the monotonic time it finished,
+            or None if the detector is still busy.
+        """
+        if not self.available:
+            return None
+        self._future = self._executor.submit(self._predict, current_data, last_data)
+        self.requests += 1
+        return self._future
+
+    def result(self, future: Future) -> Optional[int]:
+        """Collect the verdict from a finished prediction.
+
+        Parameters
+        ----------
+        future : concurrent.futures.Future
+            The finished prediction, as returned by `submit`.
+
+        Returns
+        -------
+        int or None
+            The verdict, or None if the prediction failed.
+        """
+        verdict, _ = future.result()
+        if verdict is not None:
+            self.replies += 1
+        return verdict
+
+    def mark_timeout(self):
+        """Record that the prediction didn't finish in time."""
+        self.timeouts += 1
+
+    def health(self) -> dict:
+        """Report the health of the detector.
+
+        Returns
+        -------
+        dict
+            The availability and request counters for the detector.
+        """
+        return {
+            "available": self.available,
+            "state": "in_process",
+            "requests": self.requests,
+            "replies": self.replies,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
+
+    def _predict(self, current_data: dict, last_data: Optional[dict]) -> tuple[Optional[int], float]:
+        """Make a prediction on a worker thread.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        last_data : dict or None
+            The previous data from the vehicle.
+
+        Returns
+        -------
+        tuple of (int or None, float)
+            The verdict (None if the model failed) and the monotonic time at which it finished.
+        """
+        try:
+            verdict: Optional[int] = self.detector.predict(current_data, last_data, self.vehicle)
+        except Exception as e:
+            # A model that chokes on one sample shouldn't take the monitor down with it
+            self.errors += 1
+            self._logger.warning(f"Detector {self.detector.NAME} failed: {e}")
+            verdict = None
+        return verdict, time.monotonic()
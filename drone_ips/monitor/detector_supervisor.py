@@ -0,0 +1,279 @@
+"""Launch the machine learning detector programs and keep them running."""
+
+import logging
+import os
+import pathlib
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable
+from typing import Optional
+
+import drone_ips.logging as ips_logging
+from drone_ips.detectors import protocol
+
+# The directory holding the drone_ips package, so the detector programs can import it
+PACKAGE_ROOT: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent.parent
+
+
+class DetectorProcess:
+    """One detector program, with its readiness and restart bookkeeping.
+
+    Parameters
+    ----------
+    name : str
+        The name of the detector the program serves.
+    command : list of str
+        The command that runs the program.
+    """
+
+    # The number of output lines to keep, to show why the program exited
+    TAIL_LINES: int = 20
+
+    def __init__(self, name: str, command: list[str]):
+        self._logger = ips_logging.LogManager.get_logger(f"detector_supervisor.{name}")
+        self.name = name
+        self.command = command
+        self.process: Optional[subprocess.Popen] = None
+        self.ready = threading.Event()
+        self.started_at = 0.0
+        self.ready_at = 0.0
+        self.tail: deque[str] = deque(maxlen=self.TAIL_LINES)
+        self._reader: Optional[threading.Thread] = None
+        # Restart bookkeeping
+        self.starts = 0
+        self.next_start = 0.0
+        self.backoff = 0.0
+
+    @property
+    def running(self) -> bool:
+        """Check if the program is running.
+
+        Returns
+        -------
+        bool
+            True if the program was started and hasn't exited.
+        """
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start the program, reading its output on a background thread."""
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PACKAGE_ROOT), env.get("PYTHONPATH")]))
+        # Keep the output line-buffered so the ready line arrives as soon as it is printed
+        env["PYTHONUNBUFFERED"] = "1"
+        self.ready.clear()
+        self.tail.clear()
+        self.process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            env=env,
+            text=True,
+            bufsize=1,
+        )
+        self.started_at = time.monotonic()
+        self.starts += 1
+        self._reader = threading.Thread(
+            target=self._read, args=(self.process,), name=f"detector-output.{self.name}", daemon=True
+        )
+        self._reader.start()
+        self._logger.info(f"Started detector {self.name} (pid {self.process.pid})")
+
+    def stop(self, timeout: float):
+        """Ask the program to stop, killing it if it doesn't in time.
+
+        Parameters
+        ----------
+        timeout : float
+            How long (in seconds) to wait for the program to stop on its own.
+        """
+        if not self.running:
+            return
+        assert self.process is not None  # for mypy
+        # The detector programs stop cleanly on a keyboard interrupt
+        self.process.send_signal(signal.SIGINT if os.name == "posix" else signal.SIGTERM)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self._reader is not None:
+            self._reader.join(timeout)
+        self.ready.clear()
+
+    def _read(self, process: subprocess.Popen):
+        """Read the program's output until it exits, watching for the ready line.
+
+        Parameters
+        ----------
+        process : subprocess.Popen
+            The program.
+        """
+        assert process.stdout is not None  # for mypy
+        for line in process.stdout:
+            line = line.rstrip()
+            if not self.ready.is_set() and protocol.decode_ready(line) is not None:
+                self.ready_at = time.monotonic()
+                self.ready.set()
+                self._logger.info(f"Detector {self.name} is ready after {self.ready_at - self.started_at:.1f}s")
+                continue
+            self.tail.append(line)
+            # The programs log in `logging.basicConfig`'s "LEVEL:name:message" format, so their
+            # warnings reach the monitor's log as warnings
+            level, _, record = line.partition(":")
+            if level in ("INFO", "WARNING", "ERROR", "CRITICAL"):
+                self._logger.log(logging.getLevelName(level), record)
+            # Every request prints its verdict, which the monitor logs already
+            elif not line.startswith("Prediction:"):
+                self._logger.debug(line)
+
+
+class DetectorSupervisor:
+    """Launch a program for each machine learning detector and restart the ones that exit.
+
+    Each detector runs in its own program (`python -m drone_ips.detectors <name>`), which
+    prints a ready line once its model is loaded, warmed up and its socket is bound, so
+    `wait_ready` can hold the monitor back until every detector can answer. A background
+    thread watches the programs: one that exits is restarted after a backoff that doubles
+    with each crash, up to `MAX_BACKOFF`, and resets once it has stayed up for `STABLE_TIME`.
+
+    Parameters
+    ----------
+    detectors : iterable of str
+        The names of the detectors to launch.
+    python : str, optional
+        The Python interpreter to run the detectors with (this one if None), since the
+        detectors may need a different Python version than the monitor.
+    args : iterable of str, optional
+        Extra command-line arguments for every detector program (e.g. "--mmap").
+    """
+
+    CHECK_INTERVAL: float = 0.5
+    MIN_BACKOFF: float = 1.0
+    MAX_BACKOFF: float = 30.0
+    STABLE_TIME: float = 60.0
+    STOP_TIMEOUT: float = 5.0
+
+    def __init__(self, detectors: Iterable[str], python: Optional[str] = None, args: Optional[Iterable[str]] = None):
+        self._logger = ips_logging.LogManager.get_logger("detector_supervisor")
+        python = python or sys.executable
+        self._processes = {
+            name: DetectorProcess(name, [python, "-m", "drone_ips.detectors", name, *(args or [])])
+            for name in detectors
+        }
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        """Check if every detector is ready for requests.
+
+        Returns
+        -------
+        bool
+            True if every detector program is running and has printed its ready line.
+        """
+        return all(process.running and process.ready.is_set() for process in self._processes.values())
+
+    def start(self):
+        """Launch every detector program and start watching them."""
+        if self._thread is not None:
+            return
+        for process in self._processes.values():
+            process.start()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="detector-supervisor", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every detector is ready for requests.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The longest (in seconds) to wait (forever if None).
+
+        Returns
+        -------
+        bool
+            True if every detector is ready, False if the time ran out first.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self.ready:
+            remaining = deadline - time.monotonic() if deadline is not None else self.CHECK_INTERVAL
+            if remaining <= 0:
+                return False
+            # A program that exits is restarted with a new event, so check them all again regularly
+            for process in self._processes.values():
+                if not process.ready.is_set():
+                    process.ready.wait(min(remaining, self.CHECK_INTERVAL))
+                    break
+        return True
+
+    def stop(self):
+        """Stop watching the detector programs and stop them."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(self.CHECK_INTERVAL * 2)
+            self._thread = None
+        for process in self._processes.values():
+            process.stop(self.STOP_TIMEOUT)
+
+    def health(self) -> dict[str, dict]:
+        """Report the state of each detector program.
+
+        Returns
+        -------
+        dict
+            Whether each program is running and ready, its process ID and how many times it was restarted, by name.
+        """
+        return {
+            name: {
+                "running": process.running,
+                "ready": process.ready.is_set(),
+                "pid": process.process.pid if process.process is not None else None,
+                "restarts": max(process.starts - 1, 0),
+            }
+            for name, process in self._processes.items()
+        }
+
+    def _run(self):
+        """Restart the detector programs that exit, until stopped."""
+        while not self._stop_event.wait(self.CHECK_INTERVAL):
+            now = time.monotonic()
+            for process in self._processes.values():
+                if process.running:
+                    # A program that has stayed up for a while starts over with the shortest backoff
+                    if process.ready.is_set() and now - process.ready_at >= self.STABLE_TIME:
+                        process.backoff = 0.0
+                    continue
+                if process.next_start == 0.0:
+                    self._schedule_restart(process, now)
+                elif now >= process.next_start:
+                    process.next_start = 0.0
+                    process.start()
+
+    def _schedule_restart(self, process: DetectorProcess, now: float):
+        """Log why a detector program exited and schedule its restart.
+
+        Parameters
+        ----------
+        process : DetectorProcess
+            The program that exited.
+        now : float
+            The current monotonic time.
+        """
+        assert process.process is not None  # for mypy
+        process.ready.clear()
+        process.backoff = min(max(process.backoff * 2, self.MIN_BACKOFF), self.MAX_BACKOFF)
+        process.next_start = now + process.backoff
+        output = "\n".join(process.tail)
+        self._logger.warning(
+            f"Detector {process.name} exited with code {process.process.returncode}; "
+            f"restarting in {process.backoff:.0f}s" + (f"\n{output}" if output else "")
+        )
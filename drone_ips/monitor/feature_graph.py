@@ -0,0 +1,301 @@
+"""Derived features computed once per tick and shared by every detector."""
+
+import math
+from collections.abc import Iterable
+from typing import Any, Callable, Optional, Union
+
+import drone_ips.detectors as ips_detectors
+import drone_ips.logging as ips_logging
+import drone_ips.utils as ips_utils
+from drone_ips.detectors.gps_features import GPSFeatureEngine
+
+# Static types
+Compute = Callable[..., Any]
+
+
+class FeatureNode:
+    """One step of the feature graph: a function from some inputs to one or more derived features.
+
+    Parameters
+    ----------
+    outputs : list of str
+        The names of the features the node produces.
+    inputs : list of str
+        The names of the telemetry fields or derived features the node takes, in argument order.
+    compute : callable
+        The function computing the outputs from the inputs, which are passed as floats (NaN
+        if missing). It returns the value for a single output, or a dict with every output.
+        It may keep state between ticks.
+    """
+
+    def __init__(self, outputs: list[str], inputs: list[str], compute: Compute):
+        self.outputs = outputs
+        self.inputs = inputs
+        self.compute = compute
+
+    def __call__(self, *args: float) -> dict[str, Any]:
+        """Compute the outputs of the node.
+
+        Parameters
+        ----------
+        *args : float
+            The inputs, in `inputs` order.
+
+        Returns
+        -------
+        dict
+            The outputs, by name.
+        """
+        result = self.compute(*args)
+        if len(self.outputs) == 1 and not isinstance(result, dict):
+            return {self.outputs[0]: result}
+        return {name: result[name] for name in self.outputs}
+
+
+class FeatureGraph:
+    """A declarative graph of the features derived from raw telemetry.
+
+    Each feature is declared once, with the fields it is computed from. Detectors say which
+    features they need (their `DERIVED_FEATURES`) and the monitor subscribes to those. Every
+    tick it evaluates only the nodes those features depend on, each exactly once and in
+    dependency order, and ships the results with the telemetry so no detector has to derive
+    them again.
+
+    Nodes may keep state between ticks (e.g. the previous position), so a graph belongs to
+    a single vehicle.
+    """
+
+    def __init__(self):
+        self._logger = ips_logging.LogManager.get_logger("feature_graph")
+        self._nodes: list[FeatureNode] = []
+        # The node producing each feature
+        self._producers: dict[str, FeatureNode] = {}
+        self._subscribed: list[str] = []
+        # The nodes to evaluate each tick, in dependency order
+        self._plan: list[FeatureNode] = []
+        self.errors = 0
+
+    @property
+    def features(self) -> list[str]:
+        """The names of every feature the graph can derive.
+
+        Returns
+        -------
+        list of str
+            The names of every feature the graph can derive.
+        """
+        return list(self._producers)
+
+    @property
+    def subscribed(self) -> list[str]:
+        """The names of the features that are derived every tick.
+
+        Returns
+        -------
+        list of str
+            The names of the subscribed features.
+        """
+        return list(self._subscribed)
+
+    def add(self, outputs: Union[str, list[str]], inputs: list[str], compute: Compute):
+        """Declare a derived feature (or a group of features computed together).
+
+        Parameters
+        ----------
+        outputs : str or list of str
+            The name of the feature, or the names of the features, the node produces.
+        inputs : list of str
+            The names of the telemetry fields or derived features the node takes.
+        compute : callable
+            The function computing the outputs (see `FeatureNode`).
+
+        Raises
+        ------
+        ValueError
+            If one of the outputs is already declared.
+        """
+        node = FeatureNode([outputs] if isinstance(outputs, str) else list(outputs), list(inputs), compute)
+        duplicates = [name for name in node.outputs if name in self._producers]
+        if len(duplicates) > 0:
+            raise ValueError(f"Derived features declared twice: {duplicates}")
+        self._nodes.append(node)
+        for name in node.outputs:
+            self._producers[name] = node
+        # A new node may satisfy a subscription differently, so plan again
+        self._plan = self._resolve(self._subscribed)
+
+    def subscribe(self, names: Iterable[str]):
+        """Derive some features every tick, along with everything they depend on.
+
+        Parameters
+        ----------
+        names : iterable of str
+            The names of the features.
+
+        Raises
+        ------
+        KeyError
+            If one of the features isn't declared.
+        ValueError
+            If the features depend on each other in a cycle.
+        """
+        subscribed = self._subscribed + [name for name in names if name not in self._subscribed]
+        unknown = [name for name in subscribed if name not in self._producers]
+        if len(unknown) > 0:
+            raise KeyError(f"Unknown derived features: {unknown}")
+        self._plan = self._resolve(subscribed)
+        self._subscribed = subscribed
+        self._logger.info(
+            f"Deriving {len(self._subscribed)} subscribed features with {len(self._plan)} of {len(self._nodes)} nodes"
+        )
+
+    def evaluate(self, current_data: dict) -> dict[str, Any]:
+        """Derive the subscribed features (and the ones they depend on) for one tick.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+
+        Returns
+        -------
+        dict
+            Every feature computed this tick, by name (None if it couldn't be derived).
+        """
+        derived: dict[str, Any] = {}
+        for node in self._plan:
+            args = [
+                derived[name] if name in derived else ips_detectors.protocol.to_float(current_data.get(name))
+                for name in node.inputs
+            ]
+            try:
+                derived.update(node(*args))
+            except Exception as e:
+                # One bad feature shouldn't cost the detectors the whole tick
+                self.errors += 1
+                self._logger.warning(f"Failed to derive {node.outputs}: {e}")
+                derived.update(dict.fromkeys(node.outputs, math.nan))
+        # Missing values are None in the telemetry
+        return {
+            name: None if isinstance(value, float) and math.isnan(value) else value for name, value in derived.items()
+        }
+
+    def _resolve(self, names: list[str]) -> list[FeatureNode]:
+        """Find the nodes needed for some features, in dependency order.
+
+        Parameters
+        ----------
+        names : list of str
+            The names of the features.
+
+        Returns
+        -------
+        list of FeatureNode
+            The nodes to evaluate, each after the nodes it depends on.
+
+        Raises
+        ------
+        ValueError
+            If the features depend on each other in a cycle.
+        """
+        plan: list[FeatureNode] = []
+        visiting: set[int] = set()
+        done: set[int] = set()
+
+        def visit(node: FeatureNode):
+            """Add a node to the plan after the nodes producing its inputs.
+
+            Parameters
+            ----------
+            node : FeatureNode
+                The node to add.
+
+            Raises
+            ------
+            ValueError
+                If the node depends on itself through its inputs.
+            """
+            if id(node) in done:
+                return
+            if id(node) in visiting:
+                raise ValueError(f"Derived features depend on themselves: {node.outputs}")
+            visiting.add(id(node))
+            # Inputs that no node produces are raw telemetry fields
+            for name in node.inputs:
+                producer = self._producers.get(name)
+                if producer is not None:
+                    visit(producer)
+            visiting.discard(id(node))
+            done.add(id(node))
+            plan.append(node)
+
+        for name in names:
+            producer = self._producers.get(name)
+            if producer is not None:
+                visit(producer)
+        return plan
+
+
+class RateOfChange:
+    """The smoothed rate of change of a value, in units per second.
+
+    Parameters
+    ----------
+    alpha : float, optional
+        The weight of the newest rate in the exponentially weighted average.
+    """
+
+    ALPHA: float = 0.1
+
+    def __init__(self, alpha: float = ALPHA):
+        self._rate = ips_utils.EWMA(alpha)
+        self._last: Optional[tuple[float, float]] = None
+
+    def __call__(self, timestamp: float, value: float) -> float:
+        """Update the rate with a new sample.
+
+        Parameters
+        ----------
+        timestamp : float
+            The time of the sample (seconds).
+        value : float
+            The value.
+
+        Returns
+        -------
+        float
+            The smoothed rate of change (0.0 until there are two samples).
+        """
+        if math.isnan(timestamp) or math.isnan(value):
+            return self._rate.value
+        if self._last is not None and timestamp > self._last[0]:
+            self._rate.update((value - self._last[1]) / (timestamp - self._last[0]))
+        self._last = (timestamp, value)
+        return self._rate.value
+
+
+def default_graph() -> FeatureGraph:
+    """Build the graph of every derived feature the monitor knows about.
+
+    Returns
+    -------
+    FeatureGraph
+        A new graph, with fresh state, and nothing subscribed yet.
+    """
+    graph = FeatureGraph()
+    # Motion between successive GPS fixes, exactly as the GPS detector derives it itself
+    graph.add(
+        GPSFeatureEngine.FEATURES,
+        ["timestamp", "location.global_frame.lat", "location.global_frame.lon", "location.global_frame.alt"],
+        GPSFeatureEngine().update,
+    )
+    # How far the barometric/GPS altitude is from what the rangefinder sees (meters; the
+    # rangefinder reports centimeters, like the DISTANCE_SENSOR message)
+    graph.add(
+        "altitude_residual",
+        ["location.global_relative_frame.alt", "rangefinder.distance"],
+        lambda alt, distance: alt - distance / 100,
+    )
+    # How fast the battery is draining (volts per second)
+    graph.add("battery_slope", ["timestamp", "battery.voltage"], RateOfChange())
+    return graph
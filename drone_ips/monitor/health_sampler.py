@@ -0,0 +1,157 @@
+"""Background sampler for the health of the companion computer."""
+
+import pathlib
+import platform
+import threading
+from typing import Optional
+
+import psutil
+
+import drone_ips.logging as ips_logging
+
+
+class ComputerHealthSampler:
+    """Sample the companion computer's health on a background thread.
+
+    On Linux the CPU temperature, CPU usage and RAM usage are read directly from
+    `/sys/class/thermal` and `/proc`, without spawning any processes. Other systems
+    fall back to psutil. The latest values are published by replacing a dictionary,
+    which readers can grab without taking a lock. A value that can't be read (such as the
+    temperature on a computer without a thermal zone) is None, never a made-up reading.
+
+    Parameters
+    ----------
+    interval : float, optional
+        The time (in seconds) between samples.
+    """
+
+    PREFIX: str = "companion_computer."
+    THERMAL_ZONE: pathlib.Path = pathlib.Path("/sys/class/thermal/thermal_zone0/temp")
+    PROC_STAT: pathlib.Path = pathlib.Path("/proc/stat")
+    PROC_MEMINFO: pathlib.Path = pathlib.Path("/proc/meminfo")
+
+    def __init__(self, interval: float = 0.5):
+        self._logger = ips_logging.LogManager.get_logger("health_sampler")
+        self.interval = interval
+        self._use_proc = platform.system() == "Linux" and self.PROC_STAT.exists() and self.PROC_MEMINFO.exists()
+        self._last_cpu_times: Optional[tuple[int, int]] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Take one sample up front so there is always something to read
+        self._latest: dict[str, Optional[float]] = self.sample()
+
+    @property
+    def latest(self) -> dict[str, Optional[float]]:
+        """The most recent health sample.
+
+        Returns
+        -------
+        dict
+            The most recent CPU temperature, CPU usage and RAM usage.
+        """
+        return self._latest
+
+    @property
+    def running(self) -> bool:
+        """Check if the background thread is running.
+
+        Returns
+        -------
+        bool
+            True if the background thread is running, False otherwise.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start sampling on a background thread."""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="health-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def sample(self) -> dict[str, Optional[float]]:
+        """Take a single health sample.
+
+        Returns
+        -------
+        dict
+            The current CPU temperature, CPU usage and RAM usage.
+        """
+        if self._use_proc:
+            cpu_usage = self._read_cpu_usage()
+            ram_usage = self._read_ram_usage()
+        else:
+            cpu_usage = psutil.cpu_percent()
+            ram_usage = psutil.virtual_memory().percent
+        return {
+            f"{self.PREFIX}cpu_temp": self._read_cpu_temp(),
+            f"{self.PREFIX}cpu_usage": cpu_usage,
+            f"{self.PREFIX}ram_usage": ram_usage,
+        }
+
+    def _run(self):
+        """Sample the health at a fixed interval until stopped."""
+        while not self._stop_event.wait(self.interval):
+            try:
+                # Publish a new dictionary rather than updating the old one in place
+                self._latest = self.sample()
+            except (OSError, ValueError) as e:
+                self._logger.warning(f"Failed to sample the computer's health: {e}")
+
+    def _read_cpu_temp(self) -> Optional[float]:
+        """Read the CPU temperature from the first thermal zone.
+
+        Returns
+        -------
+        float or None
+            The CPU temperature in degrees Celsius, or None if it can't be read.
+        """
+        try:
+            return int(self.THERMAL_ZONE.read_text()) / 1000
+        except (OSError, ValueError):
+            return None
+
+    def _read_cpu_usage(self) -> float:
+        """Calculate the CPU usage since the previous sample from `/proc/stat`.
+
+        Returns
+        -------
+        float
+            The CPU usage as a percentage (0.0 on the first sample).
+        """
+        with open(self.PROC_STAT, encoding="utf-8") as fh:
+            fields = [int(field) for field in fh.readline().split()[1:9]]
+        # user, nice, system, idle, iowait, irq, softirq, steal
+        idle = fields[3] + fields[4]
+        total = sum(fields)
+        last = self._last_cpu_times
+        self._last_cpu_times = (idle, total)
+        if last is None or total == last[1]:
+            return 0.0
+        return round(100 * (1 - (idle - last[0]) / (total - last[1])), 1)
+
+    def _read_ram_usage(self) -> float:
+        """Calculate the RAM usage from `/proc/meminfo`.
+
+        Returns
+        -------
+        float
+            The RAM usage as a percentage.
+        """
+        meminfo = {}
+        with open(self.PROC_MEMINFO, encoding="utf-8") as fh:
+            for line in fh:
+                key, value = line.split(":", 1)
+                meminfo[key] = int(value.split()[0])
+                if "MemTotal" in meminfo and "MemAvailable" in meminfo:
+                    break
+        total = meminfo["MemTotal"]
+        return round(100 * (total - meminfo["MemAvailable"]) / total, 1)
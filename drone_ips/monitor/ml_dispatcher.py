@@ -0,0 +1,363 @@
+"""Scatter-gather dispatcher for the machine learning detectors."""
+
+import concurrent.futures
+import math
+import time
+from collections.abc import Iterable
+from typing import Optional, Union
+
+import zmq
+
+import drone_ips.logging as ips_logging
+import drone_ips.utils as ips_utils
+from drone_ips.detectors import Detector, protocol
+from drone_ips.detectors.reloader import ModelReloader
+from drone_ips.monitor.detector_client import DetectorClient
+from drone_ips.monitor.detector_plugin import DetectorPlugin
+from drone_ips.monitor.verdict_cache import VerdictCache
+
+
+class MLDispatcher:
+    """Send telemetry to every machine learning detector at once and gather the verdicts.
+
+    Each detector runs as a separate program behind a zmq REP socket. Rather than
+    querying them one after another, the request is sent to all of them first and
+    the replies are collected through a single poller until the deadline expires,
+    so one slow detector can no longer stretch the tick by a full timeout per port.
+    Each detector is wrapped in a `DetectorClient`, which rebuilds its socket after a
+    timeout, skips the detector while it is unresponsive, and encodes only the features
+    the detector asked for.
+
+    Detectors can also be loaded as plugins into the monitor's own process, where they
+    run on a worker pool alongside the out-of-process ones and cost no round-trip. Their
+    models are reloaded between dispatches when the model files change.
+
+    With a cache age set, each detector's verdict is reused while its features stay
+    within their tolerance bands (see `VerdictCache`), and the detector isn't asked at all.
+
+    Parameters
+    ----------
+    ports : iterable of int
+        The ports the detectors listen on, ordered from the most to the least significant verdict bit.
+    timeout : int
+        The deadline (in milliseconds) for collecting all replies in one dispatch.
+    latency : ips_utils.LatencyRecorder, optional
+        A recorder for the round-trip time of each detector, named after the port's enum member if it has one.
+    plugins : dict, optional
+        Detectors to run in-process instead of over zmq, by port.
+    vehicle : str, optional
+        The ID of the vehicle the telemetry comes from, so detectors can keep state per vehicle.
+    cache_age : float, optional
+        The oldest a cached verdict can be and still be reused (seconds); 0 turns the cache off.
+    """
+
+    def __init__(
+        self,
+        ports: Iterable[int],
+        timeout: int,
+        latency: Optional[ips_utils.LatencyRecorder] = None,
+        plugins: Optional[dict[int, Detector]] = None,
+        vehicle: Optional[str] = None,
+        cache_age: float = 0.0,
+    ):
+        self._logger = ips_logging.LogManager.get_logger("ml_dispatcher")
+        ports = list(ports)
+        self._ports = [int(port) for port in ports]
+        names = {int(port): str(getattr(port, "name", port)).lower() for port in ports}
+        self._stage_names = {port: f"ml.{name}" for port, name in names.items()}
+        self._latency = latency
+        self.timeout = timeout
+        # Run the plugins on a worker pool with a thread for each
+        plugins = {int(port): detector for port, detector in (plugins or {}).items()}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._plugins: dict[int, DetectorPlugin] = {}
+        if len(plugins) > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(len(plugins), thread_name_prefix="detector")
+            self._plugins = {
+                port: DetectorPlugin(port, detector, self._executor, vehicle) for port, detector in plugins.items()
+            }
+        self._reloader = ModelReloader(plugins.values()) if len(plugins) > 0 else None
+        # Create clients to talk to the remaining ML programs
+        self._context: zmq.Context = zmq.Context.instance()
+        self._clients = {
+            port: DetectorClient(port, self._context, names[port], vehicle)
+            for port in self._ports
+            if port not in self._plugins
+        }
+        # Reuse the verdicts for inputs that have barely changed
+        self._caches = {port: VerdictCache(cache_age) for port in self._ports} if cache_age > 0 else {}
+
+    @property
+    def ports(self) -> list[int]:
+        """The ports of the detectors, in verdict bit order.
+
+        Returns
+        -------
+        list of int
+            The ports of the detectors.
+        """
+        return self._ports[:]
+
+    def health(self) -> dict[int, dict]:
+        """Report the health of each detector.
+
+        Returns
+        -------
+        dict
+            The availability and timeout counters of each detector, by port.
+        """
+        runners: dict[int, Union[DetectorClient, DetectorPlugin]] = {**self._clients, **self._plugins}
+        health = {port: runners[port].health() for port in self._ports}
+        for port, cache in self._caches.items():
+            health[port]["cache"] = cache.stats()
+        return health
+
+    def dispatch(
+        self, current_data: dict, last_data: Optional[dict] = None, ports: Optional[Iterable[int]] = None
+    ) -> dict[int, Optional[int]]:
+        """Send the data to the detectors and gather their verdicts before the deadline.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        last_data : dict, optional
+            The previous data from the vehicle.
+        ports : iterable of int, optional
+            The ports to query (all detectors if None). The data still goes into the history
+            window of the others, so call this every tick, even with no ports to query.
+
+        Returns
+        -------
+        dict
+            The verdict from each queried port (0 = normal, 1 = malicious), or None if it was skipped
+            or didn't reply in time.
+        """
+        ports = self._ports if ports is None else [int(port) for port in ports]
+        if self._reloader is not None:
+            self._reload()
+        start = time.monotonic()
+        verdicts: dict[int, Optional[int]] = dict.fromkeys(ports)
+        # Reuse the verdicts for inputs that have barely changed, and only ask the other detectors
+        keys = self._cache_keys(current_data, ports)
+        for port, key in keys.items():
+            verdicts[port] = self._caches[port].get(key, start)
+        ports = [port for port in ports if verdicts[port] is None]
+        # Start the in-process detectors first so they run while the others are queried
+        futures = self._submit(current_data, last_data, [port for port in ports if port in self._plugins])
+        pending = self._scatter(current_data, last_data, [port for port in ports if port not in self._plugins])
+        verdicts.update(self._gather(pending, start))
+        verdicts.update(self._collect(futures, start))
+        for port in ports:
+            verdict = verdicts[port]
+            if port in keys and verdict is not None:
+                self._caches[port].put(keys[port], verdict, start)
+        # Every tick goes into the history windows, even for the detectors that weren't asked
+        for client in self._clients.values():
+            client.record(current_data)
+        return verdicts
+
+    def combine(self, verdicts: dict[int, Optional[int]]) -> int:
+        """Combine the verdicts of the detectors into a single bitmask.
+
+        Detectors that did not reply fail to "benign" (0), because it is better
+        to collect more data than to wait for a response.
+
+        Parameters
+        ----------
+        verdicts : dict
+            The verdict from each port, as returned by `dispatch`.
+
+        Returns
+        -------
+        int
+            The combined verdict, with the first port as the most significant bit.
+        """
+        result = 0
+        for port in self._ports:
+            result = (result << 1) + (verdicts.get(port) or 0)
+        return result
+
+    def close(self):
+        """Close the connections to the detectors."""
+        for client in self._clients.values():
+            client.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._reloader is not None:
+            self._reloader.close()
+
+    def _reload(self):
+        """Swap in the plugins' new models, forgetting the verdicts of the old ones."""
+        if self._reloader is None:
+            return
+        for name in self._reloader.poll():
+            self._logger.info(f"Reloaded the {name} model")
+            for port, plugin in self._plugins.items():
+                if plugin.detector.NAME == name and port in self._caches:
+                    self._caches[port].clear()
+
+    def _cache_keys(self, current_data: dict, ports: Iterable[int]) -> dict[int, bytes]:
+        """Quantize the features each detector needs into its cache key.
+
+        Detectors that haven't announced their features yet (or are sent JSON) aren't cached.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        ports : iterable of int
+            The ports of the detectors.
+
+        Returns
+        -------
+        dict
+            The cache key of each detector that can be cached, by port.
+        """
+        keys = {}
+        for port in ports:
+            if port not in self._caches:
+                continue
+            plugin = self._plugins.get(port)
+            schema = plugin.detector.schema if plugin is not None else self._clients[port].schema
+            if schema is not None:
+                keys[port] = self._caches[port].key(current_data, schema)
+        return keys
+
+    def _submit(
+        self, current_data: dict, last_data: Optional[dict], ports: Iterable[int]
+    ) -> dict[concurrent.futures.Future, DetectorPlugin]:
+        """Start a prediction on each in-process detector that is free.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        last_data : dict or None
+            The previous data from the vehicle.
+        ports : iterable of int
+            The ports of the in-process detectors to run.
+
+        Returns
+        -------
+        dict
+            The pending predictions, mapped to their plugin.
+        """
+        futures = {}
+        for port in ports:
+            plugin = self._plugins[port]
+            future = plugin.submit(current_data, last_data)
+            if future is not None:
+                futures[future] = plugin
+        return futures
+
+    def _collect(
+        self, futures: dict[concurrent.futures.Future, DetectorPlugin], start: float
+    ) -> dict[int, Optional[int]]:
+        """Collect the verdicts from the in-process detectors until they all finish or the deadline expires.
+
+        Parameters
+        ----------
+        futures : dict
+            The pending predictions, mapped to their plugin.
+        start : float
+            The monotonic time at which the predictions were started.
+
+        Returns
+        -------
+        dict
+            The verdict from each port, or None if it failed or didn't finish in time.
+        """
+        if len(futures) == 0:
+            return {}
+        remaining = max(0.0, start + self.timeout / 1000 - time.monotonic())
+        done, not_done = concurrent.futures.wait(futures, timeout=remaining)
+        verdicts: dict[int, Optional[int]] = {}
+        for future in done:
+            plugin = futures[future]
+            verdicts[plugin.port] = plugin.result(future)
+            if self._latency is not None:
+                self._latency.record(self._stage_names[plugin.port], future.result()[1] - start)
+        # A prediction that is still running is left to finish; the detector is skipped until then
+        for future in not_done:
+            plugin = futures[future]
+            self._logger.warning(f"No verdict from detector {plugin.detector.NAME} before the deadline")
+            plugin.mark_timeout()
+        return verdicts
+
+    def _scatter(
+        self, current_data: dict, last_data: Optional[dict], ports: Iterable[int]
+    ) -> dict[zmq.Socket, DetectorClient]:
+        """Send the data to each available detector without waiting for the replies.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        last_data : dict or None
+            The previous data from the vehicle.
+        ports : iterable of int
+            The ports to send the data to.
+
+        Returns
+        -------
+        dict
+            The sockets that are awaiting a reply, mapped to their client.
+        """
+        pending = {}
+        for port in ports:
+            client = self._clients[int(port)]
+            # Unavailable detectors are skipped; better to collect more data than wait for a response
+            if not client.available:
+                continue
+            try:
+                message = client.encode(current_data, last_data)
+            except protocol.ProtocolError as e:
+                self._logger.warning(f"Can't send the telemetry to port {client.port}: {e}")
+                continue
+            if client.send(message):
+                pending[client.socket] = client
+        return pending
+
+    def _gather(self, pending: dict[zmq.Socket, DetectorClient], start: float) -> dict[int, Optional[int]]:
+        """Collect the replies from the detectors until they all answer or the deadline expires.
+
+        Parameters
+        ----------
+        pending : dict
+            The sockets that are awaiting a reply, mapped to their client.
+        start : float
+            The monotonic time at which the requests were sent.
+
+        Returns
+        -------
+        dict
+            The verdict from each port, or None if it didn't reply in time.
+        """
+        deadline = start + self.timeout / 1000
+        verdicts: dict[int, Optional[int]] = {client.port: None for client in pending.values()}
+        poller = zmq.Poller()
+        for socket in pending:
+            poller.register(socket, zmq.POLLIN)
+        while len(pending) > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # The poller takes a whole number of milliseconds; round up so it doesn't spin near the deadline
+            for socket, _ in poller.poll(math.ceil(remaining * 1000)):
+                client = pending.pop(socket)
+                poller.unregister(socket)
+                reply = client.receive()
+                if reply is None:
+                    continue
+                if self._latency is not None:
+                    self._latency.record(self._stage_names[client.port], time.monotonic() - start)
+                try:
+                    verdicts[client.port] = int(reply.decode("utf-8"))
+                except ValueError as e:
+                    self._logger.warning(f"Bad reply from port {client.port}: {e}")
+        # The detectors that didn't answer in time need a fresh socket
+        for client in pending.values():
+            self._logger.warning(f"No reply from port {client.port} before the deadline")
+            client.mark_timeout()
+        return verdicts
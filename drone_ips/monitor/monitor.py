@@ -1,20 +1,24 @@
 """Monitor module for the drone_ips package."""
 
 import itertools
-import json
 import platform
-import subprocess
+import sys
 import time
 from enum import IntEnum
 from typing import Any, Optional
 
 import dronekit
-import psutil
-import zmq
 
+import drone_ips.detectors as ips_detectors
 import drone_ips.logging as ips_logging
 import drone_ips.utils as ips_utils
-from drone_ips.monitor import MAVLinkManager
+from drone_ips.monitor import DetectorSupervisor, MAVLinkManager, MLDispatcher
+from drone_ips.monitor.feature_graph import FeatureGraph, default_graph
+from drone_ips.monitor.health_sampler import ComputerHealthSampler
+from drone_ips.monitor.rules import RuleCascade
+from drone_ips.monitor.scheduler import FixedRateScheduler, OverrunPolicy
+from drone_ips.monitor.telemetry_schema import TelemetrySchema
+from drone_ips.monitor.telemetry_store import TelemetryStore
 
 
 class ML_Ports(IntEnum):
@@ -44,26 +48,30 @@ class Monitor:
 
     POLL_INTERVAL: float = 0.1
     POLL_WHILE_DISARMED: bool = False
+    OVERRUN_POLICY: OverrunPolicy = OverrunPolicy.SKIP
     MQZ_TIMEOUT: int = 1000
+    DETECTOR_MODE: str = "process"
+    LAUNCH_DETECTORS: bool = True
+    DETECTOR_PYTHON: str = sys.executable
+    DETECTOR_READY_TIMEOUT: float = 60.0
+    RULE_CASCADE: bool = True
+    VERDICT_CACHE_AGE: float = 1.0
+    VEHICLE_ID: str = platform.node()
+    HISTORY_SIZE: int = 6000
+    HEALTH_INTERVAL: float = 0.5
+    LATENCY_REPORT_INTERVAL: float = 60.0
+    LOG_ARRIVAL_TIMES: bool = False
+    LOG_DURABILITY: ips_logging.DurabilityPolicy = ips_logging.DurabilityPolicy.BUFFERED
+    LOG_FLUSH_INTERVAL: Optional[float] = None  # The log format's own interval if None
+    LOG_FORMAT: str = "csv"
 
     def __init__(self, conn_str: str, **options: dict):
         self._conn_str = conn_str
         self._logger = ips_logging.LogManager.get_logger("monitor")
         self._vehicle: Optional[dronekit.Vehicle] = None
-        self._data: list[dict] = []
-        self._csv_writer = ips_logging.CSVLogger()
-
-        # Create socket objects to talk to the ML programs
-        context = zmq.Context()
-        #  Socket to talk to server
-        self._sockets = {
-            ML_Ports.GPS.value: context.socket(zmq.REQ),  # GPS
-            ML_Ports.LIDAR.value: context.socket(zmq.REQ),  # LiDAR
-            ML_Ports.COMPANION_COMPUTER.value: context.socket(zmq.REQ),  # Compaion Computer
-        }
-        for port, obj in self._sockets.items():
-            obj.connect(f"tcp://localhost:{port}")
-            obj.RCVTIMEO = self.MQZ_TIMEOUT
+        self._schema: Optional[TelemetrySchema] = None
+        self._telemetry = TelemetryStore()
+        self._setup_pipeline(options)
 
         # Set up the MAVLink Router if it is enabled
         self.USE_MAVLINK_ROUTER = options.get("mavlink_router", Monitor.USE_MAVLINK_ROUTER)  # type: ignore
@@ -81,6 +89,53 @@ class Monitor:
         # Set up polling options
         self.POLL_WHILE_DISARMED = options.get("always_poll", Monitor.POLL_WHILE_DISARMED)  # type: ignore
         self.POLL_INTERVAL = options.get("poll_interval", Monitor.POLL_INTERVAL)  # type: ignore
+        self.OVERRUN_POLICY = OverrunPolicy(options.get("overrun_policy", Monitor.OVERRUN_POLICY))
+        self._scheduler = FixedRateScheduler(self.POLL_INTERVAL, self.OVERRUN_POLICY)
+        self.LOG_ARRIVAL_TIMES = options.get("log_arrival_times", Monitor.LOG_ARRIVAL_TIMES)  # type: ignore
+        # Sample the computer's health in the background at its own rate
+        self.HEALTH_INTERVAL = options.get("health_interval", Monitor.HEALTH_INTERVAL)  # type: ignore
+        self._health_sampler = ComputerHealthSampler(self.HEALTH_INTERVAL)
+
+    def _setup_pipeline(self, options: dict[str, Any]):
+        """Set up the history, log, latency recorder, detectors, rules and features every tick goes through.
+
+        `Replay` shares these options with the monitor, so they are read in one place.
+
+        Parameters
+        ----------
+        options : dict
+            The options for the monitor.
+        """
+        self.HISTORY_SIZE = options.get("history_size", Monitor.HISTORY_SIZE)
+        self._history = ips_utils.ColumnarRingBuffer(self.HISTORY_SIZE)
+        # Write the log from a background thread unless every row must hit the disk right away
+        self.LOG_DURABILITY = ips_logging.DurabilityPolicy(options.get("log_durability", Monitor.LOG_DURABILITY))
+        self.LOG_FLUSH_INTERVAL = options.get("log_flush_interval", Monitor.LOG_FLUSH_INTERVAL)
+        self.LOG_FORMAT = options.get("log_format", Monitor.LOG_FORMAT)
+        self._csv_writer = ips_logging.LOG_FORMATS[self.LOG_FORMAT](
+            policy=self.LOG_DURABILITY, flush_interval=self.LOG_FLUSH_INTERVAL
+        )
+
+        # Time each stage of the poll pipeline
+        self._latency = ips_utils.LatencyRecorder()
+        self.LATENCY_REPORT_INTERVAL = options.get("latency_report_interval", Monitor.LATENCY_REPORT_INTERVAL)
+        self._last_latency_report = time.monotonic()
+
+        # Talk to all of the ML programs at once
+        self.DETECTOR_MODE = options.get("detector_mode", Monitor.DETECTOR_MODE)
+        self.VEHICLE_ID = options.get("vehicle_id") or Monitor.VEHICLE_ID
+        self.VERDICT_CACHE_AGE = options.get("verdict_cache_age", Monitor.VERDICT_CACHE_AGE)
+        self._ml_dispatcher = self._create_ml_dispatcher()
+        # Launch the ML programs and keep them running
+        self.LAUNCH_DETECTORS = options.get("launch_detectors", Monitor.LAUNCH_DETECTORS)
+        self.DETECTOR_PYTHON = options.get("detector_python") or Monitor.DETECTOR_PYTHON
+        self.DETECTOR_READY_TIMEOUT = options.get("detector_ready_timeout", Monitor.DETECTOR_READY_TIMEOUT)
+        self._supervisor = self._create_detector_supervisor()
+        # Decide the obvious cases with rule checks before asking the ML detectors
+        self.RULE_CASCADE = options.get("rule_cascade", Monitor.RULE_CASCADE)
+        self._cascade = RuleCascade() if self.RULE_CASCADE else None
+        # Derive the features the detectors (and the rules) share once per tick
+        self._features = self._create_feature_graph()
 
     @property
     def last_data(self) -> Optional[dict]:
@@ -91,7 +146,18 @@ class Monitor:
         dict
             The last data point from the monitor, if it exists.
         """
-        return self._data[-1] if len(self._data) > 0 else None
+        return self._history.last_row
+
+    @property
+    def history(self) -> ips_utils.ColumnarRingBuffer:
+        """Get the recent history of data points from the monitor.
+
+        Returns
+        -------
+        ips_utils.ColumnarRingBuffer
+            The last `HISTORY_SIZE` data points, stored by column.
+        """
+        return self._history
 
     def get_vehicle_data(self) -> dict:
         """Get the current data from the vehicle.
@@ -106,8 +172,15 @@ class Monitor:
             "timestamp": current_time,
             "timedelta": current_time - self.last_data["timedelta"] if self.last_data is not None else 0,
         }
-        # Get the vehicle data
-        current_data.update(ips_utils.misc.flatten_dict(self._get_vehicle_data_recursive(self._vehicle)))
+        with self._latency.stage("vehicle"):
+            # Get the vehicle data, compiling the accessors for it if they don't exist yet
+            if self._schema is None:
+                self._schema = TelemetrySchema(self._vehicle, exclude=self._telemetry.fields)
+            current_data.update(self._schema.read(self._vehicle))
+            # The fields fed by MAVLink messages are already up to date in the store
+            current_data.update(self._telemetry.snapshot())
+        if self.LOG_ARRIVAL_TIMES:
+            current_data.update({f"arrival.{k}": v for k, v in self._telemetry.arrival_times().items()})
         # Enrich the data with additional fields in place
         self._enrich_vehicle_data(current_data)
         # Return the complete entry
@@ -116,36 +189,20 @@ class Monitor:
     def _get_computer_data(self) -> dict:
         """Get the current health of the computer.
 
+        The health is sampled on a background thread, so this only reads the latest values.
+
         Returns
         -------
         dict
             The current health of the computer.
         """
-        prefix = "companion_computer."
-        health_dict: dict[str, Optional[float]] = {}
-        # Get the CPU temperature
-        if platform.system() == "Linux":
-            try:
-                result = subprocess.run(["vcgencmd", "measure_temp"], capture_output=True, text=True)
-                if result.returncode == 0:
-                    health_dict[f"{prefix}cpu_temp"] = float(result.stdout.split("=")[1].split("'")[0])
-                else:
-                    health_dict[f"{prefix}cpu_temp"] = None
-            except FileNotFoundError:
-                health_dict[f"{prefix}cpu_temp"] = 20  # TODO: CHANGE THIS LATER
-        else:
-            health_dict[f"{prefix}cpu_temp"] = 20  # TODO: CHANGE THIS LATER
-        # Get the CPU usage
-        health_dict[f"{prefix}cpu_usage"] = psutil.cpu_percent()
-        # Get the RAM usage
-        health_dict[f"{prefix}ram_usage"] = psutil.virtual_memory().percent
-        return health_dict
+        return dict(self._health_sampler.latest)
 
     def send_to_ml(self, current_data: dict, port_number: int) -> int:
         """Send the current data to the machine learning model.
 
-        This method communicates with the machine learning model, which is running
-        in a separate program due to Python version restrictions. Not ideal, but it works.
+        By default the machine learning model runs in a separate program, due to Python
+        version restrictions; in "plugin" detector mode it is loaded into this process.
 
         Parameters
         ----------
@@ -159,48 +216,106 @@ class Monitor:
         int
             The verdict from the machine learning model (0 = normal, 1 = malicious).
         """
-        message = json.dumps(
-            {"current": current_data, "last": self.last_data}
-            if self.last_data is not None
-            else {"current": current_data}
-        )
-        # Query the ML model and get the verdict
-        try:
-            self._sockets[port_number].send(bytes(message, "utf-8"))
-            verdict = int(self._sockets[port_number].recv().decode("utf-8"))
-            return verdict
-        # If anything goes wrong, move on. Better to collect more data than wait for a response
-        except Exception as e:
-            self._logger.warning(e)
-            # Fail to "benign" if the ML model doesn't respond
-            return 0
+        verdicts = self._ml_dispatcher.dispatch(current_data, self.last_data, ports=[port_number])
+        # Fail to "benign" if the ML model doesn't respond
+        return verdicts[port_number] or 0
+
+    def _create_ml_dispatcher(self) -> MLDispatcher:
+        """Create the dispatcher for the ML detectors, loading them into this process in "plugin" mode.
+
+        Returns
+        -------
+        MLDispatcher
+            The dispatcher for the ML detectors.
+        """
+        plugins = None
+        if self.DETECTOR_MODE == "plugin":
+            self._logger.info("Loading the ML detectors into the monitor process")
+            plugins = {int(port): ips_detectors.DETECTORS[port.name.lower()]() for port in ML_Ports}
+        return MLDispatcher(ML_Ports, self.MQZ_TIMEOUT, self._latency, plugins, self.VEHICLE_ID, self.VERDICT_CACHE_AGE)
+
+    def _create_detector_supervisor(self) -> Optional[DetectorSupervisor]:
+        """Create the supervisor for the ML programs, unless they run in this process or are started by hand.
+
+        Returns
+        -------
+        DetectorSupervisor or None
+            The supervisor for the ML programs, if the monitor launches them.
+        """
+        if self.DETECTOR_MODE != "process" or not self.LAUNCH_DETECTORS:
+            return None
+        return DetectorSupervisor([port.name.lower() for port in ML_Ports], self.DETECTOR_PYTHON)
+
+    def _wait_for_detectors(self):
+        """Wait until every ML program has loaded its model and can answer requests."""
+        if self._supervisor is None:
+            return
+        self._logger.info("Waiting for the ML detectors to be ready...")
+        if self._supervisor.wait_ready(self.DETECTOR_READY_TIMEOUT):
+            self._logger.info("The ML detectors are ready.")
+        else:
+            # Polling anyway is better than not monitoring at all; the late detectors fail to "benign"
+            not_ready = [name for name, health in self._supervisor.health().items() if not health["ready"]]
+            self._logger.error(f"Detectors not ready after {self.DETECTOR_READY_TIMEOUT}s: {', '.join(not_ready)}")
+
+    def _create_feature_graph(self) -> FeatureGraph:
+        """Create the derived-feature graph, subscribed to the features the ML detectors need.
+
+        Returns
+        -------
+        FeatureGraph
+            The derived-feature graph.
+        """
+        graph = default_graph()
+        for port in ML_Ports:
+            graph.subscribe(ips_detectors.DETECTORS[port.name.lower()].DERIVED_FEATURES)
+        if self._cascade is not None:
+            graph.subscribe(self._cascade.DERIVED_FEATURES)
+        return graph
 
     def start(self):
         """Start the monitor and begin listening for messages."""
         self._start_time = int(time.time())
+        self._health_sampler.start()
+        # Launch the ML programs first, so their models load while the vehicle connects
+        if self._supervisor is not None:
+            self._supervisor.start()
         # Connect to the MAVLink stream using DroneKit
         self._logger.debug(f"Listening for vehicle heartbeat on {self._conn_str}...")
         try:
             self._vehicle = dronekit.connect(self._conn_str, wait_ready=True)
-
-            # Override the rangefinder's behavior
-            # TODO: extend the default dronekit class to include this
-            @self._vehicle.on_message("DISTANCE_SENSOR")
-            def listener(self: dronekit.Vehicle, name: str, m: Any):
-                self._rngfnd_distance = m.current_distance
-                self.notify_attribute_listeners("rangefinder", self.rangefinder)
-
+            # Keep the telemetry store up to date as messages arrive (this includes the rangefinder)
+            self._telemetry.attach(self._vehicle)
             self._actions_vehicle_first_connected()
+            # Only start polling once every detector can answer
+            self._wait_for_detectors()
             self._event_loop()
         except dronekit.APIException:
             self._logger.error("Connection timed out")
+            if self._supervisor is not None:
+                self._supervisor.stop()
 
     def stop(self):
         """Stop the monitor and close the vehicle connection."""
         if self._vehicle is not None:
             # Close the vehicle connection
+            self._telemetry.detach()
             self._vehicle.close()
             self._logger.info("Connection closed.")
+        self._health_sampler.stop()
+        # Make sure every logged row is on the disk
+        self._csv_writer.close()
+        self._logger.info(f"Scheduler: {self._scheduler.stats()}")
+        self._log_latency_summary()
+        if self._cascade is not None:
+            self._logger.info(f"Rule cascade: {self._cascade.stats()}")
+        # Report how the ML programs behaved and close the connections to them
+        for port, health in self._ml_dispatcher.health().items():
+            self._logger.info(f"Detector on port {port}: {health}")
+        self._ml_dispatcher.close()
+        if self._supervisor is not None:
+            self._logger.info(f"Detector programs: {self._supervisor.health()}")
+            self._supervisor.stop()
         # Close the MAVLink manager if it is enabled
         if self._mavlink_manager is not None:
             self._mavlink_manager.stop()
@@ -208,6 +323,12 @@ class Monitor:
     def _actions_vehicle_first_connected(self):
         """Take action when the vehicle is first connected."""
         self._logger.info("Vehicle connected.")
+        # Discover the vehicle's attributes once, rather than on every poll, and start the
+        # telemetry store from them; the attributes fed by MAVLink messages are then left out
+        schema = TelemetrySchema(self._vehicle)
+        self._telemetry.seed(schema.read(self._vehicle))
+        schema.exclude(self._telemetry.fields)
+        self._schema = schema
         # If POLL_WHILE_DISARMED is True, create the log file;
         # otherwise it is created when the vehicle is first armed
         if self.POLL_WHILE_DISARMED:
@@ -267,8 +388,10 @@ class Monitor:
             raise RuntimeError("Vehicle connection not established.")
         try:
             armed_state = False
+            self._scheduler.start()
             while True:
-                loop_start_time = time.time()
+                # Wait for the next tick on the fixed-rate schedule
+                self._scheduler.wait()
                 # Determine the vehicle's arming state, and if it changed
                 if self._vehicle.armed:
                     # If the vehicle was previously disarmed, trigger the state change actions
@@ -286,8 +409,6 @@ class Monitor:
                 if self._mavlink_manager is not None:
                     # The returned list of messages doesn't matter, just that they are logged
                     self._mavlink_manager.poll()
-                # Sleep for the remaining time before the next loop, if there is time left
-                time.sleep(max(self.POLL_INTERVAL - (time.time() - loop_start_time), 0))
 
         except KeyboardInterrupt:
             self._logger.info("Stopped listening for messages.")
@@ -302,59 +423,48 @@ class Monitor:
             The current data from the vehicle.
         """
         # Get the computer data
-        current_data.update(self._get_computer_data())
-        # Send the data to the machine learning model
-        ml_result = 0
-        for i in range(3):
-            port_number = ML_Ports.GPS.value + i
-            this_result = self.send_to_ml(current_data, port_number)
-            ml_result = (ml_result << 1) + this_result
-            print(f"{this_result}", end=" ")
-        print()
-        current_data.update({"ml_verdict": ml_result})
-
-    def _get_vehicle_data_recursive(self, obj: Any) -> dict:
-        """Recursively get the properties in the vehicle object.
+        with self._latency.stage("computer"):
+            current_data.update(self._get_computer_data())
+        # Derive the features the detectors share, once for all of them
+        with self._latency.stage("features"):
+            current_data.update(self._features.evaluate(current_data))
+        # Send the data to the machine learning models
+        current_data.update({"ml_verdict": self._get_ml_verdict(current_data)})
+
+    def _get_ml_verdict(self, current_data: dict) -> int:
+        """Run the detection cascade and combine the verdicts of every detector.
+
+        The rule checks run first; only the detectors they leave undecided are queried,
+        all at once. The stage that decided each detector's verdict ("rule:<name>", "ml",
+        or "none" if its ML model didn't reply) is recorded in the data in place.
 
         Parameters
         ----------
-        obj : Any
-            The object to get the data from.
+        current_data : dict
+            The current data from the vehicle.
 
         Returns
         -------
-        dict
-            The data from the vehicle object.
+        int
+            The combined verdict, with one bit per model (GPS is the most significant bit).
         """
-        # Initialize the working dictionary
-        working_dict = {}
-        # The dronekit.Vehicle object has attrs that cause problems
-        if isinstance(obj, dronekit.Vehicle):
-            pattern = r"(?!(_|capabilities|channels))\w+"
-        # The dronekit.Channels object is a subclass of dict
-        elif isinstance(obj, (dronekit.Channels, dronekit.ChannelsOverride)):
-            # Add the channel values
-            for k, v in obj.items():
-                working_dict[k] = v
-            # Don't add the "count" property
-            pattern = r"(?!(_|count))\w+"
-        else:
-            pattern = r"(?!_)\w+"
-        # Iterate through the object's properties and handle them
-        for k, o in ips_utils.misc.get_object_properties(obj, pattern).items():
-            # If the object belongs to the dronekit module, get its internal keys
-            if hasattr(o, "__module__") and o.__module__ == "dronekit":
-                working_dict[k] = self._get_vehicle_data_recursive(o)
-            # Else, if this object is from the pymavlink module, ignore it
-            elif hasattr(o, "__module__") and o.__module__ == "pymavlink.dialects.v20.ardupilotmega":
-                continue
-            # Else, if this belongs to some other module, report it and move on
-            elif hasattr(o, "__module__") and o.__module__ != "builtins":
-                self._logger.debug(f"Skipping object {k} from module {o.__module__}")
-            # Else, simply add the value to the working dictionary
+        decided: dict[int, str] = {}
+        if self._cascade is not None:
+            with self._latency.stage("rules"):
+                decided = self._cascade.check(current_data)
+        undecided = [port for port in self._ml_dispatcher.ports if port not in decided]
+        # Dispatch even if the rules decided everything, so the detectors' history windows move on
+        with self._latency.stage("ml"):
+            verdicts = self._ml_dispatcher.dispatch(current_data, self.last_data, ports=undecided)
+        for port in self._ml_dispatcher.ports:
+            if port in decided:
+                verdicts[port] = 1
+                stage = f"rule:{decided[port]}"
             else:
-                working_dict[k] = o
-        return working_dict
+                stage = "ml" if verdicts.get(port) is not None else "none"
+            current_data[f"verdict_stage.{ML_Ports(port).name.lower()}"] = stage
+        print(" ".join(str(verdicts.get(port) or 0) for port in self._ml_dispatcher.ports))
+        return self._ml_dispatcher.combine(verdicts)
 
     def _on_state_change_armed(self):
         """Take action when the vehicle is first armed."""
@@ -368,19 +478,35 @@ class Monitor:
         """Take action when the vehicle is first disarmed."""
         self._logger.info("Vehicle is now disarmed.")
         # If POLL_WHILE_DISARMED is False, close the log file now;
-        # otherwise it will be closed when the monitor stops
+        # otherwise it will be closed when the monitor stops, but the flight is written out now
         if not self.POLL_WHILE_DISARMED:
             self._csv_writer.close()
+        elif self._csv_writer.file_open:
+            self._csv_writer.flush()
 
     def _poll_vehicle(self):
         """Poll the vehicle for data."""
         # Get the vehicle's data and log it
         self._logger.debug("Requesting vehicle data...")
-        current_data = self.get_vehicle_data()
-        # Log the data and append it to the list
-        self._csv_writer.log(current_data)
-        self._data.append(current_data)
+        with self._latency.stage("poll"):
+            current_data = self.get_vehicle_data()
+            # Record how late this tick started, to show whether the sampling rate held
+            current_data["tick_lateness"] = self._scheduler.last_lateness
+            # Log the data and append it to the history
+            with self._latency.stage("csv"):
+                self._csv_writer.log(current_data)
+            self._history.append(current_data)
+        # Periodically write the latency of each stage to the log
+        if time.monotonic() - self._last_latency_report >= self.LATENCY_REPORT_INTERVAL:
+            self._log_latency_summary()
+
+    def _log_latency_summary(self):
+        """Write the latency of each stage of the poll pipeline to the log."""
+        self._last_latency_report = time.monotonic()
+        self._logger.info(
+            f"Latency summary:\n{self._latency.format_summary()}", extra={"latency": self._latency.summary()}
+        )
 
     def _start_new_logfile(self):
         """Start a new log file for the monitor."""
-        self._csv_writer.open(f"logs/{ips_utils.format.datetime_str()}_data.csv")
+        self._csv_writer.open(f"logs/{ips_utils.format.datetime_str()}_data{self._csv_writer.SUFFIX}")
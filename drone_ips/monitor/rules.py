@@ -0,0 +1,192 @@
+"""Cheap rule checks that decide the obvious cases before the ML detectors are asked."""
+
+from typing import Callable, Optional
+
+import numpy as np
+
+import drone_ips.detectors as ips_detectors
+
+# Static types
+Columns = dict[str, np.ndarray]
+Residual = Callable[[Columns], np.ndarray]
+
+
+class Rule:
+    """A physical consistency check for one detector's sensor.
+
+    Parameters
+    ----------
+    name : str
+        The name of the rule, recorded as the stage that decided the verdict.
+    port : int
+        The port of the detector the rule decides for.
+    residual : callable
+        The function computing how far each row is from consistent, from the telemetry columns.
+    limit : float
+        The residual above which the rule fires.
+    """
+
+    def __init__(self, name: str, port: int, residual: Residual, limit: float):
+        self.name = name
+        self.port = port
+        self.residual = residual
+        self.limit = limit
+
+
+class RuleCascade:
+    """The first stage of detection: rule checks that only fire when the answer is obvious.
+
+    Each rule compares quantities that physics ties together, like the speed implied by
+    successive GPS fixes and the groundspeed the autopilot reports, and fires only when
+    they disagree by far more than sensor noise could explain. A detector whose sensor
+    failed a rule is marked malicious straight away; the ML detector is only asked when
+    no rule fired for it. Missing values never fire a rule.
+
+    The checks run on columns, so `evaluate` works the same on one tick or on a whole
+    recorded flight (e.g. a DataFrame's columns) when tuning the limits.
+
+    Parameters
+    ----------
+    max_speed : float, optional
+        The fastest the vehicle can fly (m/s).
+    speed_tolerance : float, optional
+        How far apart the speeds from the GPS fixes, the groundspeed and the velocity can be (m/s).
+    altitude_tolerance : float, optional
+        How much lower than the altitude the rangefinder can read (m).
+    rangefinder_max : float, optional
+        The altitude below which the rangefinder is expected to see the ground (m).
+    """
+
+    MAX_SPEED: float = 30.0
+    SPEED_TOLERANCE: float = 10.0
+    ALTITUDE_TOLERANCE: float = 3.0
+    RANGEFINDER_MAX: float = 15.0
+    # The lowest GPS fix type that gives a position (2 = 2D fix)
+    MIN_FIX_TYPE: int = 2
+    # The telemetry fields the rules read, and the derived features they need from the feature graph
+    FIELDS: list[str] = [
+        "gps_0.fix_type",
+        "groundspeed",
+        "velocity[0]",
+        "velocity[1]",
+        "location.global_relative_frame.alt",
+    ]
+    DERIVED_FEATURES: list[str] = ["speed", "altitude_residual"]
+
+    def __init__(
+        self,
+        max_speed: Optional[float] = None,
+        speed_tolerance: Optional[float] = None,
+        altitude_tolerance: Optional[float] = None,
+        rangefinder_max: Optional[float] = None,
+    ):
+        self.MAX_SPEED = max_speed if max_speed is not None else RuleCascade.MAX_SPEED
+        self.SPEED_TOLERANCE = speed_tolerance if speed_tolerance is not None else RuleCascade.SPEED_TOLERANCE
+        self.ALTITUDE_TOLERANCE = (
+            altitude_tolerance if altitude_tolerance is not None else RuleCascade.ALTITUDE_TOLERANCE
+        )
+        self.RANGEFINDER_MAX = rangefinder_max if rangefinder_max is not None else RuleCascade.RANGEFINDER_MAX
+        gps, lidar = ips_detectors.GPSDetector.PORT, ips_detectors.LiDARDetector.PORT
+        self.rules = [
+            Rule("gps_no_fix", gps, lambda c: self.MIN_FIX_TYPE - c["gps_0.fix_type"], 0.0),
+            Rule("gps_jump", gps, lambda c: c["speed"], self.MAX_SPEED),
+            Rule("gps_groundspeed", gps, lambda c: np.abs(c["speed"] - c["groundspeed"]), self.SPEED_TOLERANCE),
+            Rule("gps_velocity", gps, lambda c: np.abs(c["speed"] - self._horizontal(c)), self.SPEED_TOLERANCE),
+            Rule(
+                "velocity_groundspeed",
+                gps,
+                lambda c: np.abs(self._horizontal(c) - c["groundspeed"]),
+                self.SPEED_TOLERANCE,
+            ),
+            Rule("lidar_altitude", lidar, self._rangefinder_shortfall, self.ALTITUDE_TOLERANCE),
+        ]
+        self._limits = np.array([rule.limit for rule in self.rules])
+        # How many ticks were checked, and how many verdicts each rule decided
+        self.hits = dict.fromkeys((rule.name for rule in self.rules), 0)
+        self.checks = 0
+
+    def evaluate(self, columns: Columns) -> np.ndarray:
+        """Run every rule on every row.
+
+        Parameters
+        ----------
+        columns : dict
+            The telemetry, as a float array per field (NaN where missing).
+
+        Returns
+        -------
+        np.ndarray
+            Whether each rule (row) fired on each sample (column).
+        """
+        with np.errstate(invalid="ignore"):
+            residuals = np.vstack([rule.residual(columns) for rule in self.rules])
+            return residuals > self._limits[:, None]
+
+    def check(self, current_data: dict) -> dict[int, str]:
+        """Run the rules on the current tick.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle, including the derived features.
+
+        Returns
+        -------
+        dict
+            The name of the first rule that fired, by detector port; ports with no entry are undecided.
+        """
+        columns = {
+            name: np.array([ips_detectors.protocol.to_float(current_data.get(name))])
+            for name in self.FIELDS + self.DERIVED_FEATURES
+        }
+        fired = self.evaluate(columns)[:, 0]
+        self.checks += 1
+        decided: dict[int, str] = {}
+        for i in np.flatnonzero(fired):
+            rule = self.rules[i]
+            if rule.port not in decided:
+                decided[rule.port] = rule.name
+                self.hits[rule.name] += 1
+        return decided
+
+    def stats(self) -> dict:
+        """Report how often the rules decided.
+
+        Returns
+        -------
+        dict
+            The number of checks and the number of verdicts each rule decided.
+        """
+        return {"checks": self.checks, "hits": dict(self.hits)}
+
+    def _rangefinder_shortfall(self, columns: Columns) -> np.ndarray:
+        """Get how much lower than the altitude the rangefinder reads, where it should see the ground.
+
+        Parameters
+        ----------
+        columns : dict
+            The telemetry columns.
+
+        Returns
+        -------
+        np.ndarray
+            The altitude minus the rangefinder distance (m), or NaN above the rangefinder's range.
+        """
+        altitude = columns["location.global_relative_frame.alt"]
+        return np.where(altitude < self.RANGEFINDER_MAX, columns["altitude_residual"], np.nan)
+
+    @staticmethod
+    def _horizontal(columns: Columns) -> np.ndarray:
+        """Get the horizontal speed from the velocity vector.
+
+        Parameters
+        ----------
+        columns : dict
+            The telemetry columns.
+
+        Returns
+        -------
+        np.ndarray
+            The horizontal speed (m/s).
+        """
+        return np.hypot(columns["velocity[0]"], columns["velocity[1]"])
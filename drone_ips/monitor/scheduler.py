@@ -0,0 +1,180 @@
+"""Drift-free fixed-rate scheduler for the monitor's event loop."""
+
+import time
+from enum import Enum
+from typing import Optional
+
+import drone_ips.logging as ips_logging
+
+
+class OverrunPolicy(Enum):
+    """What the scheduler does when a tick overruns past the next deadline."""
+
+    CATCH_UP = "catch_up"  # Run the missed ticks back-to-back until back on schedule
+    SKIP = "skip"  # Drop the missed ticks and continue at the next deadline on the grid
+    DEGRADE = "degrade"  # Stretch the interval while overrunning, then recover gradually
+
+
+class FixedRateScheduler:
+    """Run ticks at a fixed rate against absolute deadlines on the monotonic clock.
+
+    Sleeping for "interval minus elapsed" lets every overrun shift all later ticks.
+    Instead, each deadline is placed on a fixed grid (start + n * interval), so the
+    long-run rate holds. Every tick records how late it started, and overruns are
+    counted and handled according to the overrun policy.
+
+    Parameters
+    ----------
+    interval : float
+        The nominal time (in seconds) between ticks.
+    policy : OverrunPolicy, optional
+        What to do when a tick overruns past the next deadline.
+    max_interval : float, optional
+        The longest interval the DEGRADE policy may stretch to (8x the nominal interval if None).
+
+    Examples
+    --------
+    >>> scheduler = FixedRateScheduler(0.1, OverrunPolicy.SKIP)
+    >>> scheduler.start()
+    >>> while True:
+    ...     scheduler.wait()
+    ...     do_work()
+    """
+
+    # The number of on-time ticks before the DEGRADE policy halves the interval again
+    RECOVERY_TICKS: int = 10
+
+    def __init__(
+        self, interval: float, policy: OverrunPolicy = OverrunPolicy.SKIP, max_interval: Optional[float] = None
+    ):
+        self._logger = ips_logging.LogManager.get_logger("scheduler")
+        self.interval = interval
+        self.policy = policy
+        self.max_interval = max_interval if max_interval is not None else interval * 8
+        self.start()
+
+    @property
+    def period(self) -> float:
+        """The current time between ticks, which differs from the interval only while degraded.
+
+        Returns
+        -------
+        float
+            The current time (in seconds) between ticks.
+        """
+        return self._period
+
+    @property
+    def last_lateness(self) -> float:
+        """How late the most recent tick started.
+
+        Returns
+        -------
+        float
+            How late (in seconds) the most recent tick started after its deadline.
+        """
+        return self._last_lateness
+
+    def start(self):
+        """Reset the schedule so the first tick is due immediately."""
+        self._period = self.interval
+        self._next_deadline = time.monotonic()
+        self._on_time_streak = 0
+        self._last_lateness = 0.0
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def wait(self) -> float:
+        """Sleep until the next deadline and schedule the one after it.
+
+        Returns
+        -------
+        float
+            How late (in seconds) this tick started after its deadline.
+        """
+        deadline = self._next_deadline
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        now = time.monotonic()
+        lateness = max(0.0, now - deadline)
+        # Record how late the tick is
+        self.ticks += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        self._last_lateness = lateness
+        # Decide when the next tick is due
+        if lateness >= self._period:
+            self._on_overrun(deadline, now, lateness)
+        else:
+            self._on_time(deadline)
+        return lateness
+
+    def stats(self) -> dict:
+        """Report how well the schedule has been kept.
+
+        Returns
+        -------
+        dict
+            The tick, overrun and missed tick counts, and the mean and max lateness.
+        """
+        return {
+            "policy": self.policy.value,
+            "interval": self.interval,
+            "period": self._period,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "mean_lateness": self.total_lateness / self.ticks if self.ticks > 0 else 0.0,
+            "max_lateness": self.max_lateness,
+        }
+
+    def _on_time(self, deadline: float):
+        """Schedule the next tick after one that started before the following deadline.
+
+        Parameters
+        ----------
+        deadline : float
+            The deadline of the tick that just started.
+        """
+        self._next_deadline = deadline + self._period
+        if self.policy == OverrunPolicy.DEGRADE and self._period > self.interval:
+            self._on_time_streak += 1
+            if self._on_time_streak >= self.RECOVERY_TICKS:
+                self._period = max(self.interval, self._period / 2)
+                self._on_time_streak = 0
+                self._logger.info(f"Recovering; tick interval is now {self._period:.3f}s")
+
+    def _on_overrun(self, deadline: float, now: float, lateness: float):
+        """Schedule the next tick after one that started past the following deadline.
+
+        Parameters
+        ----------
+        deadline : float
+            The deadline of the tick that just started.
+        now : float
+            The monotonic time at which the tick started.
+        lateness : float
+            How late (in seconds) the tick started.
+        """
+        self.overruns += 1
+        missed = int(lateness // self._period)
+        self._logger.debug(f"Tick started {lateness:.3f}s late ({missed} deadline(s) passed)")
+        if self.policy == OverrunPolicy.CATCH_UP:
+            # Stay on the grid; the following ticks run back-to-back until caught up
+            self._next_deadline = deadline + self._period
+        elif self.policy == OverrunPolicy.SKIP:
+            # Drop the deadlines that already passed and continue on the grid
+            self.missed_ticks += missed
+            self._next_deadline = deadline + (missed + 1) * self._period
+        else:
+            # Stretch the interval and start a new grid from now
+            self.missed_ticks += missed
+            self._on_time_streak = 0
+            if self._period < self.max_interval:
+                self._period = min(self.max_interval, self._period * 2)
+                self._logger.warning(f"Overrunning; tick interval degraded to {self._period:.3f}s")
+            self._next_deadline = now + self._period
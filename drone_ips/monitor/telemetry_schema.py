@@ -0,0 +1,302 @@
+"""Compiled accessors for reading the vehicle's telemetry without per-tick reflection."""
+
+from collections.abc import Iterable
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Optional, Union
+
+import dronekit
+
+import drone_ips.logging as ips_logging
+import drone_ips.utils as ips_utils
+
+# Static types
+Getter = Callable[[Any], Any]
+Shape = Optional[Union[int, frozenset]]  # A list's size or a dict's keys; None for other objects
+
+# Values that are stored as-is; anything else found in a leaf means the vehicle changed shape
+SCALAR_TYPES = (type(None), bool, int, float, str)
+
+
+class SchemaChanged(Exception):
+    """Raised when the vehicle no longer matches the compiled schema."""
+
+
+class TelemetrySchema:
+    """A flat list of accessors for the vehicle's attributes, compiled once.
+
+    Walking `dir()` on the vehicle and every nested object is expensive, so the walk
+    is done once and turned into a list of getters with pre-built dotted keys. The
+    keys match the output of `flatten_dict` on the old recursive walk. Reading the
+    schema only checks that every nested object still has the type (and, for
+    containers, the keys or size) it had when the schema was compiled; if not, the schema
+    is recompiled from the vehicle before reading. Keys can also be left out after
+    compiling, with `exclude`, without walking the vehicle again.
+
+    Parameters
+    ----------
+    root : Any
+        The object to compile the schema from, typically a `dronekit.Vehicle`.
+    exclude : iterable of str, optional
+        Dotted keys to leave out of the schema, e.g. because they are fed from elsewhere.
+    """
+
+    def __init__(self, root: Any, exclude: Optional[Iterable[str]] = None):
+        self._logger = ips_logging.LogManager.get_logger("telemetry_schema")
+        self._exclude = frozenset(exclude) if exclude is not None else frozenset()
+        self.compile(root)
+
+    @property
+    def keys(self) -> list[str]:
+        """The dotted keys produced by the schema.
+
+        Returns
+        -------
+        list of str
+            The dotted keys produced by the schema.
+        """
+        return [key for _, _, keys in self._leaves for key in keys]
+
+    def compile(self, root: Any):
+        """Discover the attribute paths of an object and build the accessors for them.
+
+        Parameters
+        ----------
+        root : Any
+            The object to compile the schema from.
+        """
+        # Nested objects: (parent node index, getter, expected type, expected shape); node 0 is the root
+        self._nodes: list[tuple[int, Getter, type, Shape]] = []
+        # Values: (node index, getter returning a tuple, keys), and the getter type and names each getter was built from
+        self._leaves: list[tuple[int, Getter, tuple[str, ...]]] = []
+        self._sources: list[tuple[Callable[..., Getter], list]] = []
+        # Keys whose value was None when compiled, which may later become a nested object
+        self._watched: list[str] = []
+        self._walk(root, 0, "")
+        self._logger.info(f"Compiled telemetry schema with {len(self.keys)} keys from {len(self._nodes)} objects")
+
+    def exclude(self, keys: Iterable[str]):
+        """Leave more keys out of the schema, without compiling it again.
+
+        Parameters
+        ----------
+        keys : iterable of str
+            The dotted keys to leave out, e.g. because they are now fed from elsewhere.
+        """
+        self._exclude = self._exclude.union(keys)
+        leaves, sources = self._leaves, self._sources
+        self._leaves, self._sources = [], []
+        for (node, _, leaf_keys), (getter_type, names) in zip(leaves, sources):
+            kept = [(name, key) for name, key in zip(names, leaf_keys) if key not in self._exclude]
+            self._add_leaves(node, getter_type, [name for name, _ in kept], [key for _, key in kept])
+        self._watched = [key for key in self._watched if key not in self._exclude]
+
+    def read(self, root: Any) -> dict:
+        """Read the current values from an object, recompiling the schema if its shape changed.
+
+        Parameters
+        ----------
+        root : Any
+            The object to read the values from.
+
+        Returns
+        -------
+        dict
+            A flat dictionary of the object's values with dot-separated keys.
+        """
+        try:
+            return self._read(root)
+        except SchemaChanged:
+            self._logger.info("Vehicle shape changed; recompiling the telemetry schema")
+            self.compile(root)
+            return self._read(root)
+
+    def _read(self, root: Any) -> dict:
+        """Read the current values from an object using the compiled accessors.
+
+        Parameters
+        ----------
+        root : Any
+            The object to read the values from.
+
+        Returns
+        -------
+        dict
+            A flat dictionary of the object's values with dot-separated keys.
+
+        Raises
+        ------
+        SchemaChanged
+            If the object doesn't match the compiled schema.
+        """
+        objects: list[Any] = [root]
+        for parent, getter, expected_type, expected_shape in self._nodes:
+            obj = getter(objects[parent])
+            if type(obj) is not expected_type or (expected_shape is not None and _shape(obj) != expected_shape):
+                raise SchemaChanged()
+            objects.append(obj)
+        data: dict[str, Any] = {}
+        for node, getter, keys in self._leaves:
+            data.update(zip(keys, getter(objects[node])))
+        for key in self._watched:
+            if not isinstance(data[key], SCALAR_TYPES):
+                raise SchemaChanged()
+        return data
+
+    def _walk(self, obj: Any, node: int, prefix: str):
+        """Recursively compile the accessors for an object's properties.
+
+        Parameters
+        ----------
+        obj : Any
+            The object to compile the accessors for.
+        node : int
+            The node index of the object.
+        prefix : str
+            The dotted key of the object ("" for the root).
+        """
+        attr_names: list[str] = []
+        item_names: list[Any] = []
+        # The dronekit.Vehicle object has attrs that cause problems
+        if isinstance(obj, dronekit.Vehicle):
+            pattern = r"(?!(_|capabilities|channels))\w+"
+        # The dronekit.Channels object is a subclass of dict
+        elif isinstance(obj, (dronekit.Channels, dronekit.ChannelsOverride)):
+            # Add the channel values
+            item_names.extend(obj.keys())
+            # Don't add the "count" property
+            pattern = r"(?!(_|count))\w+"
+        else:
+            pattern = r"(?!_)\w+"
+        # Iterate through the object's properties and handle them
+        for k, o in ips_utils.misc.get_object_properties(obj, pattern).items():
+            # If the object belongs to the dronekit module, get its internal keys
+            if hasattr(o, "__module__") and o.__module__ == "dronekit":
+                child = self._add_node(node, attrgetter(k), o)
+                self._walk(o, child, f"{prefix}{k}.")
+                self._prune_node(child)
+            # Else, if this object is from the pymavlink module, ignore it
+            elif hasattr(o, "__module__") and o.__module__ == "pymavlink.dialects.v20.ardupilotmega":
+                continue
+            # Else, if this belongs to some other module, report it and move on
+            elif hasattr(o, "__module__") and o.__module__ != "builtins":
+                self._logger.debug(f"Skipping object {prefix}{k} from module {o.__module__}")
+            # Else, if this is a container, flatten it like flatten_dict does
+            elif isinstance(o, (dict, list)):
+                child = self._add_node(node, attrgetter(k), o)
+                self._walk_container(o, child, f"{prefix}{k}")
+                self._prune_node(child)
+            # Else, if this value is fed from elsewhere, leave it out
+            elif f"{prefix}{k}" in self._exclude:
+                continue
+            # Else, simply add the value to the schema
+            else:
+                attr_names.append(k)
+                if o is None:
+                    self._watched.append(f"{prefix}{k}")
+        item_names = [k for k in item_names if f"{prefix}{k}" not in self._exclude]
+        self._add_leaves(node, attrgetter, attr_names, [f"{prefix}{k}" for k in attr_names])
+        self._add_leaves(node, itemgetter, item_names, [f"{prefix}{k}" for k in item_names])
+
+    def _walk_container(self, obj: Any, node: int, key: str):
+        """Recursively compile the accessors for the values in a dict or list.
+
+        Parameters
+        ----------
+        obj : dict or list
+            The container to compile the accessors for.
+        node : int
+            The node index of the container.
+        key : str
+            The dotted key of the container.
+        """
+        if isinstance(obj, dict):
+            entries = [(k, v, f"{key}.{k}") for k, v in obj.items()]
+        else:
+            entries = [(i, v, f"{key}[{i}]") for i, v in enumerate(obj)]
+        item_names = []
+        item_keys = []
+        for k, v, item_key in entries:
+            if isinstance(v, (dict, list)):
+                child = self._add_node(node, itemgetter(k), v)
+                self._walk_container(v, child, item_key)
+                self._prune_node(child)
+            elif item_key not in self._exclude:
+                item_names.append(k)
+                item_keys.append(item_key)
+        self._add_leaves(node, itemgetter, item_names, item_keys)
+
+    def _add_node(self, parent: int, getter: Getter, obj: Any) -> int:
+        """Add a nested object to the schema.
+
+        Parameters
+        ----------
+        parent : int
+            The node index of the parent object.
+        getter : callable
+            The getter that returns the nested object from its parent.
+        obj : Any
+            The nested object, as seen when compiling.
+
+        Returns
+        -------
+        int
+            The node index of the nested object.
+        """
+        self._nodes.append((parent, getter, type(obj), _shape(obj)))
+        return len(self._nodes)
+
+    def _prune_node(self, node: int):
+        """Remove a nested object from the schema if none of its values are read.
+
+        Parameters
+        ----------
+        node : int
+            The node index of the nested object, which must be the last node added.
+        """
+        if len(self._nodes) == node and all(leaf[0] != node for leaf in self._leaves):
+            self._nodes.pop()
+
+    def _add_leaves(self, node: int, getter_type: Callable[..., Getter], names: list, keys: list[str]):
+        """Add the values of an object to the schema, read with a single getter call.
+
+        Parameters
+        ----------
+        node : int
+            The node index of the object holding the values.
+        getter_type : callable
+            Either `operator.attrgetter` or `operator.itemgetter`.
+        names : list
+            The attribute names or item keys of the values.
+        keys : list of str
+            The dotted keys of the values.
+        """
+        if len(names) == 0:
+            return
+        self._sources.append((getter_type, names))
+        getter = getter_type(*names)
+        # A getter for a single name returns the bare value, so wrap it in a tuple
+        if len(names) == 1:
+            single = getter
+            getter = lambda o: (single(o),)  # noqa: E731
+        self._leaves.append((node, getter, tuple(keys)))
+
+
+def _shape(obj: Any) -> Shape:
+    """Get the shape of a container, which the compiled accessors depend on.
+
+    Parameters
+    ----------
+    obj : Any
+        The object.
+
+    Returns
+    -------
+    int, frozenset or None
+        The keys of a dict, the size of a list, or None for any other object.
+    """
+    # A dict whose keys changed breaks the item getters even if its size didn't
+    if isinstance(obj, dict):
+        return frozenset(obj.keys())
+    if isinstance(obj, list):
+        return len(obj)
+    return None
@@ -0,0 +1,327 @@
+"""Push-based store of the vehicle's telemetry, updated by MAVLink message listeners."""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import dronekit
+
+# Static types
+MessageHandler = Callable[[Any], dict]
+
+
+class TelemetryStore:
+    """A store of the vehicle's telemetry, updated in place as MAVLink messages arrive.
+
+    Each registered handler turns one MAVLink message type into the flattened fields
+    that the monitor logs (e.g. GPS_RAW_INT => gps_0.*). The store listens for those
+    messages on the vehicle, so the fields are always as fresh as the last message and
+    never have to be polled. Every field records when it last arrived, and fields that
+    changed since the last snapshot are flagged as dirty.
+
+    Examples
+    --------
+    Register a handler for a new message type:
+
+    >>> @TelemetryStore.handler("SCALED_PRESSURE", fields=("barometer.pressure",))
+    ... def _scaled_pressure(m):
+    ...     return {"barometer.pressure": m.press_abs}
+    """
+
+    # Registered handlers: message name => (fields produced, handler)
+    HANDLERS: dict[str, tuple[tuple[str, ...], MessageHandler]] = {}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: dict[str, Any] = {}
+        self._arrivals: dict[str, float] = {}
+        self._dirty: set[str] = set()
+        self._vehicle: Optional[dronekit.Vehicle] = None
+
+    @classmethod
+    def handler(cls, message_name: str, fields: tuple[str, ...]) -> Callable[[MessageHandler], MessageHandler]:
+        """Register a function that turns a MAVLink message into telemetry fields.
+
+        Parameters
+        ----------
+        message_name : str
+            The name of the MAVLink message to handle.
+        fields : tuple of str
+            The flattened fields the handler produces.
+
+        Returns
+        -------
+        callable
+            A decorator that registers the handler and returns it unchanged.
+        """
+
+        def decorator(func: MessageHandler) -> MessageHandler:
+            """Register the handler for the message.
+
+            Parameters
+            ----------
+            func : callable
+                The handler.
+
+            Returns
+            -------
+            callable
+                The handler, unchanged.
+            """
+            cls.HANDLERS[message_name] = (fields, func)
+            return func
+
+        return decorator
+
+    @property
+    def fields(self) -> set[str]:
+        """The fields that are fed by the registered message handlers.
+
+        Returns
+        -------
+        set of str
+            The fields that are fed by the registered message handlers.
+        """
+        return {field for fields, _ in self.HANDLERS.values() for field in fields}
+
+    @property
+    def dirty(self) -> set[str]:
+        """The fields that changed since the last snapshot.
+
+        Returns
+        -------
+        set of str
+            The fields that changed since the last snapshot.
+        """
+        with self._lock:
+            return set(self._dirty)
+
+    def attach(self, vehicle: dronekit.Vehicle):
+        """Start updating the store from the vehicle's MAVLink messages.
+
+        Parameters
+        ----------
+        vehicle : dronekit.Vehicle
+            The vehicle to listen to.
+        """
+        self.detach()
+        for message_name in self.HANDLERS:
+            vehicle.add_message_listener(message_name, self._on_message)
+        self._vehicle = vehicle
+
+    def detach(self):
+        """Stop listening to the vehicle's MAVLink messages."""
+        if self._vehicle is not None:
+            for message_name in self.HANDLERS:
+                self._vehicle.remove_message_listener(message_name, self._on_message)
+            self._vehicle = None
+
+    def seed(self, data: dict):
+        """Fill in fields that no message has provided yet, without recording an arrival time.
+
+        Parameters
+        ----------
+        data : dict
+            The flattened vehicle data to take the initial values from.
+        """
+        with self._lock:
+            for field in self.fields:
+                if field in data and field not in self._values:
+                    self._values[field] = data[field]
+
+    def update(self, fields: dict, timestamp: Optional[float] = None):
+        """Update fields in place and mark them as dirty.
+
+        Parameters
+        ----------
+        fields : dict
+            The flattened fields to update.
+        timestamp : float, optional
+            The arrival time of the fields (the current time if None).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._values.update(fields)
+            for field in fields:
+                self._arrivals[field] = timestamp
+            self._dirty.update(fields)
+
+    def snapshot(self) -> dict:
+        """Copy the current values of every field and clear the dirty flags.
+
+        Returns
+        -------
+        dict
+            The current values of every field.
+        """
+        with self._lock:
+            self._dirty.clear()
+            return dict(self._values)
+
+    def arrival_times(self) -> dict[str, float]:
+        """Get the time at which each field last arrived.
+
+        Returns
+        -------
+        dict
+            The time (seconds since epoch) at which each field last arrived.
+        """
+        with self._lock:
+            return dict(self._arrivals)
+
+    def _on_message(self, vehicle: dronekit.Vehicle, name: str, message: Any):
+        """Update the store from a MAVLink message.
+
+        Parameters
+        ----------
+        vehicle : dronekit.Vehicle
+            The vehicle that received the message.
+        name : str
+            The name of the MAVLink message.
+        message : Any
+            The MAVLink message.
+        """
+        self.update(self.HANDLERS[name][1](message))
+
+
+@TelemetryStore.handler("GPS_RAW_INT", fields=("gps_0.eph", "gps_0.epv", "gps_0.fix_type", "gps_0.satellites_visible"))
+def _gps_raw_int(m: Any) -> dict:
+    """Handle the GPS_RAW_INT message.
+
+    Parameters
+    ----------
+    m : Any
+        The MAVLink message.
+
+    Returns
+    -------
+    dict
+        The GPS fields.
+    """
+    return {
+        "gps_0.eph": m.eph,
+        "gps_0.epv": m.epv,
+        "gps_0.fix_type": m.fix_type,
+        "gps_0.satellites_visible": m.satellites_visible,
+    }
+
+
+@TelemetryStore.handler("ATTITUDE", fields=("attitude.pitch", "attitude.roll", "attitude.yaw"))
+def _attitude(m: Any) -> dict:
+    """Handle the ATTITUDE message.
+
+    Parameters
+    ----------
+    m : Any
+        The MAVLink message.
+
+    Returns
+    -------
+    dict
+        The attitude fields.
+    """
+    return {
+        "attitude.pitch": m.pitch,
+        "attitude.roll": m.roll,
+        "attitude.yaw": m.yaw,
+    }
+
+
+@TelemetryStore.handler("SYS_STATUS", fields=("battery.voltage", "battery.current", "battery.level"))
+def _sys_status(m: Any) -> dict:
+    """Handle the SYS_STATUS message.
+
+    Parameters
+    ----------
+    m : Any
+        The MAVLink message.
+
+    Returns
+    -------
+    dict
+        The battery fields, scaled the same way as `dronekit.Battery`.
+    """
+    return {
+        "battery.voltage": m.voltage_battery / 1000.0,
+        "battery.current": None if m.current_battery == -1 else m.current_battery / 100.0,
+        "battery.level": None if m.battery_remaining == -1 else m.battery_remaining,
+    }
+
+
+@TelemetryStore.handler(
+    "GLOBAL_POSITION_INT",
+    fields=(
+        "location.global_frame.lat",
+        "location.global_frame.lon",
+        "location.global_frame.alt",
+        "location.global_relative_frame.lat",
+        "location.global_relative_frame.lon",
+        "location.global_relative_frame.alt",
+        "velocity[0]",
+        "velocity[1]",
+        "velocity[2]",
+    ),
+)
+def _global_position_int(m: Any) -> dict:
+    """Handle the GLOBAL_POSITION_INT message.
+
+    Parameters
+    ----------
+    m : Any
+        The MAVLink message.
+
+    Returns
+    -------
+    dict
+        The location and velocity fields.
+    """
+    lat, lon = m.lat / 1.0e7, m.lon / 1.0e7
+    return {
+        "location.global_frame.lat": lat,
+        "location.global_frame.lon": lon,
+        "location.global_frame.alt": m.alt / 1000.0,
+        "location.global_relative_frame.lat": lat,
+        "location.global_relative_frame.lon": lon,
+        "location.global_relative_frame.alt": m.relative_alt / 1000.0,
+        "velocity[0]": m.vx / 100.0,
+        "velocity[1]": m.vy / 100.0,
+        "velocity[2]": m.vz / 100.0,
+    }
+
+
+@TelemetryStore.handler("VFR_HUD", fields=("heading", "airspeed", "groundspeed"))
+def _vfr_hud(m: Any) -> dict:
+    """Handle the VFR_HUD message.
+
+    Parameters
+    ----------
+    m : Any
+        The MAVLink message.
+
+    Returns
+    -------
+    dict
+        The heading and speed fields.
+    """
+    return {
+        "heading": m.heading,
+        "airspeed": m.airspeed,
+        "groundspeed": m.groundspeed,
+    }
+
+
+@TelemetryStore.handler("DISTANCE_SENSOR", fields=("rangefinder.distance",))
+def _distance_sensor(m: Any) -> dict:
+    """Handle the DISTANCE_SENSOR message.
+
+    Parameters
+    ----------
+    m : Any
+        The MAVLink message.
+
+    Returns
+    -------
+    dict
+        The rangefinder distance, as reported by the sensor.
+    """
+    return {"rangefinder.distance": m.current_distance}
@@ -0,0 +1,166 @@
+"""Reuse a detector's verdict when its input has barely changed."""
+
+import math
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from drone_ips.detectors import protocol
+
+
+class VerdictCache:
+    """Recent verdicts of one detector, keyed on its quantized feature vector.
+
+    While the vehicle sits armed on the ground or holds position, the features a detector
+    needs hardly change from one tick to the next, so asking it again costs a round-trip and
+    an inference for the same answer. Each feature is quantized to a tolerance band and the
+    quantized vector is the key: inputs that fall in the same bands reuse the verdict, as
+    long as it isn't older than `max_age`. Features with an infinite band (like the
+    timestamp) are left out of the key, and features with no band must match exactly.
+
+    Parameters
+    ----------
+    max_age : float
+        The oldest a verdict can be and still be reused (seconds).
+    bands : dict, optional
+        The tolerance band of each feature, overriding `BANDS`.
+    max_entries : int, optional
+        The number of recent keys to remember (`MAX_ENTRIES` if None).
+    """
+
+    MAX_ENTRIES: int = 32
+    # The width of each feature's tolerance band, in the feature's units
+    BANDS: dict[str, float] = {
+        "timestamp": math.inf,
+        "location.global_frame.lat": 1e-6,
+        "location.global_frame.lon": 1e-6,
+        "location.global_frame.alt": 0.1,
+        "heading": 1.0,
+        "gps_0.eph": 1.0,
+        "gps_0.epv": 1.0,
+        "delta_lat": 1e-6,
+        "delta_lon": 1e-6,
+        "delta_alt": 0.1,
+        "distance": 0.1,
+        "rangefinder.distance": 10.0,
+        "battery.current": 0.1,
+        "battery.level": 1.0,
+        "battery.voltage": 0.05,
+        "companion_computer.cpu_usage": 1.0,
+        "companion_computer.ram_usage": 1.0,
+    }
+
+    def __init__(self, max_age: float, bands: Optional[dict[str, float]] = None, max_entries: Optional[int] = None):
+        self.max_age = max_age
+        self._bands = {**self.BANDS, **(bands or {})}
+        self.MAX_ENTRIES = max_entries if max_entries is not None else VerdictCache.MAX_ENTRIES
+        self._entries: OrderedDict[bytes, tuple[int, float]] = OrderedDict()
+        # The schema the key layout was built for
+        self._schema: Optional[protocol.FeatureSchema] = None
+        self._keep = np.empty(0, dtype=bool)
+        self._widths = np.empty(0)
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def key(self, current_data: dict, schema: protocol.FeatureSchema) -> bytes:
+        """Quantize the features a detector needs into a cache key.
+
+        Parameters
+        ----------
+        current_data : dict
+            The current data from the vehicle.
+        schema : protocol.FeatureSchema
+            The features the detector needs.
+
+        Returns
+        -------
+        bytes
+            The key.
+        """
+        if schema is not self._schema:
+            self._bind(schema)
+        row = schema.pack(current_data)[self._keep]
+        quantized = np.where(self._widths > 0, np.floor(row / np.where(self._widths > 0, self._widths, 1.0)), row)
+        return quantized.tobytes()
+
+    def get(self, key: bytes, now: float) -> Optional[int]:
+        """Look up the verdict for a key.
+
+        Parameters
+        ----------
+        key : bytes
+            The key, from `key`.
+        now : float
+            The current monotonic time.
+
+        Returns
+        -------
+        int or None
+            The cached verdict, or None if there is none that is fresh enough.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[1] > self.max_age:
+            del self._entries[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: bytes, verdict: int, now: float):
+        """Remember a fresh verdict.
+
+        Parameters
+        ----------
+        key : bytes
+            The key, from `key`.
+        verdict : int
+            The verdict from the detector.
+        now : float
+            The current monotonic time.
+        """
+        self._entries[key] = (verdict, now)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every verdict."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Report how well the cache is doing.
+
+        Returns
+        -------
+        dict
+            The number of hits, misses and expired verdicts, and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / lookups, 3) if lookups > 0 else 0.0,
+        }
+
+    def _bind(self, schema: protocol.FeatureSchema):
+        """Build the key layout for a detector's features.
+
+        Parameters
+        ----------
+        schema : protocol.FeatureSchema
+            The features the detector needs.
+        """
+        widths = np.array([self._bands.get(name, 0.0) for name in schema.features])
+        self._keep = ~np.isinf(widths)
+        self._widths = widths[self._keep]
+        self._schema = schema
+        # Keys built for other features mean nothing now
+        self.clear()
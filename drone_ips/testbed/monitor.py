@@ -57,4 +57,4 @@ class Monitor(monitor.Monitor):
 
     def _start_new_logfile(self):
         """Start a new log file for the monitor."""
-        self._csv_writer.open(f"attack_logs/{ips_utils.format.datetime_str()}_data.csv")
+        self._csv_writer.open(f"attack_logs/{ips_utils.format.datetime_str()}_data{self._csv_writer.SUFFIX}")
@@ -1,14 +1,13 @@
 """This module contains the Replay class, which replays a recorded flight from a file instead of connecting to a flight controller."""
 
 import time
+from typing import Any
 
 import numpy as np
 import pandas as pd
-import zmq
 
 import drone_ips.logging as ips_logging
 import drone_ips.testbed as testbed
-from drone_ips.monitor import ML_Ports
 
 
 class Replay(testbed.Monitor):
@@ -26,44 +25,47 @@ class Replay(testbed.Monitor):
 
     def __init__(self, filename: str, **options: dict):
         # Load the raw data
-        df = pd.read_csv(filename)
+        df = ips_logging.read_log(filename)
         df = df.replace({np.nan: None})
         df = df.drop(columns=["ml_verdict"])
         self._replay_data = df.to_dict(orient="records")
         self._realtime = options.get("realtime", False)
         self._current_i = 0
 
-        self._data: list[dict] = []
         self._logger = ips_logging.LogManager.get_logger("monitor")
-        self._csv_writer = ips_logging.CSVLogger()
         self.attack_manager = testbed.AttackManager()
         self.attack_manager._start_time = self._replay_data[0]["timestamp"]
 
-        # Create socket objects to talk to the ML programs
-        context = zmq.Context()
-        #  Socket to talk to server
-        self._sockets = {
-            ML_Ports.GPS.value: context.socket(zmq.REQ),  # GPS
-            ML_Ports.LIDAR.value: context.socket(zmq.REQ),  # LiDAR
-            ML_Ports.COMPANION_COMPUTER.value: context.socket(zmq.REQ),  # Compaion Computer
-        }
-        for port, obj in self._sockets.items():
-            obj.connect(f"tcp://localhost:{port}")
-            obj.RCVTIMEO = self.MQZ_TIMEOUT
+        # The vehicle is named after the file by default, and the cache ages verdicts by the wall clock,
+        # so it only makes sense when replaying in real time
+        shared: dict[str, Any] = {**options, "vehicle_id": options.get("vehicle_id") or f"replay:{filename}"}
+        if not self._realtime:
+            shared["verdict_cache_age"] = 0.0
+        self._setup_pipeline(shared)
 
     def start(self):
         """Start the monitor and begin listening for messages."""
         self._start_time = int(time.time())
         self._start_new_logfile()
-        self._event_loop()
+        if self._supervisor is not None:
+            self._supervisor.start()
+        self._wait_for_detectors()
+        try:
+            self._event_loop()
+        finally:
+            # Write out the rows still in the buffer
+            self._csv_writer.close()
+            self._ml_dispatcher.close()
+            if self._supervisor is not None:
+                self._supervisor.stop()
 
     def _event_loop(self):
         """The main event loop for the monitor."""
         while self._current_i < len(self._replay_data):
             current_data = self.get_vehicle_data()
-            # Log the data and append it to the list
+            # Log the data and append it to the history
             self._csv_writer.log(current_data)
-            self._data.append(current_data)
+            self._history.append(current_data)
             # If realtime is selected, wait for the next data point
             if self._realtime and self._current_i < len(self._replay_data):
                 time.sleep(self._replay_data[self._current_i]["timestamp"] - current_data["timestamp"])
@@ -92,16 +94,11 @@ class Replay(testbed.Monitor):
         current_data : dict
             The current data from the vehicle.
         """
-        # Send the data to the machine learning model
-        ml_result = 0
-        for i in range(3):
-            port_number = ML_Ports.GPS.value + i
-            this_result = self.send_to_ml(current_data, port_number)
-            ml_result = (ml_result << 1) + this_result
-            print(f"{this_result}", end=" ")
-        print()
-        current_data.update({"ml_verdict": ml_result})
+        # Derive the features the detectors share, then send the data to the machine learning models
+        current_data.update(self._features.evaluate(current_data))
+        current_data.update({"ml_verdict": self._get_ml_verdict(current_data)})
 
     def stop(self):
         """Stop the monitor and stop listening for messages."""
-        pass
+        self._log_latency_summary()
+        self._ml_dispatcher.close()
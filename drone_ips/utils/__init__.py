@@ -1,4 +1,7 @@
 """Expose the internal modules."""
 
-from . import format, math, misc
+from . import format, math, misc, rolling
+from .latency import LatencyHistogram, LatencyRecorder
+from .ring_buffer import ColumnarRingBuffer
+from .rolling import EWMA, RollingStats
 from .singleton import Singleton
@@ -0,0 +1,175 @@
+"""Low-overhead streaming latency histograms for instrumenting hot paths."""
+
+import contextlib
+import math
+import time
+from collections.abc import Iterator
+
+
+class LatencyHistogram:
+    """A streaming histogram of latencies with logarithmic buckets.
+
+    Each bucket is `GROWTH` times wider than the one before it, so percentiles are
+    accurate to within that relative error while recording a sample costs one
+    logarithm and one increment, no matter how many samples are recorded.
+    """
+
+    MIN_VALUE: float = 1e-6  # Anything faster than a microsecond lands in the first bucket
+    GROWTH: float = 1.1
+    BUCKETS: int = 200  # Covers up to ~3 minutes
+
+    def __init__(self):
+        self._log_growth = math.log(self.GROWTH)
+        self.reset()
+
+    @property
+    def count(self) -> int:
+        """The number of samples recorded.
+
+        Returns
+        -------
+        int
+            The number of samples recorded.
+        """
+        return self._count
+
+    def reset(self):
+        """Forget every recorded sample."""
+        self._buckets = [0] * self.BUCKETS
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def record(self, seconds: float):
+        """Record a latency sample.
+
+        Parameters
+        ----------
+        seconds : float
+            The latency in seconds.
+        """
+        if seconds > self.MIN_VALUE:
+            index = min(int(math.log(seconds / self.MIN_VALUE) / self._log_growth) + 1, self.BUCKETS - 1)
+        else:
+            index = 0
+        self._buckets[index] += 1
+        self._count += 1
+        self._total += seconds
+        if seconds > self._max:
+            self._max = seconds
+
+    def percentile(self, p: float) -> float:
+        """Estimate a percentile of the recorded latencies.
+
+        Parameters
+        ----------
+        p : float
+            The percentile to estimate (0-100).
+
+        Returns
+        -------
+        float
+            The estimated latency in seconds (the upper edge of the bucket, capped at the max).
+        """
+        if self._count == 0:
+            return 0.0
+        rank = math.ceil(self._count * p / 100)
+        seen = 0
+        for index, n in enumerate(self._buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.MIN_VALUE * self.GROWTH**index, self._max)
+        return self._max
+
+    def summary(self) -> dict:
+        """Summarize the recorded latencies.
+
+        Returns
+        -------
+        dict
+            The sample count, and the mean, p50, p99 and max latency in milliseconds.
+        """
+        return {
+            "count": self._count,
+            "mean_ms": round(1000 * self._total / self._count, 3) if self._count > 0 else 0.0,
+            "p50_ms": round(1000 * self.percentile(50), 3),
+            "p99_ms": round(1000 * self.percentile(99), 3),
+            "max_ms": round(1000 * self._max, 3),
+        }
+
+
+class LatencyRecorder:
+    """A set of named latency histograms, one per instrumented stage.
+
+    Examples
+    --------
+    >>> latency = LatencyRecorder()
+    >>> with latency.stage("csv"):
+    ...     writer.log(data)
+    >>> latency.summary()["csv"]["p99_ms"]
+    """
+
+    def __init__(self):
+        self._histograms: dict[str, LatencyHistogram] = {}
+
+    def record(self, stage: str, seconds: float):
+        """Record a latency sample for a stage.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+        seconds : float
+            The latency in seconds.
+        """
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    @contextlib.contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Time the body of a `with` block as a stage.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+
+        Yields
+        ------
+        None
+            Control returns to the body of the `with` block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def summary(self) -> dict[str, dict]:
+        """Summarize the latencies of every stage.
+
+        Returns
+        -------
+        dict
+            The summary of each stage, by name.
+        """
+        return {stage: histogram.summary() for stage, histogram in self._histograms.items()}
+
+    def format_summary(self) -> str:
+        """Format the summary of every stage as one line per stage.
+
+        Returns
+        -------
+        str
+            The p50, p99 and max latency of each stage, in milliseconds.
+        """
+        return "\n".join(
+            f"{stage}: n={s['count']} p50={s['p50_ms']}ms p99={s['p99_ms']}ms max={s['max_ms']}ms"
+            for stage, s in self.summary().items()
+        )
+
+    def reset(self):
+        """Forget every recorded sample."""
+        self._histograms = {}
@@ -1,5 +1,6 @@
 """Miscellaneous utility functions."""
 
+import functools
 import re
 from typing import Any
 
@@ -54,7 +55,30 @@ def get_object_properties(o: Any, pattern: str = r"(?!_)\w+") -> dict:
     dict
         A dictionary of the object's properties that match the pattern.
     """
-    prog = re.compile(pattern)
-    # Filter out callables from the object's attributes
-    attrs = [attr for attr in dir(o) if prog.fullmatch(attr) is not None and not callable(getattr(o, attr))]
-    return {k: getattr(o, k) for k in attrs}
+    prog = _compile_pattern(pattern)
+    properties = {}
+    for attr in dir(o):
+        if prog.fullmatch(attr) is None:
+            continue
+        # Filter out callables from the object's attributes, reading each attribute only once
+        value = getattr(o, attr)
+        if not callable(value):
+            properties[attr] = value
+    return properties
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_pattern(pattern: str) -> re.Pattern:
+    """Compile a regular expression pattern once and reuse it.
+
+    Parameters
+    ----------
+    pattern : str
+        The regular expression pattern to compile.
+
+    Returns
+    -------
+    re.Pattern
+        The compiled pattern.
+    """
+    return re.compile(pattern)
@@ -0,0 +1,146 @@
+"""Fixed-capacity, column-oriented history of telemetry samples."""
+
+from typing import Any, Optional
+
+import numpy as np
+
+
+class ColumnarRingBuffer:
+    """Fixed-capacity, column-oriented history of telemetry samples.
+
+    Each key of the appended dictionaries gets its own NumPy array of length `capacity`,
+    so once the buffer is full the oldest sample is overwritten and memory stays flat no
+    matter how long the flight is. Numeric columns are stored as float64 (missing values
+    are NaN); a column is switched to an object array if a non-numeric value appears.
+
+    Parameters
+    ----------
+    capacity : int
+        The maximum number of samples to keep.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("The capacity must be positive.")
+        self._capacity = capacity
+        self._columns: dict[str, np.ndarray] = {}
+        self._count = 0
+        self._last_row: Optional[dict] = None
+
+    def __len__(self) -> int:
+        """Get the number of samples currently held.
+
+        Returns
+        -------
+        int
+            The number of samples currently held.
+        """
+        return min(self._count, self._capacity)
+
+    @property
+    def capacity(self) -> int:
+        """The maximum number of samples to keep.
+
+        Returns
+        -------
+        int
+            The maximum number of samples to keep.
+        """
+        return self._capacity
+
+    @property
+    def columns(self) -> list[str]:
+        """The names of the columns seen so far.
+
+        Returns
+        -------
+        list of str
+            The names of the columns seen so far.
+        """
+        return list(self._columns)
+
+    @property
+    def last_row(self) -> Optional[dict]:
+        """The last sample appended, exactly as it was given.
+
+        Returns
+        -------
+        dict
+            The last sample appended, if one exists.
+        """
+        return self._last_row
+
+    def append(self, row: dict):
+        """Append a sample, overwriting the oldest one if the buffer is full.
+
+        Parameters
+        ----------
+        row : dict
+            The sample to append.
+        """
+        i = self._count % self._capacity
+        for key, value in row.items():
+            column = self._columns.get(key)
+            if column is None:
+                # Columns are created from their first real value so the type can be chosen
+                if value is None:
+                    continue
+                column = self._add_column(key, value)
+            self._set(key, column, i, value)
+        # Columns that are missing from this sample are cleared
+        for key in self._columns.keys() - row.keys():
+            self._set(key, self._columns[key], i, None)
+        self._count += 1
+        self._last_row = row
+
+    def clear(self):
+        """Remove every sample and column."""
+        self._columns = {}
+        self._count = 0
+        self._last_row = None
+
+    def _add_column(self, key: str, value: Any) -> np.ndarray:
+        """Create a column sized for the buffer, filled with missing values.
+
+        Parameters
+        ----------
+        key : str
+            The name of the column.
+        value : Any
+            The first value of the column, which decides its type.
+
+        Returns
+        -------
+        np.ndarray
+            The new column.
+        """
+        if isinstance(value, (bool, int, float, np.number)):
+            column = np.full(self._capacity, np.nan)
+        else:
+            column = np.full(self._capacity, None, dtype=object)
+        self._columns[key] = column
+        return column
+
+    def _set(self, key: str, column: np.ndarray, i: int, value: Any):
+        """Store a value in a column, switching the column to objects if it doesn't fit.
+
+        Parameters
+        ----------
+        key : str
+            The name of the column.
+        column : np.ndarray
+            The column.
+        i : int
+            The index to store the value at.
+        value : Any
+            The value to store.
+        """
+        if column.dtype == object:
+            column[i] = value
+            return
+        try:
+            column[i] = np.nan if value is None else value
+        except (TypeError, ValueError):
+            column = column.astype(object)
+            column[i] = value
+            self._columns[key] = column
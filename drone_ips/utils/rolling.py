@@ -0,0 +1,134 @@
+"""Constant-time streaming statistics."""
+
+import math
+from collections import deque
+from typing import Optional
+
+
+class EWMA:
+    """An exponentially weighted moving average, updated one value at a time.
+
+    Parameters
+    ----------
+    alpha : float
+        The weight of the newest value (0-1); higher values forget faster.
+    """
+
+    def __init__(self, alpha: float):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1].")
+        self.alpha = alpha
+        self._value: Optional[float] = None
+
+    @property
+    def value(self) -> float:
+        """The current average.
+
+        Returns
+        -------
+        float
+            The current average (0.0 before the first value).
+        """
+        return self._value if self._value is not None else 0.0
+
+    def update(self, x: float) -> float:
+        """Add a value to the average.
+
+        Parameters
+        ----------
+        x : float
+            The new value.
+
+        Returns
+        -------
+        float
+            The updated average.
+        """
+        self._value = x if self._value is None else self._value + self.alpha * (x - self._value)
+        return self._value
+
+
+class RollingStats:
+    """The mean and variance of the last `window` values, updated in constant time.
+
+    Uses Welford's algorithm, extended to remove the value that falls out of the window,
+    so there is no running sum of squares to lose precision.
+
+    Parameters
+    ----------
+    window : int
+        The number of values to keep.
+    """
+
+    def __init__(self, window: int):
+        if window <= 0:
+            raise ValueError("The window must be positive.")
+        self._values: deque[float] = deque(maxlen=window)
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        """Get the number of values in the window.
+
+        Returns
+        -------
+        int
+            The number of values in the window.
+        """
+        return len(self._values)
+
+    @property
+    def mean(self) -> float:
+        """The mean of the values in the window.
+
+        Returns
+        -------
+        float
+            The mean of the values in the window (0.0 if empty).
+        """
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """The sample variance of the values in the window, like pandas' `rolling().var()`.
+
+        Returns
+        -------
+        float
+            The sample variance of the values in the window (0.0 with fewer than 2 values).
+        """
+        n = len(self._values)
+        return max(0.0, self._m2 / (n - 1)) if n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        """The sample standard deviation of the values in the window.
+
+        Returns
+        -------
+        float
+            The sample standard deviation of the values in the window.
+        """
+        return math.sqrt(self.variance)
+
+    def update(self, x: float):
+        """Add a value, dropping the oldest one if the window is full.
+
+        Parameters
+        ----------
+        x : float
+            The new value.
+        """
+        if len(self._values) == self._values.maxlen:
+            # Replace the oldest value in one step
+            old = self._values[0]
+            n = len(self._values)
+            mean = self._mean + (x - old) / n
+            self._m2 += (x - old) * (x - mean + old - self._mean)
+            self._mean = mean
+        else:
+            n = len(self._values) + 1
+            delta = x - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (x - self._mean)
+        self._values.append(x)
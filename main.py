@@ -34,7 +34,100 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "-i", "--poll-interval", type=float, default=0.1, help="the interval at which to poll the vehicle."
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--overrun-policy",
+        choices=["catch_up", "skip", "degrade"],
+        default="skip",
+        help="what to do when a poll overruns the next tick (default = 'skip').",
+    )
+    parser.add_argument(
+        "--history-size", type=int, default=6000, help="the number of recent data points to keep in memory."
+    )
+    parser.add_argument(
+        "--health-interval",
+        type=float,
+        default=0.5,
+        help="the interval at which to sample the companion computer's health.",
+    )
+    parser.add_argument(
+        "--latency-report-interval",
+        type=float,
+        default=60.0,
+        help="the interval (in seconds) at which to log the latency of each poll stage.",
+    )
+    parser.add_argument(
+        "--detector-mode",
+        choices=["process", "plugin"],
+        default="process",
+        help="run the ML detectors as separate programs or load them into the monitor (default = 'process').",
+    )
+    parser.add_argument(
+        "--no-launch-detectors",
+        dest="launch_detectors",
+        action="store_false",
+        help="don't launch the ML detector programs (in 'process' mode), e.g. when they are started by hand.",
+    )
+    parser.add_argument(
+        "--detector-python",
+        type=str,
+        default=None,
+        help="the Python interpreter to launch the ML detector programs with (default = this one).",
+    )
+    parser.add_argument(
+        "--detector-ready-timeout",
+        type=float,
+        default=60.0,
+        help="the longest (in seconds) to wait for the ML detectors to load before polling anyway (default = 60).",
+    )
+    parser.add_argument(
+        "--no-rules",
+        dest="rule_cascade",
+        action="store_false",
+        help="send every tick to the ML detectors instead of deciding the obvious cases with rule checks first.",
+    )
+    parser.add_argument(
+        "--verdict-cache-age",
+        type=float,
+        default=1.0,
+        help="the oldest (in seconds) an ML verdict can be and still be reused for a near-identical input; "
+        "0 turns the cache off (default = 1.0).",
+    )
+    parser.add_argument(
+        "--vehicle-id",
+        type=str,
+        default=None,
+        help="the ID the ML detectors keep this vehicle's state under (default = the host name).",
+    )
+    parser.add_argument(
+        "--log-format",
+        choices=["csv", "columnar", "delta"],
+        default="csv",
+        help="write the telemetry log as CSV text, as typed, compressed columnar chunks, or as JSON lines "
+        "holding only the fields that changed (default = 'csv').",
+    )
+    parser.add_argument(
+        "--log-durability",
+        choices=["row", "buffered", "fsync"],
+        default="buffered",
+        help="flush the log after every row (not for columnar logs, which are written in chunks), or buffer it "
+        "and write it from a background thread (and sync it to the disk, with 'fsync') (default = 'buffered').",
+    )
+    parser.add_argument(
+        "--log-flush-interval",
+        type=float,
+        default=None,
+        help="the longest (in seconds) a buffered row waits before it is written to the log "
+        "(default = 1.0 for CSV and delta logs, 30.0 for columnar logs).",
+    )
+    parser.add_argument(
+        "--log-arrival-times",
+        action="store_true",
+        help="log when each message-fed field last arrived from the vehicle.",
+    )
+    args = parser.parse_args()
+    if args.log_format == "columnar" and args.log_durability == "row":
+        parser.error("columnar logs are written in chunks; use --log-format csv or delta with --log-durability row")
+    return args
 
 
 def start_monitor(args: argparse.Namespace):
@@ -0,0 +1,52 @@
+"""Host several machine learning detectors in one program, answering every monitor from a single socket."""
+
+import argparse
+import logging
+
+from drone_ips.detectors import DETECTORS, DetectorServer
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments.
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Serve the ML detectors from a single process.")
+    parser.add_argument(
+        "-d",
+        "--detectors",
+        nargs="+",
+        choices=list(DETECTORS),
+        default=list(DETECTORS),
+        help="the detectors to host (default = all of them).",
+    )
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=DetectorServer.BATCH_WINDOW,
+        help="how long (in seconds) to wait for more requests to batch together.",
+    )
+    parser.add_argument(
+        "--max-batch", type=int, default=DetectorServer.MAX_BATCH, help="the most requests to batch together."
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="memory-map the models' arrays (replace model files by renaming over them, not in place).",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Reloads and fallbacks are reported on stderr, apart from the ready line on stdout
+    logging.basicConfig(level=logging.INFO)
+    # Load every model once, then answer requests until interrupted
+    server = DetectorServer(
+        [DETECTORS[name](mmap=args.mmap) for name in args.detectors], args.batch_window, args.max_batch
+    )
+    server.serve()
+    print("Batching:", server.stats())
@@ -0,0 +1,23 @@
+"""Fixtures shared by the tests."""
+
+import pathlib
+
+import pytest
+
+from drone_ips.detectors.benchmark import load_samples
+
+TEST_DATA = pathlib.Path(__file__).parent.parent / "test_data" / "labeled_attack_data.csv"
+# The pandas path is slow, so only the start of the flight is used
+LIMIT = 1000
+
+
+@pytest.fixture(scope="session")
+def samples() -> list[dict]:
+    """Load the start of the recorded flight the detectors are checked on.
+
+    Returns
+    -------
+    list of dict
+        The samples, as the detectors receive them.
+    """
+    return load_samples(str(TEST_DATA), LIMIT)
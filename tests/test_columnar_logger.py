@@ -0,0 +1,38 @@
+"""Tests for the columnar telemetry log."""
+
+import pytest
+
+from drone_ips.logging import ColumnarLogger, read_columnar_log
+
+
+def test_round_trip(tmp_path):
+    """Rows read back with their types, across chunks.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        A temporary directory for the log.
+    """
+    path = tmp_path / "flight.npz"
+    log = ColumnarLogger(str(path), chunk_rows=100)
+    for i in range(250):
+        log.log({"timestamp": 1.7e9 + i * 0.1, "armed": i % 2 == 0, "mode": "GUIDÉ", "n": i})
+    log.close()
+
+    df = read_columnar_log(path)
+    assert log.chunks == 3
+    assert df["n"].tolist() == list(range(250))
+    assert df["armed"].dtype == bool
+
+
+def test_row_policy(tmp_path):
+    """A chunk for every row is refused.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        A temporary directory for the log.
+    """
+    with pytest.raises(ValueError):
+        ColumnarLogger(str(tmp_path / "flight.npz"), policy="row")
+    assert not (tmp_path / "flight.chunks.jsonl").exists()
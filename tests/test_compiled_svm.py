@@ -0,0 +1,69 @@
+"""Tests that the committed NumPy-only exports of the detectors match scikit-learn."""
+
+import joblib
+import numpy as np
+import pytest
+
+from drone_ips.detectors import DETECTORS
+from drone_ips.detectors.compiled_svm import CompiledOneClassSVM
+
+# scikit-learn 1.2 still asks pandas 2.2 if the scaler's input is sparse the deprecated way
+pytestmark = pytest.mark.filterwarnings("ignore:is_sparse is deprecated:DeprecationWarning")
+
+
+@pytest.fixture(scope="module", params=list(DETECTORS))
+def exported(request, samples) -> tuple:
+    """Load a detector from its committed export and preprocess the flight both ways.
+
+    Parameters
+    ----------
+    request : pytest.FixtureRequest
+        The name of the detector, as the fixture's parameter.
+    samples : list of dict
+        The samples.
+
+    Returns
+    -------
+    tuple
+        The detector, and the rows preprocessed by the fitted scaler and by the export.
+    """
+    detector = DETECTORS[request.param](fast_path=True)
+    assert detector.precompiled, f"{detector.compiled_path.name} is missing or out of date"
+    reference, compiled = [], []
+    for sample in (detector.observe(sample, "test") for sample in samples):
+        try:
+            reference.append(detector.preprocess_pandas(sample))
+        except (KeyError, ValueError):
+            continue
+        compiled.append(detector.preprocess(sample))
+    return detector, np.vstack(reference), np.vstack(compiled)
+
+
+def test_transform(exported):
+    """The compiled transform matches the fitted scaler's `transform`.
+
+    Parameters
+    ----------
+    exported : tuple
+        The detector and its preprocessed rows.
+    """
+    _, reference, compiled = exported
+    np.testing.assert_allclose(compiled, reference, rtol=1e-9, atol=1e-12)
+
+
+def test_model(exported):
+    """The compiled model matches the pickled model's `decision_function` and `predict`.
+
+    Parameters
+    ----------
+    exported : tuple
+        The detector and its preprocessed rows.
+    """
+    detector, reference, _ = exported
+    assert isinstance(detector.model, CompiledOneClassSVM)
+    estimator = joblib.load(detector.model_path)
+    # Noisy copies of the rows probe the model near its decision boundary as well
+    probes = reference + np.random.default_rng(0).normal(0.0, 0.5, reference.shape)
+    rows = np.vstack([reference, probes])
+    np.testing.assert_allclose(detector.model.decision_function(rows), estimator.decision_function(rows), atol=1e-9)
+    np.testing.assert_array_equal(detector.model.predict(rows), estimator.predict(rows))
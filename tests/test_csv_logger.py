@@ -0,0 +1,139 @@
+"""Tests for the segmented CSV log and its index."""
+
+import pandas as pd
+
+from drone_ips.logging import CSVLogger, read_csv_log, read_log_range
+from drone_ips.logging.csv_logger import read_manifest
+from drone_ips.logging.log_index import read_index
+
+
+class _FailingFile:
+    """A segment file whose writes fail, after writing part of the rows, until told to stop.
+
+    Parameters
+    ----------
+    fh : io.TextIOWrapper
+        The segment file.
+    """
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.failing = True
+
+    def write(self, text: str) -> int:
+        """Write the rows, or half of them before failing.
+
+        Parameters
+        ----------
+        text : str
+            The rows.
+
+        Returns
+        -------
+        int
+            The number of characters written.
+        """
+        if not self.failing:
+            return self._fh.write(text)
+        self._fh.write(text[: len(text) // 2])
+        raise OSError("No space left on device")
+
+    def __getattr__(self, name: str):
+        """Pass everything else on to the segment file.
+
+        Parameters
+        ----------
+        name : str
+            The name of the attribute.
+
+        Returns
+        -------
+        Any
+            The segment file's attribute.
+        """
+        return getattr(self._fh, name)
+
+
+def _rows(count: int) -> list[dict]:
+    """Make telemetry rows with multi-byte characters in them.
+
+    Parameters
+    ----------
+    count : int
+        The number of rows.
+
+    Returns
+    -------
+    list of dict
+        The rows, 0.1 seconds apart.
+    """
+    return [{"timestamp": 1.7e9 + i * 0.1, "mode": "GUIDÉ" if i % 3 else "ÉCHEC ✈", "n": i} for i in range(count)]
+
+
+def _check_index(path):
+    """Check that every index entry points at the start of the row it was made for.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The name the log was opened with.
+    """
+    segments = read_manifest(path)
+    for entry in read_index(path):
+        with open(path.with_name(segments[entry["segment"]]["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            assert float(f.readline().split(b",")[0]) == entry["t"]
+
+
+def test_byte_offsets(tmp_path):
+    """Segments are cut by their size in bytes, and the index finds rows past multi-byte characters.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        A temporary directory for the log.
+    """
+    path = tmp_path / "flight.csv"
+    log = CSVLogger(str(path), segment_bytes=16 * 1024)
+    for row in _rows(3000):
+        log.log(row)
+    log.close()
+
+    sizes = [path.with_name(segment["segment"]).stat().st_size for segment in read_manifest(path)]
+    assert len(sizes) > 1
+    # A segment only goes over the limit by the row that reached it
+    assert max(sizes) < 16 * 1024 + 64
+    _check_index(path)
+    full = read_csv_log(path)
+    start, end = 1.7e9 + 95.05, 1.7e9 + 180.0
+    expected = full[(full["timestamp"] >= start) & (full["timestamp"] <= end)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(read_log_range(path, start, end), expected)
+
+
+def test_failed_write(tmp_path, monkeypatch):
+    """The index still points at the right rows after a write fails part of the way through.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        A temporary directory for the log.
+    monkeypatch : pytest.MonkeyPatch
+        Swaps in a segment file whose writes fail.
+    """
+    path = tmp_path / "flight.csv"
+    log = CSVLogger(str(path), policy="row")
+    rows = _rows(300)
+    for row in rows[:100]:
+        log.log(row)
+    segment = _FailingFile(log._fh)
+    monkeypatch.setattr(log, "_fh", segment)
+    for row in rows[100:105]:
+        log.log(row)
+    segment.failing = False
+    for row in rows[105:]:
+        log.log(row)
+    log.close()
+
+    assert log.write_errors == 5
+    _check_index(path)
+    assert read_log_range(path, 1.7e9 + 15.0, 1.7e9 + 20.0)["n"].tolist() == list(range(150, 201))
@@ -0,0 +1,27 @@
+"""Tests that the NumPy fast path gives the same verdicts as the pandas path."""
+
+import pytest
+
+from drone_ips.detectors import DETECTORS
+from drone_ips.detectors.benchmark import compare
+
+# scikit-learn 1.2 still asks pandas 2.2 if the scaler's input is sparse the deprecated way
+pytestmark = pytest.mark.filterwarnings("ignore:is_sparse is deprecated:DeprecationWarning")
+
+
+@pytest.mark.parametrize("name", list(DETECTORS))
+def test_same_verdicts(name, samples):
+    """Both preprocessing paths give the same rows and verdicts on a recorded flight.
+
+    Parameters
+    ----------
+    name : str
+        The name of the detector.
+    samples : list of dict
+        The samples.
+    """
+    detector = DETECTORS[name](fast_path=True)
+    assert detector.fast_path
+    result = compare(detector, samples)
+    assert result["row_mismatches"] == 0
+    assert result["verdict_mismatches"] == 0